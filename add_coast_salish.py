@@ -6,6 +6,8 @@ Add Coast Salish Nations territories to the territorial mapping
 import json
 import csv
 
+from territory_journal import TerritoryJournal
+
 def add_coast_salish_territories():
     """Add Musqueam, Tsleil-Waututh, and Squamish territories to the mapping"""
     
@@ -78,11 +80,14 @@ def add_coast_salish_territories():
         territories_added += 1
         print(f"Added Squamish territory to {coast_salish_images[2]}")
     
-    # Save updated mapping
-    with open('corrected_territorial_mapping.json', 'w', encoding='utf-8') as f:
-        json.dump(territorial_mapping, f, indent=2, ensure_ascii=False)
+    # Record the additions in the change journal, which also saves the mapping
+    changes = {name: territorial_mapping[name] for name in coast_salish_images[:territories_added]}
+    journal = TerritoryJournal()
+    version = journal.commit(changes, note="add_coast_salish")
+    territorial_mapping = journal.mapping
     
     print(f"\nUpdated territorial mapping with {territories_added} new Coast Salish territories")
+    print(f"Recorded as journal version {version}; undo with: python undo_coast_salish.py {version}")
     print(f"Total mappings now: {len(territorial_mapping)}")
     
     # Show current territories
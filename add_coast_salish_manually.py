@@ -5,6 +5,8 @@ Manually add Coast Salish Nations territories for specific images
 
 import json
 
+from territory_journal import TerritoryJournal
+
 def add_coast_salish_manually():
     """Add Coast Salish Nations territories for specific images"""
     
@@ -29,15 +31,15 @@ def add_coast_salish_manually():
     
     added_count = 0
     for photo_name, territory_info in coast_salish_images.items():
-        territorial_mapping[photo_name] = territory_info
         added_count += 1
         print(f"+ Added {photo_name}: {territory_info['first_nation']}")
     
-    # Save updated mapping
-    with open('corrected_territorial_mapping.json', 'w', encoding='utf-8') as f:
-        json.dump(territorial_mapping, f, indent=2, ensure_ascii=False)
+    # Record the additions in the change journal, which also saves the mapping
+    journal = TerritoryJournal()
+    version = journal.commit(coast_salish_images, note="add_coast_salish_manually")
+    territorial_mapping = journal.mapping
     
-    print(f"\nAdded {added_count} Coast Salish Nations territories")
+    print(f"\nAdded {added_count} Coast Salish Nations territories (journal version {version})")
     print(f"Total mappings now: {len(territorial_mapping)}")
     
     # Show current territories
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Small JSON API that runs next to the Streamlit app (stdlib http.server, a thread per request).
+
+Endpoints:
+    GET /suggest?q=<prefix>[&limit=N][&kind=tag,nation,photographer,photo]
+        typeahead completions from suggest.Suggester, for the embedding page's search box
+    GET /correct?q=<term>
+        spelling correction from fuzzy.FuzzyIndex ("did you mean")
+    GET /metrics
+        stage timings, cache and API counters from metrics.py, in the Prometheus text format
+    GET /health
+
+The apps start one per process when LICHEN_API_PORT is set, with the first session, and it
+reads the suggester and fuzzy index from the app's refresher.Refresher on every request, so it
+follows each background catalog swap without waiting for a session to rerun. It can also run on
+its own against local catalog files.
+
+Usage:
+    python api_server.py [--host HOST] [--port PORT] [--catalog PATH] [--territories PATH]
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import metrics
+from suggest import DEFAULT_LIMIT, KIND_FIELDS
+
+HOST_ENV = 'LICHEN_API_HOST'
+PORT_ENV = 'LICHEN_API_PORT'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8502
+MAX_LIMIT = 50
+CATALOG_PATH = 'LichenThumbnail/images_for_squarespace_githubthumbs.json'
+TERRITORIAL_PATH = 'LichenThumbnail/territorial_mapping.json'
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = 'LichenAPI/1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        route = self.server.api.routes.get(url.path)
+        start = time.perf_counter()
+        try:
+            if route is None:
+                raise ApiError(404, f"Unknown endpoint {url.path}")
+            status, body = 200, route(parse_qs(url.query))
+        except ApiError as e:
+            status, body = e.status, {'error': str(e)}
+        if route is not None:
+            metrics.API_SECONDS.observe(time.perf_counter() - start, endpoint=url.path)
+        # Routes return JSON-able objects, or text (the /metrics exposition format)
+        if isinstance(body, str):
+            payload, content_type = body.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            payload, content_type = json.dumps(body).encode('utf-8'), 'application/json; charset=utf-8'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        # Called from the Squarespace page, which is on another origin
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ApiServer:
+    """
+    The HTTP server plus the objects its endpoints read: a fixed suggester and fuzzy index, or
+    the current snapshot of refresher (anything with .current), taken once per request
+    """
+
+    def __init__(self, suggester=None, host=DEFAULT_HOST, port=DEFAULT_PORT, fuzzy=None, refresher=None):
+        self._suggester = suggester
+        self._fuzzy = fuzzy
+        self.refresher = refresher
+        self.routes = {
+            '/suggest': self.suggest,
+            '/correct': self.correct,
+            '/metrics': self.metrics,
+            '/health': self.health,
+        }
+        self.httpd = ThreadingHTTPServer((host, port), ApiHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.api = self
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.httpd.server_address
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='lichen-api', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @property
+    def suggester(self):
+        snapshot = self.refresher.current if self.refresher else None
+        return snapshot.suggester if snapshot else self._suggester
+
+    @property
+    def fuzzy(self):
+        snapshot = self.refresher.current if self.refresher else None
+        return snapshot.fuzzy if snapshot else self._fuzzy
+
+    def suggest(self, params):
+        suggester = self.suggester
+        if suggester is None:
+            raise ApiError(503, "Catalog not loaded yet")
+        try:
+            limit = min(int(params.get('limit', [DEFAULT_LIMIT])[0]), MAX_LIMIT)
+        except ValueError:
+            raise ApiError(400, "limit must be an integer")
+        kinds = None
+        if params.get('kind'):
+            kinds = {k for k in params['kind'][0].split(',') if k}
+            unknown = kinds - set(KIND_FIELDS)
+            if unknown:
+                raise ApiError(400, f"Unknown kind: {', '.join(sorted(unknown))}")
+        q = params.get('q', [''])[0]
+        start = time.perf_counter()
+        suggestions = suggester.complete(q, limit, kinds)
+        return {
+            'q': q,
+            'suggestions': suggestions,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def correct(self, params):
+        fuzzy = self.fuzzy
+        if fuzzy is None:
+            raise ApiError(503, "Catalog not loaded yet")
+        q = params.get('q', [''])[0]
+        start = time.perf_counter()
+        correction = fuzzy.correct(q)
+        return {
+            'q': q,
+            'correction': correction if correction != q else None,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def metrics(self, params):
+        return metrics.REGISTRY.render()
+
+    def health(self, params):
+        return {'ok': True, 'catalog_loaded': self.suggester is not None}
+
+
+def main():
+    from fuzzy import FuzzyIndex
+    from lichen_search import SearchIndex
+    from suggest import Suggester
+
+    parser = argparse.ArgumentParser(description="Serve the Lichen search API")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Interface to bind")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument('--catalog', default=CATALOG_PATH, help="Catalog JSON")
+    parser.add_argument('--territories', default=TERRITORIAL_PATH, help="Territorial mapping JSON")
+    args = parser.parse_args()
+
+    with open(args.catalog, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    with open(args.territories, 'r', encoding='utf-8') as f:
+        territorial_data = json.load(f)
+    index = SearchIndex(data, territorial_data)
+    suggester = Suggester(index)
+
+    server = ApiServer(suggester, args.host, args.port, FuzzyIndex(index))
+    print(f"Serving {len(suggester)} suggestions on http://{args.host}:{args.port}/suggest?q=")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
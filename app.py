@@ -5,97 +5,156 @@
 # - Supports ?q=<term> in the URL so your Squarespace button/input can pass a query
 # - Displays thumbnails that link to the original image URL
 
-import re
+import io
+import os
 import requests
 import streamlit as st
 import json
 
+import metrics
+from lichen_query import has_syntax, highlight_terms
+from profiling import SECRET_ENV as PROFILE_SECRET_ENV, RunProfiler, authorized as profile_authorized
+from results_grid import PAGE_SIZE, grid_html
+from similarity import load_similarity_index
+from near_duplicates import collapse_duplicates
+from palette import parse_color
+from image_metadata import ORIENTATIONS, RESOLUTIONS
+from related_tags import expand_query
+from refresher import REFRESH_INTERVAL, Refresher, shared_source, url_source
+from api_server import DEFAULT_HOST, HOST_ENV, PORT_ENV, ApiServer
+from lichen_search import (
+    bitmap_count,
+    get_all_territories,
+)
+
 # Your canonical JSON raw links:
 JSON_URL = "https://raw.githubusercontent.com/WhaleCancer/LichenThumbnail/main/images_for_squarespace_githubthumbs.json"
 TERRITORIAL_URL = "https://raw.githubusercontent.com/WhaleCancer/LichenThumbnail/main/territorial_mapping.json"
+RENDITIONS_BASE_URL = "https://raw.githubusercontent.com/WhaleCancer/LichenThumbnail/main/renditions/"
+RENDITIONS_URL = RENDITIONS_BASE_URL + "manifest.json"
+FEATURES_URL = "https://raw.githubusercontent.com/WhaleCancer/LichenThumbnail/main/image_features.npy"
+FEATURE_NAMES_URL = "https://raw.githubusercontent.com/WhaleCancer/LichenThumbnail/main/image_features.json"
+# "Find similar": neighbours fetched before filtering, and how many are shown
+SIMILAR_CANDIDATES = 200
+SIMILAR_RESULTS = PAGE_SIZE
+# Completions shown under the search box
+SUGGESTIONS = 4
+# Below this many exact hits, a plain term is also matched with spelling corrections
+FUZZY_MIN_HITS = 3
+# A search still scanning after EARLY_RENDER_SECONDS shows its first page while it finishes;
+# one still scanning after SEARCH_TIME_BUDGET stops there and shows what it found
+EARLY_RENDER_SECONDS = 0.25
+SEARCH_TIME_BUDGET = 3.0
+# Directory of a memory-mapped catalog build shared by every app process (shared_catalog.py);
+# unset keeps the catalog and index in this process
+SHARED_CATALOG_ENV = "LICHEN_SHARED_CATALOG"
+# Related tags shown, and how many of them "Expand search" adds
+RELATED_TAGS = 8
+EXPAND_TAGS = 3
+# Image metadata filters: (catalog column, label, "all" option, option order)
+FACET_FILTERS = (
+    ("orientation", "📐 Orientation", "All Orientations", [label for label, _ in ORIENTATIONS]),
+    ("resolution", "🖼️ Resolution", "All Resolutions", [label for label, _ in RESOLUTIONS]),
+    ("year", "📅 Year", "All Years", None),
+)
 
 st.set_page_config(page_title="Lichen Search", layout="wide")
+# Stage timings for this run (metrics.py); the debug panel at the bottom shows them
+run_trace = metrics.start_run()
 
 # --- Helpers -----------------------------------------------------------------
-def get_initial_query() -> str:
+def get_query_param(name: str) -> str:
     # Compatible with a wide range of Streamlit versions
+    try:
+        return st.query_params.get(name, "")
+    except Exception:
+        pass
     try:
         params = st.experimental_get_query_params()
-        return (params.get("q", [""]) or [""])[0]
+        return (params.get(name, [""]) or [""])[0]
     except Exception:
         return ""
 
-def set_query(q: str):
+def get_initial_query() -> str:
+    return get_query_param("q")
+
+def set_query_params(**params):
+    # Empty values are dropped so the URL only carries active filters
+    params = {k: v for k, v in params.items() if v}
     try:
-        st.experimental_set_query_params(q=q)
+        st.query_params.from_dict(params)
+        return
+    except Exception:
+        pass
+    try:
+        st.experimental_set_query_params(**params)
     except Exception:
         pass
 
-@st.cache_data(ttl=300, show_spinner=False)
-def load_data():
-    # Cache for 5 minutes
-    r = requests.get(JSON_URL, timeout=15)
-    r.raise_for_status()
-    data = r.json()
-    if not isinstance(data, list):
-        raise ValueError("JSON root is not a list")
-    return data
+def set_query(q: str):
+    set_query_params(q=q)
 
+def profile_secret() -> str:
+    # st.secrets["profile_secret"] (.streamlit/secrets.toml) or LICHEN_PROFILE_SECRET; unset disables ?profile=1
+    try:
+        secret = st.secrets.get("profile_secret", "")
+    except Exception:
+        secret = ""
+    return secret or os.environ.get(PROFILE_SECRET_ENV, "")
+
+@metrics.cache_stage
 @st.cache_data(ttl=300, show_spinner=False)
-def load_territorial_data():
-    # Cache for 5 minutes
+def load_renditions():
+    # Optional manifest from build_thumbnails.py; cards fall back to thumb_url without it
+    metrics.cache_miss()
     try:
-        r = requests.get(TERRITORIAL_URL, timeout=15)
+        r = requests.get(RENDITIONS_URL, timeout=15)
         r.raise_for_status()
         return r.json()
-    except Exception as e:
-        st.warning(f"Could not load territorial data: {e}. Continuing without territorial information.")
+    except Exception:
         return {}
 
-def norm(s):
-    return (s or "").strip()
-
-def highlight(text: str, term: str) -> str:
-    if not term or not text:
-        return norm(text)
+@metrics.cache_stage
+@st.cache_resource(show_spinner=False)
+def start_refresher():
+    # One per process: builds the first catalog snapshot (index, suggester, fuzzy index, tag
+    # graph, duplicate groups), then refresher.py rebuilds and swaps it on a background thread,
+    # so no rerun waits for a download or a rebuild
+    metrics.cache_miss()
+    shared_dir = os.environ.get(SHARED_CATALOG_ENV)
+    if shared_dir:
+        # One worker fetches and publishes the build, every worker maps the same file
+        source = shared_source(shared_dir, JSON_URL, TERRITORIAL_URL, REFRESH_INTERVAL)
+    else:
+        source = url_source(JSON_URL, TERRITORIAL_URL)
+    return Refresher(source, REFRESH_INTERVAL).start()
+
+@st.cache_resource(show_spinner=False)
+def start_api_server(_refresher):
+    # Optional side API (api_server.py) with /suggest for the embedding page; one per process.
+    # It reads the refresher's current snapshot per request, so background swaps reach it directly
+    port = os.environ.get(PORT_ENV)
+    if not port:
+        return None
+    try:
+        return ApiServer(None, os.environ.get(HOST_ENV, DEFAULT_HOST), int(port), refresher=_refresher).start()
+    except (OSError, ValueError) as e:
+        st.warning(f"Could not start the suggest API on port {port}: {e}")
+        return None
+
+@metrics.cache_stage
+@st.cache_resource(ttl=300, show_spinner=False)
+def load_similarity():
+    # Optional feature matrix from build_image_features.py; "Find similar" is hidden without it
+    metrics.cache_miss()
     try:
-        pattern = re.compile(re.escape(term), re.IGNORECASE)
-        return pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", text)
-    except re.error:
-        return text
-
-def record_name(rec: dict) -> str:
-    return rec.get("photo_name") or rec.get("Photo Name") or "Untitled"
-
-def record_desc(rec: dict) -> str:
-    return rec.get("description") or ""
-
-def record_tags(rec: dict) -> str:
-    return rec.get("clip_tags") or ""
-
-def get_territorial_info(rec, territorial_data):
-    """Get territorial information for a record"""
-    photo_name = record_name(rec)
-    return territorial_data.get(photo_name, {})
-
-def get_all_territories(territorial_data):
-    """Get list of all unique territories"""
-    territories = set()
-    for mapping in territorial_data.values():
-        if mapping.get('first_nation'):
-            territories.add(mapping['first_nation'])
-    return sorted(list(territories))
-
-def get_all_tags(data):
-    """Extract all unique tags from the dataset"""
-    all_tags = set()
-    for rec in data:
-        tags_str = record_tags(rec)
-        if tags_str:
-            # Split tags by common separators and clean them
-            tags = [tag.strip() for tag in re.split(r'[,;|\n]', tags_str) if tag.strip()]
-            all_tags.update(tags)
-    return sorted(list(all_tags))
+        names = requests.get(FEATURE_NAMES_URL, timeout=15)
+        names.raise_for_status()
+        features = requests.get(FEATURES_URL, timeout=30)
+        features.raise_for_status()
+        return load_similarity_index(io.BytesIO(features.content), names.json())
+    except Exception:
+        return None
 
 def get_selected_tags_from_session():
     """Get selected tags from session state"""
@@ -105,51 +164,13 @@ def set_selected_tags_in_session(tags):
     """Set selected tags in session state"""
     st.session_state['selected_tags'] = tags
 
-def search_records(data, term: str, territorial_data: dict, selected_territory: str = None, selected_tags: list = None):
-    t = term.lower() if term else ""
-    hits = []
-    
-    for r in data:
-        # Check text search in description and tags (only if there's a search term)
-        text_match = False
-        if t:
-            text_match = t in record_desc(r).lower() or t in record_tags(r).lower()
-        
-        # Check territorial search in text (only if there's a search term)
-        territory_match = False
-        if t and territorial_data:
-            photo_name = record_name(r)
-            territory_info = territorial_data.get(photo_name, {})
-            first_nation = territory_info.get('first_nation', '').lower()
-            territory_match = t in first_nation
-        
-        # Check territory filter
-        territory_filter_match = True
-        if selected_territory and selected_territory != "All Territories":
-            photo_name = record_name(r)
-            territory_info = territorial_data.get(photo_name, {})
-            actual_territory = territory_info.get('first_nation', '')
-            territory_filter_match = actual_territory == selected_territory
-        
-        # Check tag filter
-        tag_filter_match = True
-        if selected_tags:
-            record_tags_str = record_tags(r).lower()
-            # Check if any selected tag appears in the record's tags
-            tag_filter_match = any(tag.lower() in record_tags_str for tag in selected_tags)
-        
-        # Include record based on search criteria:
-        # - If there's a search term: match text/territory search AND territory filter AND tag filter
-        # - If no search term but territory/tags selected: match territory filter AND tag filter
-        if t:
-            # Text search mode: match text/territory search AND territory filter AND tag filter
-            if (text_match or territory_match) and territory_filter_match and tag_filter_match:
-                hits.append(r)
-        else:
-            # Filter-only mode: match territory filter AND tag filter
-            if territory_filter_match and tag_filter_match:
-                hits.append(r)
-    return hits
+# Operator profiling: ?profile=1&profile_key=<secret> runs this rerun under profiling.py;
+# both params are read once and dropped from the URL below
+profile_param = get_query_param("profile")
+profile_key = get_query_param("profile_key")
+profiler = None
+if profile_authorized(profile_param, profile_key, profile_secret()):
+    profiler = RunProfiler(__file__).start()
 
 # --- UI ----------------------------------------------------------------------
 st.title("Lichen Search")
@@ -171,9 +192,15 @@ initial_q = get_initial_query()
 # Load data
 with st.spinner("Loading image data…"):
     try:
-        data = load_data()
-        territorial_data = load_territorial_data()
-        st.success(f"Successfully loaded {len(data)} images")
+        # This run's catalog version; a newer one swapped in meanwhile is used from the next rerun
+        refresher = start_refresher()
+        snapshot = refresher.current
+        index = snapshot.index
+        territorial_data = snapshot.territorial_data
+        if snapshot.warning:
+            st.warning(snapshot.warning)
+        start_api_server(refresher)
+        st.success(f"Successfully loaded {len(index)} images")
         if territorial_data:
             st.success(f"Loaded territorial data for {len(territorial_data)} images")
     except Exception as e:
@@ -181,19 +208,27 @@ with st.spinner("Loading image data…"):
         st.stop()
 
 # Input
+initial_photographer = get_query_param("photographer")
+initial_territory = get_query_param("territory")
+initial_similar = get_query_param("similar")
+initial_color = get_query_param("color")
+# ?debug=1 adds the timing panel; kept in the URL like the filters
+debug_param = get_query_param("debug")
+
 with st.container():
-    col1, col2 = st.columns([3, 1])
+    col1, col2, col3 = st.columns([3, 1, 1])
     
     with col1:
         term = st.text_input(
             "🔍 Search Images", 
             value=initial_q, 
             placeholder="e.g., lichen, bark, coastal, Secwepemc (or just select a territory to the right)",
-            help="Search through image descriptions, tags, or territory names"
+            help=(
+                "Search through image descriptions, tags, or territory names. "
+                "Advanced: AND / OR / NOT, \"quoted phrases\", prefixes like bark*, and fields like "
+                "territory:Tahltan tag:fjord photographer:\"Camille Havas\""
+            )
         ).strip()
-        # Keep URL in sync so page refreshes/bookmarks preserve the query
-        if term != initial_q:
-            set_query(term)
     
     with col2:
         # Territory filter dropdown
@@ -201,20 +236,97 @@ with st.container():
         selected_territory = st.selectbox(
             "🗺️ Territory Filter",
             all_territories,
-            index=0,
+            index=all_territories.index(initial_territory) if initial_territory in all_territories else 0,
             help="Select a territory to see all images from that First Nations territory, or combine with text search"
         )
+    
+    with col3:
+        # Photographer filter dropdown
+        all_photographers = ["All Photographers"] + sorted(index.photographers)
+        selected_photographer = st.selectbox(
+            "📷 Photographer Filter",
+            all_photographers,
+            index=all_photographers.index(initial_photographer) if initial_photographer in all_photographers else 0,
+            help="Select a photographer to see only their images, or combine with other filters"
+        )
+
+# Metadata filters; only facets present in the catalog are shown
+selected_facets = {}
+available_facets = [f for f in FACET_FILTERS if index.facets.get(f[0])]
+if available_facets:
+    for facet_col, (facet, label, all_label, order) in zip(st.columns(len(FACET_FILTERS)), available_facets):
+        with facet_col:
+            values = index.facets[facet]
+            if order:
+                options = [v for v in order if v in values]
+            else:
+                options = sorted(values, reverse=True)
+            options = [all_label] + options
+            initial_value = get_query_param(facet)
+            choice = st.selectbox(
+                label,
+                options,
+                index=options.index(initial_value) if initial_value in options else 0,
+                format_func=lambda v, values=values: f"{v} ({bitmap_count(values[v])})" if v in values else v,
+            )
+            if choice != all_label:
+                selected_facets[facet] = choice
+
+# Color filter: matched against each image's dominant colors (catalog palette columns)
+initial_rgb = parse_color(initial_color)
+with st.expander("🎨 Filter by Color", expanded=initial_rgb is not None):
+    color_col1, color_col2 = st.columns([1, 3])
+    with color_col1:
+        picked_color = st.color_picker(
+            "Color",
+            value="#{:02x}{:02x}{:02x}".format(*initial_rgb) if initial_rgb else "#3a6ea5",
+            help="Pick a color; images with a similar dominant color are shown. color:#hex or color:blue also work in the search box",
+        )
+    with color_col2:
+        use_color = st.checkbox("Only show images with this color", value=initial_rgb is not None, key="use_color")
+selected_color = picked_color if use_color else ""
+
+# Keep URL in sync so page refreshes/bookmarks preserve the query and filters
+url_territory = selected_territory if selected_territory != "All Territories" else ""
+url_photographer = selected_photographer if selected_photographer != "All Photographers" else ""
+# "Find similar" applies until a search term is typed
+similarity = load_similarity()
+similar_to = initial_similar if similarity is not None and initial_similar in similarity and not term else ""
+url_params = dict(q=term, territory=url_territory, photographer=url_photographer, similar=similar_to, color=selected_color.lstrip("#"),
+                  debug=debug_param)
+url_params.update({facet: selected_facets.get(facet, "") for facet, _, _, _ in FACET_FILTERS})
+# The profiling params only apply to the run that read them above; rewriting the URL without
+# them keeps the key out of the address bar, history and every link built from url_params
+if url_params != {name: get_query_param(name) for name in url_params} or profile_param or profile_key:
+    set_query_params(**url_params)
+
+# Completions for a plain search term, with how many images each would select
+if term and not has_syntax(term):
+    completions = snapshot.suggester.complete(term, SUGGESTIONS)
+    if completions:
+        st.caption("Suggestions:")
+        for suggest_col, suggestion in zip(st.columns(SUGGESTIONS), completions):
+            with suggest_col:
+                if st.button(
+                    f"{suggestion['text']} ({suggestion['count']})",
+                    key=f"suggest_{suggestion['query']}",
+                    help=f"{suggestion['kind'].capitalize()}: search {suggestion['query']}",
+                    use_container_width=True,
+                ):
+                    set_query_params(**dict(url_params, q=suggestion["query"]))
+                    st.rerun()
 
 # Tag Filter Section
 # Get all unique tags first
-all_tags = get_all_tags(data)
+with metrics.span("get_all_tags"):
+    all_tags = sorted(index.tags)
 
 # Initialize session state for selected tags
 if 'selected_tags' not in st.session_state:
     st.session_state['selected_tags'] = []
 
 # Always expand the tag filter section to avoid closing issues
-with st.expander("🏷️ Filter by Tags", expanded=True):
+with metrics.span("tag_grid"), st.expander("🏷️ Filter by Tags", expanded=True):
     if all_tags:
         
         # Select all / Select none buttons
@@ -250,10 +362,48 @@ with st.expander("🏷️ Filter by Tags", expanded=True):
         st.info("No tags found in the dataset.")
 
 # Calculate filtered results for status card
-hits = search_records(data, term, territorial_data, selected_territory, selected_tags)
+with metrics.span("search", metrics.QUERY_SECONDS):
+    search_complete = True
+    if similar_to:
+        # Nearest neighbours in rank order, restricted to the territory/photographer/tag filters
+        neighbours = [name for name, _ in similarity.similar(similar_to, SIMILAR_CANDIDATES)]
+        allowed = index.search("", selected_territory, selected_tags, selected_photographer, selected_color, selected_facets)
+        hits = index.records_named(neighbours, allowed)[:SIMILAR_RESULTS]
+        hit_bitmap = 0
+    else:
+        stream = index.stream_search(term, selected_territory, selected_tags, selected_photographer, selected_color, selected_facets,
+                                     time_budget=SEARCH_TIME_BUDGET)
+        preview = None
+        for _ in stream:
+            if preview is None and stream.count >= PAGE_SIZE and stream.elapsed() > EARLY_RENDER_SECONDS:
+                preview = st.empty()
+                with preview.container():
+                    st.caption("First matches (still searching…)")
+                    st.markdown(grid_html(stream.take(PAGE_SIZE), territorial_data, highlight_terms(term), load_renditions(),
+                                          RENDITIONS_BASE_URL), unsafe_allow_html=True)
+        if preview is not None:
+            preview.empty()
+        search_complete = stream.complete
+        hit_bitmap = stream.bitmap
+        hits = index.records_for(hit_bitmap)
+
+    # Few exact hits for a plain term: add matches for its spelling correction
+    corrected_term = ""
+    if term and not similar_to and not has_syntax(term) and len(hits) < FUZZY_MIN_HITS:
+        correction = snapshot.fuzzy.correct(term)
+        if correction.lower() != term.lower():
+            fuzzy_bitmap = index.search(correction, selected_territory, selected_tags, selected_photographer, selected_color, selected_facets)
+            if fuzzy_bitmap & ~hit_bitmap:
+                corrected_term = correction
+                hits = hits + index.records_for(fuzzy_bitmap & ~hit_bitmap)
+                hit_bitmap |= fuzzy_bitmap
 should_show_results = (
     term or 
+    similar_to or 
     selected_territory != "All Territories" or 
+    selected_photographer != "All Photographers" or 
+    selected_color or 
+    selected_facets or 
     selected_tags
 )
 
@@ -263,15 +413,26 @@ if should_show_results:
     filter_description = []
     if term:
         filter_description.append(f"search term '{term}'")
+    if similar_to:
+        filter_description.append(f"similar to '{similar_to}'")
     if selected_territory != "All Territories":
         filter_description.append(f"territory '{selected_territory}'")
+    if selected_photographer != "All Photographers":
+        filter_description.append(f"photographer '{selected_photographer}'")
+    if selected_color:
+        filter_description.append(f"color {selected_color}")
+    for facet, value in selected_facets.items():
+        filter_description.append(f"{facet} '{value}'")
     if selected_tags:
         filter_description.append(f"{len(selected_tags)} selected tag{'s' if len(selected_tags) != 1 else ''}")
     
     filter_text = ", ".join(filter_description)
+    metrics.RESULT_COUNT.observe(len(hits))
     st.info(f"🎯 **{len(hits)} images** found matching your filters: {filter_text}")
+    if not search_complete:
+        st.warning(f"The search stopped after {SEARCH_TIME_BUDGET:.0f} seconds; these are the matches found so far. A more specific term will finish sooner.")
 else:
-    st.info("🎯 **No filters applied** - Select a search term, territory, or tags to see filtered results")
+    st.info("🎯 **No filters applied** - Select a search term, territory, photographer, or tags to see filtered results")
 
 # Content
 # Use the selected_tags and hits we already calculated above
@@ -284,8 +445,16 @@ else:
     filter_parts = []
     if term:
         filter_parts.append(f"'{term}'")
+    if similar_to:
+        filter_parts.append(f"images similar to {similar_to}")
+        st.markdown('<a href="?" target="_self">← Back to search</a>', unsafe_allow_html=True)
     if selected_territory != "All Territories":
         filter_parts.append(f"{selected_territory} territory")
+    if selected_photographer != "All Photographers":
+        filter_parts.append(f"{selected_photographer} photos")
+    if selected_color:
+        filter_parts.append(f"color {selected_color}")
+    filter_parts.extend(selected_facets.values())
     if selected_tags:
         filter_parts.append(f"{len(selected_tags)} tag(s)")
     
@@ -301,40 +470,47 @@ else:
         else:
             st.info("No results.")
     else:
-        # Display in a responsive grid
-        cols_per_row = 3
-        cols = st.columns(cols_per_row)
-
-        for i, rec in enumerate(hits):
-            c = cols[i % cols_per_row]
-            with c:
-                name = record_name(rec)
-                thumb = rec.get("thumb_url")
-                link = rec.get("image_url")
-                desc = record_desc(rec)
-                tags = record_tags(rec)
-                
-                # Get territorial information
-                territory_info = get_territorial_info(rec, territorial_data)
-
-                if thumb:
-                    st.image(thumb)
-                st.markdown(f"**{name}**")
-                
-                # Display territorial information
-                if territory_info and territory_info.get('first_nation'):
-                    st.markdown(f"🗺️ **{territory_info['first_nation']} Territory**")
-
-                # Link to original image
-                if link:
-                    # link_button is convenient, but markdown works universally
-                    st.markdown(f"[Open original]({link})")
-
-                # Highlight matches in description and tags
-                if desc:
-                    st.markdown(highlight(desc, term), unsafe_allow_html=True)
-                if tags:
-                    st.caption(highlight(f"Tags: {tags}", term), unsafe_allow_html=True)
+        marks = highlight_terms(term)
+        if corrected_term:
+            marks = marks + [corrected_term]
+            st.markdown(f"Did you mean **{corrected_term}**? Showing its matches too.")
+            if st.button(f"Search for {corrected_term}", key="did_you_mean"):
+                set_query_params(**dict(url_params, q=corrected_term))
+                st.rerun()
+
+        # Related tags come from the precomputed co-occurrence table, not a catalog rescan
+        related = [tag for tag, _ in snapshot.tag_graph.suggest(marks, selected_tags, hit_bitmap, RELATED_TAGS)]
+        if related:
+            st.markdown("🔗 **Related tags:** " + " · ".join(related))
+            if term and st.button(f"Expand search with {', '.join(related[:EXPAND_TAGS])}", key="expand_query"):
+                set_query_params(**dict(url_params, q=expand_query(term, related[:EXPAND_TAGS])))
+                st.rerun()
+
+        # Bursts of look-alike frames collapse to one card per group
+        groups = snapshot.duplicate_groups
+        shown = [(rec, 1) for rec in hits]
+        if groups and not similar_to:
+            if st.checkbox("Hide near duplicates", value=True, key="hide_duplicates",
+                           help="Show one card for each burst of nearly identical frames"):
+                shown = collapse_duplicates(hits, groups)
+                if len(shown) < len(hits):
+                    st.caption(f"Showing {len(shown)} of {len(hits)} images; {len(hits) - len(shown)} near duplicates hidden")
+
+        # One lazy-loading HTML grid per page of results
+        pages = -(-len(shown) // PAGE_SIZE)
+        page = 1
+        if pages > 1:
+            page = int(st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1))
+        page_hits = shown[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        renditions = load_renditions()
+        with metrics.span("render_results"):
+            st.markdown(
+                grid_html([rec for rec, _ in page_hits], territorial_data, marks, renditions, RENDITIONS_BASE_URL,
+                          similarity.rows if similarity is not None else (), [size for _, size in page_hits],
+                          # A search term overrides "Find similar", so its links clear q and keep the filters
+                          dict(url_params, q="")),
+                unsafe_allow_html=True,
+            )
 
 # Footer (optional)
 st.markdown(
@@ -344,4 +520,30 @@ st.markdown(
     </div>
     """,
     unsafe_allow_html=True,
-)
\ No newline at end of file
+)
+
+if profiler is not None:
+    profiler.stop()
+
+# Timing panel for ?debug=1: this run's stages, then percentiles across all runs in this process
+if debug_param:
+    with st.expander("⏱️ Timings", expanded=True):
+        st.markdown("\n".join(
+            f"{'    ' * depth}- `{stage}` " + (f"{seconds * 1000:.1f} ms" if seconds is not None else "running")
+            for stage, seconds, depth in run_trace.spans
+        ))
+        st.caption(f"This run so far: {run_trace.elapsed() * 1000:.0f} ms")
+        st.dataframe(metrics.stage_summary(), use_container_width=True, hide_index=True)
+        st.caption("Cache hit ratio: " + ", ".join(f"{cache} {ratio:.0%}" for cache, ratio in metrics.cache_hit_ratios().items()))
+
+metrics.finish_run(run_trace)
+
+if profiler is not None:
+    with st.expander("🔬 Profile", expanded=True):
+        st.caption(f"{profiler.elapsed * 1000:.0f} ms profiled, {profiler.samples} stack samples")
+        st.markdown("**Hot functions** (cProfile, by own time)")
+        st.dataframe(profiler.top_functions(), use_container_width=True, hide_index=True)
+        st.markdown("**Flame graph** (sampled; hover a frame for its share)")
+        st.markdown(f'<div style="overflow-x:auto">{profiler.flame_svg()}</div>', unsafe_allow_html=True)
+        st.markdown("**Allocations still alive at the end of the run** (tracemalloc diff)")
+        st.dataframe(profiler.allocations(), use_container_width=True, hide_index=True)
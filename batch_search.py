@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Run many searches against the catalog in one go and stream the results as JSON Lines.
+
+The catalog and territorial mapping are loaded and indexed once; queries are evaluated by
+lichen_search.SearchIndex (the semantics of search_records, including the query language)
+in a pool of worker processes, and written in input order as soon as each batch is done.
+
+Each input line is one query, either a plain search term:
+    cedar
+    photographer:"Camille Havas" AND fjord
+or a JSON object with the app's filters (all keys optional):
+    {"id": "r-17", "term": "cedar", "territory": "Squamish", "tags": ["forest"],
+     "photographer": "Camille Havas", "color": "green", "facets": {"orientation": "landscape"}}
+
+Each output line echoes the query (and its id, if any) with the number of matches and the
+matching photo names in catalog order, or the full records with --records:
+    {"line": 1, "term": "cedar", "count": 12, "names": ["CamilleHavasBC-10", ...]}
+A line that is not valid JSON, or has a field of the wrong type, gets {"line": N, "error": "..."}
+and the batch carries on.
+
+Usage:
+    python batch_search.py [QUERIES] [--catalog PATH] [--territories PATH] [--jobs N]
+                           [--limit N] [--records] [--out PATH]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from lichen_search import SearchIndex, bitmap_count, bitmap_to_ids, record_name
+
+CATALOG_PATH = 'LichenThumbnail/images_for_squarespace_githubthumbs.json'
+TERRITORIAL_PATH = 'LichenThumbnail/territorial_mapping.json'
+# Queries per task sent to a worker: large enough that pickling is not the bottleneck
+BATCH_SIZE = 256
+# Batches queued per worker, so output keeps flowing without reading all input up front
+BATCHES_IN_FLIGHT = 2
+QUERY_KEYS = ("term", "territory", "tags", "photographer", "color", "facets")
+STRING_KEYS = ("term", "territory", "photographer", "color")
+
+# Worker state: (SearchIndex, --limit, --records)
+_worker = None
+
+
+def _init_worker(index, limit, full_records):
+    global _worker
+    _worker = (index, limit, full_records)
+
+
+def parse_line(number: int, line: str) -> dict:
+    """The query on one input line: a plain term, or a JSON object with QUERY_KEYS and an id"""
+    line = line.strip()
+    if not line.startswith('{'):
+        return {'line': number, 'term': line}
+    query = json.loads(line)
+    unknown = set(query) - set(QUERY_KEYS) - {'id'}
+    if unknown:
+        raise ValueError(f"Unknown keys: {', '.join(sorted(unknown))}")
+    # null leaves a filter unset; an id may also be a number
+    if not isinstance(query.get('id'), (str, int, float, type(None))):
+        raise ValueError("id must be a string or a number")
+    for key in STRING_KEYS:
+        if not isinstance(query.get(key), (str, type(None))):
+            raise ValueError(f"{key} must be a string")
+    tags = query.get('tags')
+    if tags is not None and not (isinstance(tags, list) and all(isinstance(t, str) for t in tags)):
+        raise ValueError("tags must be a list of strings")
+    facets = query.get('facets')
+    if facets is not None and not (isinstance(facets, dict) and all(isinstance(v, str) for v in facets.values())):
+        raise ValueError("facets must be an object of strings")
+    return {'line': number, **query}
+
+
+def run_query(index: SearchIndex, query: dict, limit: int = None, full_records: bool = False) -> dict:
+    """query with count and names (or records) added, as written to the output"""
+    bitmap = index.search(*(query.get(key) for key in QUERY_KEYS))
+    ids = bitmap_to_ids(bitmap) if limit is None else list(islice(bitmap_to_ids(bitmap), limit))
+    records = [index.records[i] for i in ids]
+    result = dict(query, count=bitmap_count(bitmap))
+    if full_records:
+        result['records'] = records
+    else:
+        result['names'] = [record_name(rec) for rec in records]
+    return result
+
+
+def run_batch(lines) -> str:
+    """Output for a batch of (line number, text) pairs, serialized in the worker"""
+    index, limit, full_records = _worker
+    out = []
+    for number, line in lines:
+        try:
+            result = run_query(index, parse_line(number, line), limit, full_records)
+        except Exception as e:
+            # One bad query must not cost the rest of the report
+            result = {'line': number, 'error': str(e) or type(e).__name__}
+        out.append(json.dumps(result, ensure_ascii=False))
+    return ''.join(line + '\n' for line in out)
+
+
+def read_batches(stream, size: int = BATCH_SIZE):
+    """[(line number, text)] lists of up to size non-blank lines"""
+    numbered = ((n, line) for n, line in enumerate(stream, 1) if line.strip())
+    while True:
+        batch = list(islice(numbered, size))
+        if not batch:
+            return
+        yield batch
+
+
+def run_parallel(batches, jobs: int, out):
+    """Write run_batch output for every batch in order, with jobs worker processes"""
+    # Forked workers inherit the index built in this process instead of unpickling a copy
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=_init_worker, initargs=_worker) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(run_batch, batch))
+            if len(pending) >= jobs * BATCHES_IN_FLIGHT:
+                out.write(pending.popleft().result())
+        while pending:
+            out.write(pending.popleft().result())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a file of searches and write the matches as JSON Lines")
+    parser.add_argument('queries', nargs='?', default='-', help="Query file, one per line (default: stdin)")
+    parser.add_argument('--catalog', default=CATALOG_PATH, help="Catalog JSON")
+    parser.add_argument('--territories', default=TERRITORIAL_PATH, help="Territorial mapping JSON")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Worker processes (1 searches in this process)")
+    parser.add_argument('--limit', type=int, default=None, help="At most this many names (or records) per query; count is always the total")
+    parser.add_argument('--records', action='store_true', help="Write the full matching records instead of photo names")
+    parser.add_argument('--out', default='-', help="Output path (default: stdout)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(args.catalog, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    territorial_data = {}
+    if os.path.exists(args.territories):
+        with open(args.territories, 'r', encoding='utf-8') as f:
+            territorial_data = json.load(f)
+    else:
+        print(f"No territorial mapping at {args.territories}; territory filters will match nothing", file=sys.stderr)
+    _init_worker(SearchIndex(data, territorial_data), args.limit, args.records)
+    loaded = time.perf_counter() - start
+
+    queries = sys.stdin if args.queries == '-' else open(args.queries, 'r', encoding='utf-8')
+    out = sys.stdout if args.out == '-' else open(args.out, 'w', encoding='utf-8')
+    count = 0
+
+    def counted(batches):
+        nonlocal count
+        for batch in batches:
+            count += len(batch)
+            yield batch
+
+    start = time.perf_counter()
+    try:
+        if args.jobs > 1:
+            run_parallel(counted(read_batches(queries)), args.jobs, out)
+        else:
+            for batch in counted(read_batches(queries)):
+                out.write(run_batch(batch))
+    finally:
+        if queries is not sys.stdin:
+            queries.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else 0.0
+    print(f"{count:,} queries against {len(data):,} records in {elapsed:.2f}s ({rate:,.0f}/s; "
+          f"catalog loaded in {loaded:.2f}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
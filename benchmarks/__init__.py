@@ -0,0 +1,4 @@
+# benchmarks
+# Offline performance checks for the search helpers
+# - synthetic.py: catalogs and territorial mappings shaped like the LichenThumbnail files, any size
+# - bench_search.py: times search and filter functions on them and compares against a baseline
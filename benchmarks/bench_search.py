@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Time the search and filter helpers on synthetic catalogs and flag regressions.
+
+For each catalog size this times:
+  get_all_territories, get_all_tags, get_all_photographers   filter option lists
+  search_records        the linear scan, over the plain-term part of the query mix
+  index_build           SearchIndex construction
+  index_delta           diffing a catalog with DELTA_CHANGES edits against the index and applying it
+  index_search          SearchIndex.search_records over the whole mix, with a cold term cache
+  highlight             highlighting the first page of descriptions for every query
+
+Every timing is the fastest of a few repetitions. With a baseline, each one is compared
+with the saved value after scaling by a CPU calibration loop run just before that size (so
+a slower or busier machine isn't a regression), and the run exits with status 1 when any
+is more than --threshold slower. With --require-baseline (for CI) the run also exits with
+status 1 when there is no baseline or a timing has no baseline value, so the gate cannot pass
+by having nothing to compare with. Save the baseline on the machine that runs the gate, for
+the sizes it runs, and commit it as benchmarks/baseline.json.
+Everything runs offline on catalogs from benchmarks.synthetic.
+
+Usage:
+    python -m benchmarks.bench_search [--sizes 1000,10000] [--baseline PATH] [--save-baseline PATH]
+                                      [--threshold 0.25] [--repeat N] [--json PATH] [--require-baseline]
+    python -m benchmarks.bench_search --sizes 1000,10000,100000 --save-baseline      # once, on the CI machine
+    python -m benchmarks.bench_search --sizes 1000,10000,100000 --require-baseline   # every CI run
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from lichen_query import has_syntax, highlight_terms
+from lichen_search import (
+    SearchIndex, diff_catalog, get_all_photographers, get_all_tags, get_all_territories, highlight,
+    record_desc, search_records,
+)
+
+from benchmarks.synthetic import DEFAULT_SEED, SIZES, generate
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_REPEAT = 5
+# Stop repeating once one operation has used this many seconds
+TIME_BUDGET = 3.0
+# Changes smaller than this are timer noise whatever the ratio
+NOISE_FLOOR = 0.0005
+# Calibration is short, so it takes the best of more runs than the benchmarks
+CALIBRATION_REPEAT = 15
+# Descriptions highlighted per query, as on one page of results
+HIGHLIGHT_PAGE = 48
+# Records updated, inserted and deleted (each) in the index_delta catalog
+DELTA_CHANGES = 10
+
+# (term, territory, tags, photographer): typed words, partial words, misses,
+# filter-only browsing and the query language, roughly as seen in the app
+QUERY_MIX = (
+    ("sitka spruce", None, None, None),
+    ("cedar", None, None, None),
+    ("Secwepemc", None, None, None),
+    ("gl", None, None, None),
+    ("moth", None, None, None),
+    ("xylophone", None, None, None),
+    ("", "Nuchatlaht", None, None),
+    ("", None, ["fjord", "glacier"], None),
+    ("", None, None, "Christopher Brown"),
+    ("salmon", "Tahltan", None, None),
+    ("forest", None, ["douglas fir"], "Troy Moth"),
+    ('tag:glacier AND territory:Klahoose', None, None, None),
+    ('(fjord OR glacier) -salmon', None, None, None),
+    ('"old growth" cedar*', None, None, None),
+)
+
+
+def plain_queries():
+    """The part of the mix search_records understands (no query syntax)"""
+    return [q for q in QUERY_MIX if not has_syntax(q[0])]
+
+
+def edited_catalog(data, changes=DELTA_CHANGES):
+    """data with changes records updated, changes inserted and changes deleted, spread evenly"""
+    step = max(1, len(data) // (2 * changes + 1))
+    edited = list(data)
+    for k in range(changes):
+        i = (2 * k + 1) * step
+        edited[i] = dict(edited[i], description=record_desc(edited[i]) + " (edited)")
+    for k in range(changes):
+        edited.append(dict(data[k * step], photo_name=f"DELTA{k:04d}"))
+    deleted = {(2 * k + 2) * step for k in range(changes)}
+    return [rec for i, rec in enumerate(edited) if i not in deleted]
+
+
+def measure(fn, repeat=DEFAULT_REPEAT, setup=None):
+    """Fastest of up to repeat runs of fn(), fewer if they exceed TIME_BUDGET"""
+    best = float('inf')
+    spent = 0.0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+        if spent > TIME_BUDGET:
+            break
+    return best
+
+
+def calibrate(repeat=CALIBRATION_REPEAT):
+    """Seconds for a fixed pure-Python workload, used to compare runs across machines"""
+    def work():
+        words = [f"word{i % 997}" for i in range(200_000)]
+        counts = {}
+        for w in words:
+            counts[w] = counts.get(w, 0) + 1
+        sorted(words)
+        "".join(words).find("word998")
+    return measure(work, repeat)
+
+
+def bench_size(size, seed=DEFAULT_SEED, repeat=DEFAULT_REPEAT):
+    """{operation: seconds} for one synthetic catalog"""
+    data, territorial_data = generate(size, seed)
+    results = {}
+
+    results['get_all_territories'] = measure(lambda: get_all_territories(territorial_data), repeat)
+    results['get_all_tags'] = measure(lambda: get_all_tags(data), repeat)
+    results['get_all_photographers'] = measure(lambda: get_all_photographers(data), repeat)
+
+    plain = plain_queries()
+
+    def linear():
+        for term, territory, tags, photographer in plain:
+            search_records(data, term, territorial_data, territory, tags, photographer)
+    results['search_records'] = measure(linear, repeat)
+
+    results['index_build'] = measure(lambda: SearchIndex(data, territorial_data), repeat)
+    index = SearchIndex(data, territorial_data)
+    edited = edited_catalog(data)
+    results['index_delta'] = measure(lambda: index.apply_delta(diff_catalog(index, edited, territorial_data)), repeat)
+
+    pages = []
+
+    def indexed():
+        pages.clear()
+        for term, territory, tags, photographer in QUERY_MIX:
+            pages.append((term, index.search_records(term, territory, tags, photographer)[:HIGHLIGHT_PAGE]))
+    results['index_search'] = measure(indexed, repeat, setup=index._substring_cache.clear)
+
+    def highlight_pages():
+        for term, hits in pages:
+            marks = highlight_terms(term)
+            for rec in hits:
+                highlight(record_desc(rec), marks)
+    results['highlight'] = measure(highlight_pages, repeat)
+    return results
+
+
+def compare(results, calibration, baseline, threshold):
+    """[(size, operation, seconds, baseline seconds, change, regressed)]"""
+    rows = []
+    for size, ops in results.items():
+        base_calibration = baseline.get('calibration', {}).get(size)
+        scale = calibration[size] / base_calibration if base_calibration else 1.0
+        for op, seconds in ops.items():
+            base = baseline.get('results', {}).get(size, {}).get(op)
+            if base is None:
+                rows.append((size, op, seconds, None, None, False))
+                continue
+            expected = base * scale
+            change = seconds / expected - 1 if expected else 0.0
+            regressed = change > threshold and seconds - expected > NOISE_FLOOR
+            rows.append((size, op, seconds, expected, change, regressed))
+    return rows
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return '-'
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds:.2f} s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search helpers on synthetic catalogs")
+    parser.add_argument('--sizes', default=",".join(str(s) for s in SIZES), help="Comma-separated catalog sizes")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Synthetic catalog seed")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Repetitions per timing (fastest is kept)")
+    parser.add_argument('--baseline', default=None, help=f"Baseline JSON to compare against (default: {BASELINE_PATH} if present)")
+    parser.add_argument('--save-baseline', nargs='?', const=BASELINE_PATH, default=None,
+                        help=f"Write this run as the new baseline (default path: {BASELINE_PATH})")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown, as a fraction")
+    parser.add_argument('--json', default=None, help="Also write the results to this path")
+    parser.add_argument('--require-baseline', action='store_true',
+                        help="Fail when there is no baseline or a timing has nothing to compare with (for CI)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    print(f"Python {platform.python_version()}")
+
+    results, calibration = {}, {}
+    for size in sizes:
+        start = time.perf_counter()
+        calibration[str(size)] = calibrate()
+        results[str(size)] = bench_size(size, args.seed, args.repeat)
+        print(f"  {size:>9,} records benchmarked in {time.perf_counter() - start:.1f} s"
+              f" (calibration {format_seconds(calibration[str(size)])})")
+
+    baseline = {}
+    baseline_path = args.baseline or (BASELINE_PATH if os.path.exists(BASELINE_PATH) else None)
+    if baseline_path:
+        print(f"\nComparing with {baseline_path}")
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    rows = compare(results, calibration, baseline, args.threshold)
+
+    print(f"\n{'size':>9}  {'operation':<22} {'time':>10} {'baseline':>10} {'change':>8}")
+    for size, op, seconds, expected, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        change_text = '-' if change is None else f"{change:+.0%}"
+        print(f"{int(size):>9,}  {op:<22} {format_seconds(seconds):>10} {format_seconds(expected):>10} {change_text:>8}{flag}")
+
+    report = {
+        'calibration': calibration,
+        'python': platform.python_version(),
+        'seed': args.seed,
+        'results': results,
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"\nWrote {path}")
+
+    failed = False
+    if args.require_baseline:
+        missing = [(size, op) for size, op, _, expected, _, _ in rows if expected is None]
+        if not baseline_path:
+            print(f"\nNo baseline: {BASELINE_PATH} does not exist and --baseline was not given")
+            failed = True
+        elif missing:
+            print(f"\nNo baseline for {len(missing)} timing(s), e.g. {missing[0][1]} at {int(missing[0][0]):,} records;"
+                  f" run the baseline's sizes or save a new baseline")
+            failed = True
+    if any(row[-1] for row in rows):
+        print(f"\nRegression: at least one timing is more than {args.threshold:.0%} slower than the baseline")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
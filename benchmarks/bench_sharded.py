@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Measure search throughput of sharded_search.ShardedSearch against one in-process SearchIndex.
+
+Each client thread runs the bench_search query mix for a number of rounds, asking for the
+first page of highlighted results and the total, as the app does for every search. The
+in-process index is measured with the same clients (which then share one GIL); each
+shard count gets a fresh pool. Before timing, every query's first page is checked against
+SearchIndex.search_records. Throughput can only scale up to the machine's core count.
+
+Usage:
+    python -m benchmarks.bench_sharded [--size 100000] [--shards 1,2,4] [--clients 4]
+                                       [--rounds 3] [--json PATH]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+from lichen_query import highlight_terms
+from lichen_search import SearchIndex, bitmap_count, bitmap_to_ids, highlight, record_desc
+from sharded_search import ShardedSearch
+
+from benchmarks.bench_search import HIGHLIGHT_PAGE, QUERY_MIX
+from benchmarks.synthetic import DEFAULT_SEED, generate
+
+DEFAULT_SIZE = 100_000
+DEFAULT_CLIENTS = 4
+DEFAULT_ROUNDS = 3
+
+
+def local_search(index):
+    def search(term, territory, tags, photographer):
+        bitmap = index.search(term, territory, tags, photographer)
+        marks = highlight_terms(term)
+        page = [index.records[i] for i in bitmap_to_ids(bitmap)[:HIGHLIGHT_PAGE]]
+        return bitmap_count(bitmap), [(rec, highlight(record_desc(rec), marks)) for rec in page]
+    return search
+
+
+def sharded_search(sharded):
+    def search(term, territory, tags, photographer):
+        return sharded.search_highlighted(term, territory, tags, photographer, limit=HIGHLIGHT_PAGE)
+    return search
+
+
+def throughput(search, clients, rounds):
+    """Queries per second with clients threads each running the query mix rounds times"""
+    def client():
+        for _ in range(rounds):
+            for query in QUERY_MIX:
+                search(*query)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return clients * rounds * len(QUERY_MIX) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sharded parallel search")
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE, help="Synthetic catalog size")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Synthetic catalog seed")
+    parser.add_argument('--shards', default=None, help="Comma-separated shard counts (default: 1,2,4 up to the core count)")
+    parser.add_argument('--clients', type=int, default=DEFAULT_CLIENTS, help="Concurrent client threads")
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS, help="Query mix repetitions per client")
+    parser.add_argument('--json', default=None, help="Also write the results to this path")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    if args.shards:
+        levels = [int(s) for s in args.shards.split(',') if s.strip()]
+    else:
+        levels = sorted({n for n in (1, 2, 4, 8) if n <= cores} | {cores})
+    data, territorial_data = generate(args.size, args.seed)
+    print(f"{args.size:,} records, {cores} cores, {args.clients} clients")
+
+    index = SearchIndex(data, territorial_data)
+    local = local_search(index)
+    # Both sides are timed with warm term caches (the sharded side warms up in the check below)
+    for query in QUERY_MIX:
+        local(*query)
+    base = throughput(local, args.clients, args.rounds)
+    results = [{'shards': 0, 'queries_per_s': base}]
+    print(f"\n{'shards':>8} {'start s':>8} {'queries/s':>10} {'speedup':>8}")
+    print(f"{'local':>8} {'-':>8} {base:>10.1f} {1.0:>7.2f}x")
+
+    for shards in levels:
+        start = time.perf_counter()
+        with ShardedSearch(data, territorial_data, shards) as sharded:
+            started = time.perf_counter() - start
+            search = sharded_search(sharded)
+            for query in QUERY_MIX:
+                if search(*query) != local(*query):
+                    raise SystemExit(f"Sharded results differ from SearchIndex for {query}")
+            qps = throughput(search, args.clients, args.rounds)
+        results.append({'shards': shards, 'start_seconds': started, 'queries_per_s': qps})
+        print(f"{shards:>8} {started:>8.1f} {qps:>10.1f} {qps / base:>7.2f}x")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'size': args.size, 'cores': cores, 'clients': args.clients, 'results': results}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Drive concurrent simulated sessions through the Streamlit app and measure rerun latency.
+
+Each session is a streamlit.testing AppTest. By default every session runs in its own
+process, like visitors spread over that many app workers (one shared catalog build each,
+see shared_catalog.py): they compete for the machine's cores, but not for a GIL or AppTest's
+process-wide state, which is not safe to share between concurrent AppTests. --threads puts
+all sessions on threads of one process instead, sharing the GIL and the st.cache_* stores as
+visitors to one server process do, but AppTest then fails intermittently (a KeyError for an
+element id, or "Runtime hasn't been created!" from one of its threads).
+
+A session repeatedly types a query, toggles a tag checkbox, switches the territory filter or
+clears the search, and every action is one timed rerun. requests.get is replaced by a stub
+serving the catalog files from disk (the repo's LichenThumbnail copies, or a synthetic
+catalog with --synthetic), so nothing touches the network; optional downloads (renditions,
+image features) fail as they do when those files are not published. As on the server, the
+sessions of a process share one compiled copy of the script (AppTest alone would recompile
+it on every rerun). Every process fills its caches with one untimed run before the level
+starts, so levels measure warm reruns.
+
+For each session count it reports rerun latency percentiles, throughput, CPU use (CPU
+seconds of all session processes per wall second) and resident memory, then the largest
+count whose p95 stays under --target-p95: the number of concurrent active visitors the
+machine can serve. Memory is per process: with --threads the RSS of the one process all
+sessions share, otherwise the largest RSS of a session process (not a per-session figure
+either way, and not a sum, since processes share pages).
+
+Errors are counted in two kinds: app errors are exceptions the script raised (at.exception),
+harness errors come from AppTest itself. A failed action is dropped and the session carries
+on with a fresh AppTest, but its latency sample is then incomplete, so a level with errors of
+either kind is left out of the capacity estimate.
+
+Usage:
+    python -m benchmarks.load_app [--script app.py] [--sessions 1,2,4,8] [--actions 20]
+                                  [--synthetic N] [--threads] [--target-p95 MS] [--json PATH]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+import requests
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.synthetic import generate
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(REPO_DIR, 'LichenThumbnail')
+CATALOG_FILE = 'images_for_squarespace_githubthumbs.json'
+TERRITORIAL_FILE = 'territorial_mapping.json'
+
+DEFAULT_SESSIONS = (1, 2, 4, 8)
+DEFAULT_ACTIONS = 20
+DEFAULT_TARGET_P95_MS = 1000.0
+RERUN_TIMEOUT = 120
+
+QUERIES = (
+    "lichen", "bark", "cedar", "sitka spruce", "Secwepemc", "Nuchatlaht", "fjord", "glacier",
+    "tidepool", "moth", "old growth", "Secwepmec", "forest", "salmon", "tag:fjord", "alpine OR glacier",
+)
+# Relative frequency of each action
+ACTIONS = (("type", 5), ("tag", 3), ("territory", 2), ("clear", 1))
+
+# The program's own __main__, before any AppTest replaces it
+MAIN_MODULE = sys.modules['__main__']
+
+
+class StubResponse:
+    """The parts of requests.Response the app uses"""
+
+    def __init__(self, url, content):
+        self.url = url
+        self.content = content
+        self.status_code = 200
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class StubFetcher:
+    """requests.get replacement serving files by URL suffix; anything else fails like a 404"""
+
+    def __init__(self, files):
+        self.files = files
+
+    def __call__(self, url, *args, **kwargs):
+        for suffix, content in self.files.items():
+            if url.endswith(suffix):
+                return StubResponse(url, content)
+        raise requests.HTTPError(f"404 Client Error: not stubbed: {url}")
+
+
+def catalog_files(synthetic=None, seed=1):
+    """{url suffix: bytes} for the catalog and territorial mapping"""
+    if synthetic:
+        data, territorial_data = generate(synthetic, seed)
+        return {
+            CATALOG_FILE: json.dumps(data).encode('utf-8'),
+            TERRITORIAL_FILE: json.dumps(territorial_data).encode('utf-8'),
+        }
+    files = {}
+    for name in (CATALOG_FILE, TERRITORIAL_FILE):
+        with open(os.path.join(DATA_DIR, name), 'rb') as f:
+            files[name] = f.read()
+    return files
+
+
+def rss_mb():
+    """Current resident set size of this process in MB, all sessions together (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of values (p in 0-100)"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+@contextmanager
+def stubbed(files):
+    """requests.get served from files, and one ScriptCache for every AppTest in this process"""
+    script_cache = ScriptCache()
+    with mock.patch('requests.get', StubFetcher(files)), \
+            mock.patch('streamlit.testing.v1.local_script_runner.ScriptCache', lambda: script_cache):
+        yield
+
+
+@contextmanager
+def thread_errors():
+    """Collects uncaught exceptions from other threads (AppTest's own) into the yielded list"""
+    errors = []
+    previous_hook = threading.excepthook
+    threading.excepthook = lambda args: errors.append(repr(args.exc_value))
+    try:
+        yield errors
+    finally:
+        threading.excepthook = previous_hook
+
+
+def new_session(script):
+    at = AppTest.from_file(os.path.join(REPO_DIR, script), default_timeout=RERUN_TIMEOUT)
+    at.run()
+    return at
+
+
+def territory_box(at):
+    return next(box for box in at.selectbox if box.label.startswith("🗺️"))
+
+
+class Session:
+    """One simulated visitor; run() performs its actions and records each rerun's latency"""
+
+    def __init__(self, script, actions, seed):
+        self.script = script
+        self.actions = actions
+        self.rng = random.Random(seed)
+        self.latencies = []
+        # Exceptions raised by the app script, and by AppTest itself
+        self.app_errors = []
+        self.harness_errors = []
+
+    def step(self, at):
+        kind = self.rng.choices([a for a, _ in ACTIONS], [w for _, w in ACTIONS])[0]
+        if kind == "type":
+            at.text_input[0].input(self.rng.choice(QUERIES))
+        elif kind == "clear":
+            at.text_input[0].input("")
+        elif kind == "tag":
+            boxes = [box for box in at.checkbox if box.key and box.key.startswith("tag_")]
+            if not boxes:
+                return
+            box = self.rng.choice(boxes)
+            box.uncheck() if box.value else box.check()
+        else:
+            box = territory_box(at)
+            box.select(self.rng.choice(box.options))
+        start = time.perf_counter()
+        at.run()
+        self.latencies.append(time.perf_counter() - start)
+        if at.exception:
+            self.app_errors.append(at.exception[0].message)
+
+    def run(self):
+        at = None
+        for _ in range(self.actions):
+            try:
+                if at is None:
+                    at = new_session(self.script)
+                self.step(at)
+            except Exception as e:
+                self.harness_errors.append(repr(e))
+                # The AppTest may be left half-updated; continue on a fresh one
+                at = None
+
+
+def session_process(script, actions, seed, files, barrier, results):
+    """One session in its own process: warm up, wait for the others, run, report"""
+    stats = {'latencies': [], 'app_errors': [], 'harness_errors': [], 'cpu': 0.0, 'rss_mb': 0.0}
+    try:
+        with stubbed(files), thread_errors() as errors:
+            new_session(script)
+            barrier.wait()
+            session = Session(script, actions, seed)
+            cpu_start = time.process_time()
+            session.run()
+            stats.update(latencies=session.latencies, app_errors=session.app_errors,
+                         harness_errors=session.harness_errors + errors, cpu=time.process_time() - cpu_start)
+    except Exception as e:
+        stats['harness_errors'].append(repr(e))
+        barrier.abort()
+    stats['rss_mb'] = rss_mb()
+    results.put(stats)
+
+
+def run_level_processes(script, sessions, actions, seed, files):
+    """(wall seconds, per-session stats) with each session in a spawned process"""
+    # spawn: a forked copy of this process's AppTest and streamlit threads is not safe to use
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(sessions + 1)
+    results = context.Queue()
+    procs = [context.Process(target=session_process, name=f"session-{i}",
+                             args=(script, actions, seed * 1000 + i, files, barrier, results))
+             for i in range(sessions)]
+    # AppTest leaves the app script registered as __main__, which spawn would re-run in every
+    # child; start them with the real main module in place
+    app_main, sys.modules['__main__'] = sys.modules['__main__'], MAIN_MODULE
+    try:
+        for proc in procs:
+            proc.start()
+    finally:
+        sys.modules['__main__'] = app_main
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        # A session failed to start; the others run anyway and the level is disqualified
+        pass
+    wall_start = time.perf_counter()
+    stats = []
+    for _ in procs:
+        try:
+            stats.append(results.get(timeout=RERUN_TIMEOUT * (actions + 1)))
+        except queue.Empty:
+            # A session process died without reporting
+            stats.append({'latencies': [], 'app_errors': [], 'harness_errors': ["session process did not report"],
+                          'cpu': 0.0, 'rss_mb': 0.0})
+            break
+    wall = time.perf_counter() - wall_start
+    for proc in procs:
+        proc.join(RERUN_TIMEOUT)
+        if proc.is_alive():
+            proc.terminate()
+    return wall, stats
+
+
+def run_level_threads(script, sessions, actions, seed):
+    """(wall seconds, per-session stats) with every session on a thread of this process"""
+    workers = [Session(script, actions, seed * 1000 + i) for i in range(sessions)]
+    threads = [threading.Thread(target=w.run, name=f"session-{i}") for i, w in enumerate(workers)]
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    with thread_errors() as errors:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    stats = [{'latencies': w.latencies, 'app_errors': w.app_errors, 'harness_errors': w.harness_errors,
+              'cpu': 0.0, 'rss_mb': 0.0} for w in workers]
+    # Uncaught exceptions in AppTest's own threads are harness errors too
+    stats[0]['harness_errors'] = stats[0]['harness_errors'] + errors
+    stats[0].update(cpu=cpu, rss_mb=rss_mb())
+    return wall, stats
+
+
+def level_summary(sessions, wall, stats):
+    """Stats for one session count from its sessions' stats"""
+    latencies = [l for s in stats for l in s['latencies']]
+    app_errors = [e for s in stats for e in s['app_errors']]
+    harness_errors = [e for s in stats for e in s['harness_errors']]
+    cpu = sum(s['cpu'] for s in stats)
+    return {
+        'sessions': sessions,
+        'reruns': len(latencies),
+        'app_errors': len(app_errors),
+        'first_app_error': app_errors[0] if app_errors else None,
+        'harness_errors': len(harness_errors),
+        'first_harness_error': harness_errors[0] if harness_errors else None,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'reruns_per_s': len(latencies) / wall if wall else 0.0,
+        'cpu_util': cpu / wall if wall else 0.0,
+        'rss_mb': max(s['rss_mb'] for s in stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Streamlit app with simulated sessions")
+    parser.add_argument('--script', default='streamlit_app.py', help="App script, relative to the repo")
+    parser.add_argument('--sessions', default=",".join(str(s) for s in DEFAULT_SESSIONS), help="Comma-separated session counts")
+    parser.add_argument('--actions', type=int, default=DEFAULT_ACTIONS, help="Reruns per session")
+    parser.add_argument('--synthetic', type=int, default=None, help="Serve a synthetic catalog of this many records")
+    parser.add_argument('--seed', type=int, default=1, help="Seed for the synthetic catalog and session actions")
+    parser.add_argument('--threads', action='store_true', help="Run all sessions on threads of one process")
+    parser.add_argument('--target-p95', type=float, default=DEFAULT_TARGET_P95_MS, help="Latency target for the capacity estimate (ms)")
+    parser.add_argument('--json', default=None, help="Also write the results to this path")
+    args = parser.parse_args()
+
+    levels = [int(s) for s in args.sessions.split(',') if s.strip()]
+    files = catalog_files(args.synthetic, args.seed)
+    results = []
+    with stubbed(files):
+        # Check the app starts, and fill this process's caches for --threads
+        start = time.perf_counter()
+        warm = new_session(args.script)
+        if warm.exception:
+            sys.exit(f"App failed to start: {warm.exception[0].message}")
+        print(f"Cold start: {time.perf_counter() - start:.2f} s, RSS {rss_mb():.0f} MB")
+
+        print(f"\n{'sessions':>8} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'reruns/s':>9} {'CPU':>6} {'RSS MB':>7}")
+        for sessions in levels:
+            if args.threads:
+                wall, stats = run_level_threads(args.script, sessions, args.actions, args.seed)
+            else:
+                wall, stats = run_level_processes(args.script, sessions, args.actions, args.seed, files)
+            stats = level_summary(sessions, wall, stats)
+            results.append(stats)
+            print(f"{sessions:>8} {stats['reruns']:>7} {stats['p50_ms']:>8.0f} {stats['p95_ms']:>8.0f} {stats['p99_ms']:>8.0f}"
+                  f" {stats['reruns_per_s']:>9.1f} {stats['cpu_util']:>6.0%} {stats['rss_mb']:>7.0f}")
+            if stats['app_errors']:
+                print(f"         {stats['app_errors']} app errors, first: {stats['first_app_error']}")
+            if stats['harness_errors']:
+                print(f"         {stats['harness_errors']} harness errors (actions dropped), first: {stats['first_harness_error']}")
+
+    # A level with dropped actions only measured the reruns that survived
+    within = [r['sessions'] for r in results
+              if r['p95_ms'] <= args.target_p95 and not r['app_errors'] and not r['harness_errors']]
+    if within:
+        print(f"\nCapacity: {max(within)} concurrent sessions with p95 under {args.target_p95:.0f} ms")
+    else:
+        print(f"\nCapacity: no tested session count ran without errors and kept p95 under {args.target_p95:.0f} ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'script': args.script, 'synthetic': args.synthetic, 'actions': args.actions,
+                       'isolation': 'threads' if args.threads else 'processes',
+                       'target_p95_ms': args.target_p95, 'levels': results}, f, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic catalogs shaped like images_for_squarespace_githubthumbs.json and
+territorial_mapping.json, for benchmarking without the network or the real data.
+
+Shapes follow the published catalog: the credit-line description templates, 0-5 clip tags
+per photo drawn from a skewed vocabulary, a few dominant photographers, and about two
+thirds of photos mapped to a nation. Vocabularies grow with the catalog (roughly with its
+square root) so large catalogs don't collapse onto a handful of tags. The same size and
+seed always produce the same files.
+
+Usage:
+    python -m benchmarks.synthetic --size 10000 [--seed N] [--out DIR]
+"""
+
+import argparse
+import json
+import os
+import random
+from itertools import accumulate
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_SEED = 1
+
+TAGS = (
+    "sitka spruce", "tidepool", "fishing", "douglas fir", "western red cedar", "fjord", "alpine",
+    "landslide", "steelhead", "yellow cedar", "glacier", "avalanche", "mountain", "backpacking",
+    "sphagnum", "forest", "salmon", "western hemlock", "peninsula", "skunk cabbage", "lake",
+    "rainforest", "driftwood", "bark", "mountain hemlock", "subalpine fir", "autumn leaves",
+    "hiking trail", "fireweed", "canoe", "salal", "garry oak", "bog", "arbutus", "roots", "lookout",
+    "lichen", "sunrise", "old growth", "lodgepole pine", "estuary", "kelp", "river", "moss",
+    "waterfall", "clearcut", "logging road", "wolf", "bear", "eagle", "orca", "herring", "cedar bark",
+)
+TAG_QUALIFIERS = ("coastal", "northern", "misty", "burnt", "second growth", "winter", "alpine", "river")
+
+NATIONS = (
+    "Nuchatlaht", "Secwepemc", "Klahoose", "Taku River Tlingit", "Tahltan", "Gitxsan",
+    "Mowachaht/Muchalaht", "Nisga'a", "Musqueam, Tsleil-Waututh, Squamish", "Haida", "Heiltsuk",
+    "Kwakwaka'wakw", "Nuxalk", "Wet'suwet'en", "Ktunaxa", "Syilx", "Stó:lō", "Tla'amin",
+    "Homalco", "Lil'wat", "St'át'imc", "Tsilhqot'in", "Dakelh", "Kitasoo/Xai'xais", "Ts'msyen",
+)
+
+PHOTOGRAPHERS = ("Troy Moth", "Christopher Brown", "Taylor Roades", "Camille Havas")
+FIRST_NAMES = ("Alex", "Sam", "Jordan", "Robin", "Casey", "Morgan", "Avery", "Riley", "Quinn", "Jesse")
+LAST_NAMES = ("Moth", "Brown", "Roades", "Havas", "George", "Wilson", "Joe", "Louie", "Paul", "Jack")
+
+PARTNERS = ("Salmon Beyond Borders", "Ecotrust Canada", "Cascadia Seaweed")
+LICENSES = ("licensed to", "donated to")
+
+BASE_URL = "https://raw.githubusercontent.com/WhaleCancer/LichenThumbnail/main"
+DRIVE_URL = "https://drive.google.com/uc?id="
+
+
+def zipf_weights(n, s=1.0):
+    """Cumulative Zipf weights for n ranks, for random.choices(cum_weights=...)"""
+    return list(accumulate(1.0 / (rank + 1) ** s for rank in range(n)))
+
+
+def vocabulary(base, size, extend):
+    """base plus generated entries up to size, most common first"""
+    words = list(base[:size])
+    i = 0
+    while len(words) < size:
+        words.append(extend(i))
+        i += 1
+    return words
+
+
+def extra_tag(i):
+    # "misty sitka spruce", ... then numbered variants once the combinations run out
+    combos = len(TAGS) * len(TAG_QUALIFIERS)
+    tag = f"{TAG_QUALIFIERS[i % len(TAG_QUALIFIERS)]} {TAGS[i // len(TAG_QUALIFIERS) % len(TAGS)]}"
+    return tag if i < combos else f"{tag} {i // combos}"
+
+
+def extra_nation(i):
+    return f"{NATIONS[i % len(NATIONS)].split(',')[0]} {i // len(NATIONS) + 2}"
+
+
+def extra_photographer(i):
+    return f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]} {i}"
+
+
+def build_vocabularies(size):
+    scale = max(1, int(size ** 0.5))
+    tags = vocabulary(TAGS, max(len(TAGS), scale), extra_tag)
+    nations = vocabulary(NATIONS, max(len(NATIONS) // 2, scale // 4), extra_nation)
+    photographers = vocabulary(PHOTOGRAPHERS, max(len(PHOTOGRAPHERS), scale // 8), extra_photographer)
+    return tags, nations, photographers
+
+
+def describe(photographer, nation, rng):
+    """A description in one of the catalog's credit-line forms"""
+    partner = f", {rng.choice(PARTNERS)}" if rng.random() < 0.1 else ""
+    if nation is None:
+        credit = f"Credit: Lichen and {photographer}. (Contact us to figure out which territory this photo is from)."
+    elif nation:
+        credit = f"Credit: Lichen, {photographer}{partner} and territorial acknowledgement to the {nation}."
+    else:
+        credit = f"Credit: Lichen, {photographer}{partner} and territorial acknowledgement."
+    learn = " Learn more about this photographer." if rng.random() < 0.8 else ""
+    return f"{credit}{learn} This photo was {rng.choice(LICENSES)} Lichen."
+
+
+def generate(size, seed=DEFAULT_SEED):
+    """(catalog records, territorial mapping) with size records"""
+    rng = random.Random(seed)
+    tags, nations, photographers = build_vocabularies(size)
+    tag_weights = zipf_weights(len(tags), 0.9)
+    nation_weights = zipf_weights(len(nations), 1.1)
+    photographer_weights = zipf_weights(len(photographers), 1.6)
+    tag_count_weights = list(accumulate((32, 24, 27, 14, 3, 0.2)))
+
+    data = []
+    territorial_data = {}
+    for i in range(size):
+        photographer = rng.choices(photographers, cum_weights=photographer_weights)[0]
+        roll = rng.random()
+        # About 2/3 mapped to a nation, some unsure between two, the rest unacknowledged
+        nation = rng.choices(nations, cum_weights=nation_weights)[0] if roll < 0.68 else None if roll < 0.75 else ""
+        n_tags = rng.choices(range(6), cum_weights=tag_count_weights)[0]
+        photo_tags = list(dict.fromkeys(rng.choices(tags, cum_weights=tag_weights, k=n_tags)))
+        name = f"DSC{i:07d}" if rng.random() < 0.85 else f"{photographer.replace(' ', '_')}_{i}"
+
+        data.append({
+            "photo_name": name,
+            "description": describe(photographer, nation, rng),
+            "clip_tags": ", ".join(photo_tags),
+            "image_url": f"{DRIVE_URL}{rng.getrandbits(128):032x}",
+            "drive_filename": f"{name}.jpeg",
+            "thumb_url": f"{BASE_URL}/{name}_Thumb.jpeg",
+            "full_url": f"{BASE_URL}/{name}.jpeg",
+        })
+        if nation:
+            mapping = {
+                "first_nation": nation,
+                "full_acknowledgement": f"territorial acknowledgement to the {nation}",
+            }
+            if rng.random() < 0.25:
+                mapping["all_territories"] = [nation]
+            territorial_data[name] = mapping
+    return data, territorial_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Lichen catalog")
+    parser.add_argument('--size', type=int, default=SIZES[1], help="Number of records")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Random seed")
+    parser.add_argument('--out', default='.', help="Directory for the two JSON files")
+    args = parser.parse_args()
+
+    data, territorial_data = generate(args.size, args.seed)
+    os.makedirs(args.out, exist_ok=True)
+    catalog_path = os.path.join(args.out, 'images_for_squarespace_githubthumbs.json')
+    mapping_path = os.path.join(args.out, 'territorial_mapping.json')
+    with open(catalog_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    with open(mapping_path, 'w', encoding='utf-8') as f:
+        json.dump(territorial_data, f, ensure_ascii=False)
+    print(f"Wrote {len(data)} records to {catalog_path}")
+    print(f"Wrote {len(territorial_data)} territory mappings to {mapping_path}")
+
+
+if __name__ == "__main__":
+    main()
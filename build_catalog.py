@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Streaming ETL from the scraped CSVs to the published image catalog
+(images_for_squarespace_githubthumbs.json).
+
+Rows are read one at a time, joined against thumbnail files and an on-disk index of
+Drive IDs and CLIP tags, and written out with a streaming JSON writer, so memory use
+stays constant no matter how many rows the catalog has. Image features (perceptual hash,
+palette, header metadata) are looked up per row in an on-disk cache keyed by file content
+hash, and only computed for images not seen before.
+
+Usage:
+    python build_catalog.py [--enrich PATH] [--thumbs DIR] [--originals DIR] [--renditions DIR] [--store DIR] [--output PATH]
+                            [--feature-cache PATH] [CSV ...]
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import tempfile
+
+from build_thumbnails import SOURCE_EXTENSIONS, file_hash
+from image_metadata import METADATA_VERSION, extract_metadata, resolution_class
+from lichen_search import parse_photographer
+from near_duplicates import image_phash
+from palette import dominant_colors
+from thumbnail_store import index_path as store_index_path
+
+CSV_PATHS = [
+    'TempShopify/Camille-Havas-37.csv',
+    'TempShopify/Christopher-Brown-182.csv',
+    'TempShopify/Taylor-Roades-42.csv',
+    'TempShopify/output_dsc0001-9999.csv',
+]
+THUMB_DIR = 'LichenThumbnail'
+ENRICH_PATH = 'LichenThumbnail/images_for_squarespace.json'
+OUTPUT_PATH = 'LichenThumbnail/images_for_squarespace_githubthumbs.json'
+GITHUB_BASE = 'https://raw.githubusercontent.com/WhaleCancer/LichenThumbnail/main/'
+THUMB_EXTENSIONS = ('.jpeg', '.jpg')
+RENDITIONS_DIR = 'LichenThumbnail/renditions'
+STORE_DIR = 'LichenThumbnail/store'
+FEATURE_CACHE_PATH = 'LichenThumbnail/feature_cache.sqlite'
+# Bump a kind's version when the code computing it changes, so cached values are recomputed
+FEATURE_VERSIONS = {'phash': 1, 'palette': 1, 'metadata': METADATA_VERSION}
+
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    separators = re.compile(r'[\s,]*')
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size).lstrip()
+        if not buf.startswith('['):
+            raise ValueError(f"{path}: JSON root is not a list")
+        pos = 1
+        eof = False
+        while True:
+            pos = separators.match(buf, pos).end()
+            if buf.startswith(']', pos):
+                return
+            try:
+                item, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(chunk_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            yield item
+
+
+def catalog_photo_name(csv_name):
+    """Photo name as used for Drive files and thumbnails (Christopher Brown's 'CB' suffix is dropped)"""
+    name = (csv_name or '').strip()
+    if name.startswith('DSC') and name.endswith('CB'):
+        name = name[:-2]
+    return name
+
+
+class EnrichmentIndex:
+    """On-disk lookup of Drive IDs, Drive filenames and CLIP tags by photo name"""
+
+    def __init__(self, path=None):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db = sqlite3.connect(os.path.join(self._tmpdir.name, 'enrich.db'))
+        self.db.execute(
+            'CREATE TABLE enrich (photo_name TEXT PRIMARY KEY, image_url TEXT, drive_filename TEXT, clip_tags TEXT)')
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def load(self, path):
+        """Stream an existing catalog into the index; later entries win"""
+        rows = (
+            (rec.get('photo_name', ''), rec.get('image_url', ''), rec.get('drive_filename', ''), rec.get('clip_tags', ''))
+            for rec in iter_json_array(path)
+        )
+        self.db.executemany('INSERT OR REPLACE INTO enrich VALUES (?, ?, ?, ?)', rows)
+        self.db.commit()
+
+    def get(self, photo_name):
+        row = self.db.execute(
+            'SELECT image_url, drive_filename, clip_tags FROM enrich WHERE photo_name = ?', (photo_name,)).fetchone()
+        return row or ('', '', '')
+
+    def close(self):
+        self.db.close()
+        self._tmpdir.cleanup()
+
+
+class FeatureCache:
+    """On-disk cache of computed image features by file content hash, kept across builds"""
+
+    def __init__(self, path=FEATURE_CACHE_PATH):
+        self.db = sqlite3.connect(path) if path else sqlite3.connect(':memory:')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS features (digest TEXT, kind TEXT, version INTEGER, value TEXT, '
+            'PRIMARY KEY (digest, kind))')
+        self.computed = 0
+
+    def get(self, path, kind, compute):
+        """compute(path) for the file at path, from the cache when its content was seen before"""
+        digest = file_hash(path)
+        row = self.db.execute('SELECT version, value FROM features WHERE digest = ? AND kind = ?', (digest, kind)).fetchone()
+        if row and row[0] == FEATURE_VERSIONS[kind]:
+            return json.loads(row[1])
+        value = compute(path)
+        self.db.execute('INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?)',
+                        (digest, kind, FEATURE_VERSIONS[kind], json.dumps(value)))
+        self.computed += 1
+        return value
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def load_rendition_defaults(renditions_dir):
+    """Map photo name -> default rendition file from build_thumbnails.py's manifest"""
+    path = os.path.join(renditions_dir or '', 'manifest.json')
+    if not renditions_dir or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return {name: entry['default'] for name, entry in json.load(f).items()}
+
+
+def load_store_files(store_dir):
+    """Map source file path -> content-hashed name from thumbnail_store.py's index"""
+    if not store_dir:
+        return {}
+    path = store_index_path(store_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['files']
+
+
+def find_thumbnail(photo_name, thumb_dir):
+    """Return the thumbnail filename for a photo, or None if no file exists"""
+    for ext in THUMB_EXTENSIONS:
+        filename = f"{photo_name}_Thumb{ext}"
+        if os.path.exists(os.path.join(thumb_dir, filename)):
+            return filename
+    return None
+
+
+class CatalogWriter:
+    """Streams records into a JSON array formatted like json.dump(..., indent=2)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.count = 0
+
+    def __enter__(self):
+        self.f = open(self.tmp_path, 'w', encoding='utf-8')
+        self.f.write('[')
+        return self
+
+    def write(self, record):
+        body = json.dumps(record, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+        self.f.write((',\n  ' if self.count else '\n  ') + body)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self.f.write('\n]' if self.count else ']')
+        self.f.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
+
+
+def iter_csv_rows(paths):
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+
+
+# Columns filled from image_metadata.py; empty when no image was found
+METADATA_FIELDS = {'width': 0, 'height': 0, 'orientation': '', 'resolution': '', 'year': '', 'camera': '', 'lens': '', 'gps': None}
+
+
+def find_original(photo_name, originals_dir):
+    """Return the original image filename for a photo, or None if no file exists"""
+    for ext in SOURCE_EXTENSIONS:
+        filename = photo_name + ext
+        if os.path.exists(os.path.join(originals_dir, filename)):
+            return filename
+    return None
+
+
+def image_features(photo_name, thumb_dir, cache, originals_dir=None):
+    """
+    Perceptual hash (near_duplicates.py) and dominant colors (palette.py) of the thumbnail,
+    and header metadata (image_metadata.py) from the original when available, else the thumbnail
+    """
+    features = {}
+    thumb_file = find_thumbnail(photo_name, thumb_dir) if os.path.isdir(thumb_dir) else None
+    if thumb_file:
+        path = os.path.join(thumb_dir, thumb_file)
+        features['phash'] = cache.get(path, 'phash', image_phash)
+        features['palette'] = cache.get(path, 'palette', dominant_colors)
+    original = find_original(photo_name, originals_dir) if originals_dir and os.path.isdir(originals_dir) else None
+    metadata_path = os.path.join(originals_dir, original) if original else (os.path.join(thumb_dir, thumb_file) if thumb_file else None)
+    if metadata_path:
+        fields = cache.get(metadata_path, 'metadata', extract_metadata)
+        # A thumbnail's pixel count says nothing about the original
+        fields['resolution'] = resolution_class(fields['width'], fields['height']) if original else ''
+        features['metadata'] = fields
+    return features
+
+
+def build_record(row, enrich, thumb_dir, renditions=None, store_files=None, features=None):
+    """Turn one scraped CSV row into a catalog record; returns (record, has_thumbnail)"""
+    photo_name = catalog_photo_name(row['Photo Name'])
+    image_url, drive_filename, clip_tags = enrich.get(photo_name)
+    rendition = (renditions or {}).get(photo_name)
+    if rendition:
+        thumb_file = 'renditions/' + rendition
+    else:
+        thumb_file = find_thumbnail(photo_name, thumb_dir)
+    if thumb_file and store_files and thumb_file in store_files:
+        thumb_file = 'store/' + store_files[thumb_file]
+    description = (row.get('Description') or '').strip()
+    features = features or {}
+    palette, shares = features.get('palette', ([], []))
+    record = {
+        'photo_name': photo_name,
+        'description': description,
+        'photographer': parse_photographer(description),
+        'clip_tags': clip_tags,
+        'image_url': image_url,
+        'drive_filename': drive_filename,
+        'thumb_url': GITHUB_BASE + (thumb_file or f"{photo_name}_Thumb.jpeg"),
+        'full_url': GITHUB_BASE + drive_filename if drive_filename else '',
+        'phash': features.get('phash', ''),
+        'palette': palette,
+        'palette_share': shares,
+    }
+    fields = features.get('metadata', {})
+    record.update({k: fields.get(k, default) for k, default in METADATA_FIELDS.items()})
+    return record, thumb_file is not None
+
+
+def build_catalog(csv_paths=CSV_PATHS, enrich_path=ENRICH_PATH, thumb_dir=THUMB_DIR, output_path=OUTPUT_PATH,
+                  renditions_dir=None, store_dir=None, originals_dir=None, feature_cache_path=FEATURE_CACHE_PATH):
+    """Build the catalog from the CSVs and return a summary of what was written"""
+    enrich = EnrichmentIndex(enrich_path)
+    cache = FeatureCache(feature_cache_path)
+    renditions = load_rendition_defaults(renditions_dir)
+    store_files = load_store_files(store_dir)
+    summary = {'records': 0, 'missing_thumbnails': 0, 'missing_drive_ids': 0}
+    try:
+        with CatalogWriter(output_path) as writer:
+            for row in iter_csv_rows(csv_paths):
+                features = image_features(catalog_photo_name(row['Photo Name']), thumb_dir, cache, originals_dir)
+                record, has_thumb = build_record(row, enrich, thumb_dir, renditions, store_files, features)
+                writer.write(record)
+                summary['records'] += 1
+                summary['missing_thumbnails'] += not has_thumb
+                summary['missing_drive_ids'] += not record['image_url']
+    finally:
+        enrich.close()
+        summary['features_computed'] = cache.computed
+        cache.close()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the image catalog from scraped CSVs")
+    parser.add_argument('csv', nargs='*', default=CSV_PATHS, help="Scraped CSV files")
+    parser.add_argument('--enrich', default=ENRICH_PATH, help="Existing catalog with Drive IDs and CLIP tags")
+    parser.add_argument('--thumbs', default=THUMB_DIR, help="Directory of _Thumb files")
+    parser.add_argument('--originals', default=None,
+                        help="Directory of full-size originals to read EXIF metadata and resolution from")
+    parser.add_argument('--renditions', default=None, const=RENDITIONS_DIR, nargs='?',
+                        help="Point thumb_url at renditions from build_thumbnails.py")
+    parser.add_argument('--store', default=None, const=STORE_DIR, nargs='?',
+                        help="Point thumb_url at content-hashed names from thumbnail_store.py")
+    parser.add_argument('--output', default=OUTPUT_PATH, help="Catalog JSON to write")
+    parser.add_argument('--feature-cache', default=FEATURE_CACHE_PATH, help="Cache of image features by file hash")
+    args = parser.parse_args()
+
+    summary = build_catalog(args.csv, args.enrich, args.thumbs, args.output, args.renditions, args.store, args.originals,
+                            args.feature_cache)
+    print(f"Wrote {summary['records']} records to {args.output}")
+    print(f"  Without a local thumbnail file: {summary['missing_thumbnails']}")
+    print(f"  Without a Drive ID: {summary['missing_drive_ids']}")
+    print(f"  Image features computed (not cached): {summary['features_computed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Compute compact CPU-only feature vectors for every thumbnail, for "Find similar".
+
+Each image is reduced to a small fixed-size vector:
+  - HSV color histogram (12 hue x 3 saturation x 3 value bins)
+  - edge orientation histogram (8 orientations in each image quadrant)
+  - coarse 3x3 color layout
+Each block is square-rooted (Hellinger), L2-normalized and weighted, and the whole vector
+is L2-normalized so cosine similarity is a dot product. The matrix is saved as
+image_features.npy with the row order in image_features.json.
+
+Usage:
+    python build_image_features.py [--source DIR] [--output DIR] [--workers N]
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from build_thumbnails import find_sources
+
+SOURCE_DIR = 'LichenThumbnail'
+OUTPUT_DIR = 'LichenThumbnail'
+FEATURES_NAME = 'image_features.npy'
+NAMES_NAME = 'image_features.json'
+FEATURE_VERSION = 1
+
+SAMPLE_SIZE = 96
+HSV_BINS = (12, 3, 3)
+ORIENTATION_BINS = 8
+LAYOUT_GRID = 3
+# Relative weight of each block in the final vector
+WEIGHTS = {'color': 1.0, 'edges': 0.8, 'layout': 0.6}
+
+
+def _unit(v):
+    norm = np.linalg.norm(v)
+    return v / norm if norm > 0 else v
+
+
+def color_histogram(hsv):
+    h, s, v = (hsv[..., i].astype(np.int32) for i in range(3))
+    hb, sb, vb = HSV_BINS
+    idx = (h * hb // 256) * (sb * vb) + (s * sb // 256) * vb + (v * vb // 256)
+    hist = np.bincount(idx.ravel(), minlength=hb * sb * vb).astype(np.float32)
+    return np.sqrt(hist / hist.sum())
+
+
+def edge_histogram(gray):
+    gy, gx = np.gradient(gray.astype(np.float32))
+    magnitude = np.hypot(gx, gy)
+    # Orientation modulo 180 degrees: an edge and its reverse look the same
+    orientation = (np.arctan2(gy, gx) % np.pi) / np.pi * ORIENTATION_BINS
+    bins = np.minimum(orientation.astype(np.int32), ORIENTATION_BINS - 1)
+
+    h, w = gray.shape
+    blocks = []
+    for rows in (slice(0, h // 2), slice(h // 2, h)):
+        for cols in (slice(0, w // 2), slice(w // 2, w)):
+            blocks.append(np.bincount(bins[rows, cols].ravel(), weights=magnitude[rows, cols].ravel(),
+                                      minlength=ORIENTATION_BINS))
+    hist = np.concatenate(blocks).astype(np.float32)
+    total = hist.sum()
+    return np.sqrt(hist / total) if total > 0 else hist
+
+
+def color_layout(rgb):
+    h, w, _ = rgb.shape
+    cells = []
+    for i in range(LAYOUT_GRID):
+        for j in range(LAYOUT_GRID):
+            cell = rgb[i * h // LAYOUT_GRID:(i + 1) * h // LAYOUT_GRID, j * w // LAYOUT_GRID:(j + 1) * w // LAYOUT_GRID]
+            cells.append(cell.reshape(-1, 3).mean(axis=0))
+    return np.concatenate(cells).astype(np.float32) / 255.0
+
+
+def image_features(path):
+    """Feature vector for one image file"""
+    with Image.open(path) as im:
+        im = im.convert('RGB')
+        im.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE))
+        rgb = np.asarray(im)
+        hsv = np.asarray(im.convert('HSV'))
+        gray = np.asarray(im.convert('L'))
+
+    vector = np.concatenate([
+        WEIGHTS['color'] * _unit(color_histogram(hsv)),
+        WEIGHTS['edges'] * _unit(edge_histogram(gray)),
+        WEIGHTS['layout'] * _unit(color_layout(rgb)),
+    ])
+    return _unit(vector).astype(np.float32)
+
+
+def build_image_features(source_dir=SOURCE_DIR, output_dir=OUTPUT_DIR, workers=None):
+    """Compute features for every thumbnail and write the matrix and names; returns the row count"""
+    sources = find_sources(source_dir)
+    names = sorted(sources)
+    paths = [os.path.join(source_dir, sources[name]) for name in names]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(image_features, paths, chunksize=16))
+    matrix = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+
+    # float16 halves the download; similarity is computed in float32
+    np.save(os.path.join(output_dir, FEATURES_NAME), matrix.astype(np.float16))
+    with open(os.path.join(output_dir, NAMES_NAME), 'w', encoding='utf-8') as f:
+        json.dump({'version': FEATURE_VERSION, 'dims': int(matrix.shape[1]) if rows else 0, 'names': names}, f, indent=2)
+    return len(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute image feature vectors for similarity search")
+    parser.add_argument('--source', default=SOURCE_DIR, help="Directory of thumbnails")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="Directory for the feature matrix")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    count = build_image_features(args.source, args.output, args.workers)
+    print(f"Wrote features for {count} images to {os.path.join(args.output, FEATURES_NAME)}")
+
+
+if __name__ == "__main__":
+    main()
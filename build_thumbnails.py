@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Build multi-size thumbnail renditions (WebP, optional AVIF, progressive JPEG) for the catalog.
+
+Each source image is resized to several widths in a process pool. Sources whose content
+hash is unchanged since the last build are skipped. The manifest written alongside the
+renditions maps photo names to their files, so the catalog's thumb_url and the results
+grid's srcset can point into it.
+
+Usage:
+    python build_thumbnails.py [--source DIR] [--output DIR] [--avif] [--workers N]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps, features
+
+SOURCE_DIR = 'LichenThumbnail'
+OUTPUT_DIR = 'LichenThumbnail/renditions'
+MANIFEST_NAME = 'manifest.json'
+WIDTHS = (160, 320, 640)
+DEFAULT_WIDTH = 320
+SOURCE_EXTENSIONS = ('.jpeg', '.jpg', '.png', '.tif', '.tiff')
+
+# Encoder settings per output format
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'avif': {'format': 'AVIF', 'quality': 60},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+# Bump when encoder settings or widths change so every source is rebuilt
+PIPELINE_VERSION = 1
+
+
+def photo_name_for(filename):
+    """'DSC0216_Thumb.jpeg' -> 'DSC0216'"""
+    stem = os.path.splitext(filename)[0]
+    return re.sub(r'_Thumb$', '', stem)
+
+
+def find_sources(source_dir):
+    """Return {photo_name: filename}, taking one file per photo (.jpeg preferred over .jpg)"""
+    sources = {}
+    for filename in sorted(os.listdir(source_dir)):
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in SOURCE_EXTENSIONS:
+            continue
+        name = photo_name_for(filename)
+        current = sources.get(name)
+        if current is None or SOURCE_EXTENSIONS.index(ext) < SOURCE_EXTENSIONS.index(os.path.splitext(current)[1].lower()):
+            sources[name] = filename
+    return sources
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def target_widths(source_width, widths=WIDTHS):
+    """Requested widths capped at the source width (never upscale)"""
+    return sorted({min(w, source_width) for w in widths})
+
+
+def build_renditions(job):
+    """Worker: resize one source into every width and format; returns its manifest entry"""
+    photo_name, source_path, output_dir, formats, digest = job
+    with Image.open(source_path) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ('RGB', 'L'):
+            im = im.convert('RGB')
+        source_width, source_height = im.size
+
+        renditions = {fmt: [] for fmt in formats}
+        for width in target_widths(source_width):
+            height = max(1, round(source_height * width / source_width))
+            resized = im if width == source_width else im.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                filename = f"{photo_name}-{width}.{fmt}"
+                path = os.path.join(output_dir, filename)
+                resized.save(path, **FORMATS[fmt])
+                renditions[fmt].append({
+                    'width': width,
+                    'height': height,
+                    'file': filename,
+                    'bytes': os.path.getsize(path),
+                })
+
+    default_width = min(target_widths(source_width), key=lambda w: abs(w - DEFAULT_WIDTH))
+    return photo_name, {
+        'source': os.path.basename(source_path),
+        'sha256': digest,
+        'pipeline': PIPELINE_VERSION,
+        'width': source_width,
+        'height': source_height,
+        'default': f"{photo_name}-{default_width}.jpeg" if 'jpeg' in formats else renditions[formats[0]][-1]['file'],
+        'renditions': renditions,
+    }
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def is_current(entry, digest, formats, output_dir):
+    """True if an existing manifest entry was built from the same bytes with the same settings"""
+    if not entry or entry.get('sha256') != digest or entry.get('pipeline') != PIPELINE_VERSION:
+        return False
+    if sorted(entry.get('renditions', {})) != sorted(formats):
+        return False
+    return all(
+        os.path.exists(os.path.join(output_dir, r['file']))
+        for items in entry['renditions'].values() for r in items
+    )
+
+
+def build_thumbnails(source_dir=SOURCE_DIR, output_dir=OUTPUT_DIR, avif=False, workers=None):
+    """Build renditions for changed sources and rewrite the manifest; returns (built, skipped)"""
+    os.makedirs(output_dir, exist_ok=True)
+    formats = ['webp', 'jpeg']
+    if avif:
+        if features.check('avif'):
+            formats.insert(1, 'avif')
+        else:
+            print("WARNING: this Pillow build has no AVIF encoder; skipping AVIF")
+
+    manifest = load_manifest(output_dir)
+    sources = find_sources(source_dir)
+
+    jobs = []
+    skipped = 0
+    new_manifest = {}
+    for photo_name, filename in sources.items():
+        path = os.path.join(source_dir, filename)
+        digest = file_hash(path)
+        if is_current(manifest.get(photo_name), digest, formats, output_dir):
+            new_manifest[photo_name] = manifest[photo_name]
+            skipped += 1
+        else:
+            jobs.append((photo_name, path, output_dir, formats, digest))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for photo_name, entry in pool.map(build_renditions, jobs, chunksize=8):
+            new_manifest[photo_name] = entry
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(new_manifest.items())), f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return len(jobs), skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build multi-size thumbnail renditions")
+    parser.add_argument('--source', default=SOURCE_DIR, help="Directory of source images")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="Directory for renditions and manifest")
+    parser.add_argument('--avif', action='store_true', help="Also encode AVIF renditions")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    built, skipped = build_thumbnails(args.source, args.output, args.avif, args.workers)
+    print(f"Built renditions for {built} images, skipped {skipped} unchanged")
+
+    manifest = load_manifest(args.output)
+    source_bytes = sum(os.path.getsize(os.path.join(args.source, e['source'])) for e in manifest.values())
+    for fmt in ('webp', 'avif', 'jpeg'):
+        sizes = [r['bytes'] for e in manifest.values() for r in e['renditions'].get(fmt, [])
+                 if r['width'] == min(e['width'], DEFAULT_WIDTH)]
+        if sizes:
+            print(f"  {fmt} at ~{DEFAULT_WIDTH}px: {sum(sizes):,} bytes for {len(sizes)} images "
+                  f"(sources: {source_bytes:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,76 +5,19 @@ Extract territory data from image credits for images that don't already have ter
 
 import csv
 import json
-import re
+import multiprocessing
+
+from nation_gazetteer import NATION_ALIASES, find_nations, scan_rows
+from territory_journal import TerritoryJournal
 
 def extract_territories_from_description(description):
-    """Extract territory information from image descriptions with enhanced patterns"""
-    territories = []
-    
-    # Enhanced patterns to match territorial acknowledgments
-    patterns = [
-        r'territorial acknowledgement to (?:the )?([^.]+?)(?:\.|,|$)',
-        r'acknowledgement to (?:the )?([^.]+?)(?:\.|,|$)',
-        r'on (?:the )?([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*(?:\s+Territory)?)\s+territory',
-        r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*(?:\s+Territory)?)\s+territory',
-    ]
-    
-    for pattern in patterns:
-        matches = re.finditer(pattern, description, re.IGNORECASE)
-        for match in matches:
-            territory_text = match.group(1).strip()
-            
-            # Clean up the territory text
-            territory_text = re.sub(r'^the\s+', '', territory_text, flags=re.IGNORECASE)
-            territory_text = re.sub(r'\s*\.$', '', territory_text)
-            
-            # Handle special cases for Coast Salish Nations
-            if 'coast salish nations of' in territory_text.lower():
-                # Extract individual nations from "Coast Salish Nations of X, Y and Z"
-                nations_text = re.sub(r'coast salish nations of\s*', '', territory_text, flags=re.IGNORECASE)
-                # Split on common separators
-                nations = re.split(r'[,\s]+and\s+|[,\s]+', nations_text)
-                for nation in nations:
-                    nation = nation.strip()
-                    if nation and len(nation) > 2:
-                        territories.append(nation)
-            # Handle multiple territories separated by commas, "and", etc.
-            elif ',' in territory_text or ' and ' in territory_text:
-                # Split on common separators
-                sub_territories = re.split(r'[,\s]+and\s+|[,\s]+', territory_text)
-                for sub_territory in sub_territories:
-                    sub_territory = sub_territory.strip()
-                    if sub_territory and len(sub_territory) > 2:
-                        territories.append(sub_territory)
-            else:
-                if territory_text and len(territory_text) > 2:
-                    territories.append(territory_text)
-    
-    return list(set(territories))  # Remove duplicates
+    """Extract territory names mentioned in an image description using the nation gazetteer"""
+    return find_nations(description)
 
 def normalize_territory_name(territory):
     """Normalize territory names for consistent matching"""
-    # Common normalizations
-    normalizations = {
-        'coast salish': 'Coast Salish',
-        'musqueam': 'Musqueam',
-        'tsleil-waututh': 'Tsleil-Waututh',
-        'squamish': 'Squamish',
-        'secwepemc': 'Secwepemc',
-        'tahltan': 'Tahltan',
-        'mowachaht/muchalaht': 'Mowachaht/Muchalaht',
-        'mowachaht-muchalaht': 'Mowachaht/Muchalaht',
-        'klahoose': 'Klahoose',
-        'nuchatlaht': 'Nuchatlaht',
-        'gitxsan': 'Gitxsan',
-        'nisga\'a': 'Nisga\'a',
-        'taku river tlingit': 'Taku River Tlingit',
-        'theklahoose': 'Klahoose',  # Handle concatenated names
-        'muchalaht or nuchatlaht': 'Nuchatlaht',
-    }
-    
     territory_lower = territory.lower().strip()
-    return normalizations.get(territory_lower, territory.strip())
+    return NATION_ALIASES.get(territory_lower, territory.strip())
 
 def extract_missing_territories():
     """Extract territory data from credits for images without existing mappings"""
@@ -111,13 +54,12 @@ def extract_missing_territories():
     new_mappings = {}
     territories_found = {}
     
-    # Analyze each unmapped image
-    for row in unmapped_images:
-        photo_name = row['Photo Name']
-        description = row['Description']
-        
-        # Extract territories from description
-        territories = extract_territories_from_description(description)
+    descriptions = {row['Photo Name']: row['Description'] for row in unmapped_images}
+    
+    # Analyze each unmapped image, scanning large batches with a process pool
+    processes = multiprocessing.cpu_count() if len(unmapped_images) > 1000 else 1
+    for photo_name, territories in scan_rows(unmapped_images, processes=processes):
+        description = descriptions[photo_name]
         
         if territories:
             # Normalize territory names
@@ -145,14 +87,13 @@ def extract_missing_territories():
             print()
     
     if new_mappings:
-        # Add new mappings to existing mapping
-        territorial_mapping.update(new_mappings)
-        
-        # Save updated mapping
-        with open('corrected_territorial_mapping.json', 'w', encoding='utf-8') as f:
-            json.dump(territorial_mapping, f, indent=2, ensure_ascii=False)
+        # Record new mappings in the change journal, which also saves the mapping
+        journal = TerritoryJournal()
+        version = journal.commit(new_mappings, note="extract_missing_territories")
+        territorial_mapping = journal.mapping
         
         print(f"\nSUMMARY:")
+        print(f"  Recorded as journal version {version}")
         print(f"  Added {len(new_mappings)} new territorial mappings")
         print(f"  Total mappings now: {len(territorial_mapping)}")
         
@@ -5,36 +5,15 @@ Find and extract Musqueam, Tsleil-Waututh, and Squamish territories from image d
 
 import csv
 import json
-import re
+
+from nation_gazetteer import find_nations
+from territory_journal import TerritoryJournal
+
+COAST_SALISH_NATIONS = ('Musqueam', 'Tsleil-Waututh', 'Squamish')
 
 def extract_coast_salish_territories(description):
     """Extract Musqueam, Tsleil-Waututh, and Squamish from descriptions"""
-    territories = []
-    description_lower = description.lower()
-    
-    # Check for each territory specifically
-    if 'musqueam' in description_lower:
-        territories.append('Musqueam')
-    
-    if 'tsleil-waututh' in description_lower:
-        territories.append('Tsleil-Waututh')
-    
-    if 'squamish' in description_lower:
-        territories.append('Squamish')
-    
-    # Also check for "Coast Salish Nations of" pattern and extract individual nations
-    coast_salish_pattern = r'coast salish nations of ([^.]+)'
-    match = re.search(coast_salish_pattern, description_lower)
-    if match:
-        nations_text = match.group(1)
-        # Split on commas and "and"
-        nations = re.split(r'[,\s]+and\s+|[,\s]+', nations_text)
-        for nation in nations:
-            nation = nation.strip()
-            if nation and nation in ['musqueam', 'tsleil-waututh', 'squamish']:
-                territories.append(nation.title())
-    
-    return list(set(territories))  # Remove duplicates
+    return [nation for nation in find_nations(description) if nation in COAST_SALISH_NATIONS]
 
 def find_coast_salish_territories():
     """Find all images that mention Musqueam, Tsleil-Waututh, or Squamish"""
@@ -121,10 +100,13 @@ def find_coast_salish_territories():
     
     # Save updated mapping
     if updated_mappings:
-        with open('corrected_territorial_mapping.json', 'w', encoding='utf-8') as f:
-            json.dump(territorial_mapping, f, indent=2, ensure_ascii=False)
+        changes = {photo_name: territorial_mapping[photo_name] for photo_name in updated_mappings}
+        journal = TerritoryJournal()
+        version = journal.commit(changes, note="find_coast_salish_territories")
+        territorial_mapping = journal.mapping
         
         print(f"\nUpdated territorial mapping with {len(updated_mappings)} Coast Salish territories")
+        print(f"Recorded as journal version {version}")
         print(f"Total mappings now: {len(territorial_mapping)}")
     else:
         print("\nNo Coast Salish territories found in any image descriptions")
@@ -0,0 +1,162 @@
+# fuzzy.py
+# Typo-tolerant term correction with a SymSpell-style deletion dictionary
+# - Vocabulary: words of descriptions, tags and nation names, with their frequencies
+# - Every deletion (up to MAX_EDIT_DISTANCE characters) of each word's first PREFIX_LENGTH
+#   characters maps back to the words that produce it, so a lookup generates the query's own
+#   deletions and verifies a handful of candidates, instead of scanning the vocabulary
+# - Candidates are ranked by edit distance (with transpositions), then frequency
+# - updated() applies a catalog delta to a copy: word counts change (records and nations, both
+#   added and removed), words first seen get their deletions; words whose count drops to 0 stay
+#   in the dictionary but are never returned
+
+import re
+
+from lichen_search import record_desc, record_tags
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+# Words this short are too ambiguous to correct
+MIN_WORD_LENGTH = 4
+
+WORD_PATTERN = re.compile(r"[^\W_]+(?:['’-][^\W_]+)*")
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance (insert, delete, substitute, transpose), or max_distance + 1"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= max_distance else max_distance + 1
+
+
+def deletes(word: str, distance: int) -> set:
+    """All strings reachable from word by deleting up to distance characters"""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found |= frontier
+    return found
+
+
+def record_words(rec: dict):
+    """Lowercase vocabulary words of a record's description and tags, with repeats"""
+    for text in (record_desc(rec), record_tags(rec)):
+        for word in WORD_PATTERN.findall(text):
+            yield word.lower()
+
+
+class FuzzyIndex:
+    """Deletion dictionary over the catalog vocabulary"""
+
+    def __init__(self, index, max_distance: int = MAX_EDIT_DISTANCE):
+        self.max_distance = max_distance
+        counts = {}
+        # Corrections are lowercase, except nation names which keep their own spelling
+        display = {}
+        # Nations each word appears in, so display is dropped with the last of them
+        nation_counts = {}
+        for rec in index.records:
+            for key in record_words(rec):
+                counts[key] = counts.get(key, 0) + 1
+        for nation in index.territories:
+            for word in WORD_PATTERN.findall(nation):
+                key = word.lower()
+                counts[key] = counts.get(key, 0) + 1
+                nation_counts[key] = nation_counts.get(key, 0) + 1
+                display[key] = word
+        self.counts = counts
+        self.display = display
+        self.nation_counts = nation_counts
+
+        self.deletes = {}
+        for word in counts:
+            if len(word) < MIN_WORD_LENGTH:
+                continue
+            for d in deletes(word[:PREFIX_LENGTH], max_distance):
+                self.deletes.setdefault(d, []).append(word)
+
+    def updated(self, removed_records, added_records, added_nations=(), removed_nations=()) -> "FuzzyIndex":
+        """A copy with removed_records' and removed_nations' words taken out and the added ones put in"""
+        fuzzy = FuzzyIndex.__new__(FuzzyIndex)
+        fuzzy.max_distance = self.max_distance
+        fuzzy.counts = counts = dict(self.counts)
+        fuzzy.display = dict(self.display)
+        fuzzy.nation_counts = nation_counts = dict(self.nation_counts)
+        fuzzy.deletes = dict(self.deletes)
+        for rec in removed_records:
+            for key in record_words(rec):
+                counts[key] -= 1
+        for nation in removed_nations:
+            for word in WORD_PATTERN.findall(nation):
+                key = word.lower()
+                counts[key] -= 1
+                nation_counts[key] -= 1
+                if not nation_counts[key]:
+                    del nation_counts[key]
+                    fuzzy.display.pop(key, None)
+        new_words = []
+        for rec in added_records:
+            for key in record_words(rec):
+                if key not in counts:
+                    new_words.append(key)
+                counts[key] = counts.get(key, 0) + 1
+        for nation in added_nations:
+            for word in WORD_PATTERN.findall(nation):
+                key = word.lower()
+                if key not in counts:
+                    new_words.append(key)
+                counts[key] = counts.get(key, 0) + 1
+                nation_counts[key] = nation_counts.get(key, 0) + 1
+                fuzzy.display.setdefault(key, word)
+        for word in new_words:
+            if len(word) < MIN_WORD_LENGTH:
+                continue
+            for d in deletes(word[:PREFIX_LENGTH], fuzzy.max_distance):
+                # Lists are shared with the previous index, so extend a copy
+                fuzzy.deletes[d] = fuzzy.deletes.get(d, []) + [word]
+        return fuzzy
+
+    def __contains__(self, word):
+        return self.counts.get(word.lower(), 0) > 0
+
+    def lookup(self, word: str, max_distance: int = None) -> list:
+        """[(word, distance, count)] within max_distance of word, best first"""
+        max_distance = self.max_distance if max_distance is None else max_distance
+        word = word.lower()
+        if word in self:
+            return [(word, 0, self.counts[word])]
+        if len(word) < MIN_WORD_LENGTH:
+            return []
+        candidates = set()
+        for d in deletes(word[:PREFIX_LENGTH], max_distance):
+            candidates.update(self.deletes.get(d, ()))
+        found = []
+        for candidate in candidates:
+            if not self.counts[candidate]:
+                continue
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                found.append((candidate, distance, self.counts[candidate]))
+        return sorted(found, key=lambda c: (c[1], -c[2], c[0]))
+
+    def correct(self, term: str) -> str:
+        """term with each unknown word replaced by its best correction; unchanged if none applies"""
+        def fix(match):
+            word = match.group(0)
+            if word in self:
+                return word
+            best = self.lookup(word)
+            return self.display.get(best[0][0], best[0][0]) if best else word
+        return WORD_PATTERN.sub(fix, term or "")
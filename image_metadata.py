@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Read image headers into filterable catalog fields.
+
+Only headers are parsed (PIL opens files lazily and never decodes pixels here), in a
+process pool, and results are cached by file content hash so unchanged images are never
+read twice. Fields:
+  width, height   pixel size, after applying the EXIF orientation tag
+  orientation     banner (2:1 or wider), landscape, square, portrait or tall (1:2 or narrower)
+  resolution      small / medium / large / xlarge by megapixels (originals only)
+  year            from DateTimeOriginal (or DateTime)
+  camera, lens    EXIF Make + Model, LensModel
+  gps             [latitude, longitude] when present
+
+The published thumbnails carry no EXIF and are all 300 px wide, so from them only size and
+orientation are meaningful; point --source at the originals for the rest.
+
+Usage:
+    python image_metadata.py [--source DIR] [--cache PATH] [--originals] [--workers N]
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from build_thumbnails import file_hash, find_sources
+
+SOURCE_DIR = 'LichenThumbnail'
+CACHE_PATH = 'LichenThumbnail/metadata_cache.json'
+# Bump when extract_metadata changes so cached entries are re-read
+METADATA_VERSION = 1
+
+# EXIF tags
+ORIENTATION = 0x0112
+MAKE = 0x010F
+MODEL = 0x0110
+DATETIME = 0x0132
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+DATETIME_ORIGINAL = 0x9003
+LENS_MODEL = 0xA434
+
+# (label, minimum width/height ratio), widest first
+ORIENTATIONS = (('banner', 2.0), ('landscape', 1.1), ('square', 0.9), ('portrait', 0.5), ('tall', 0.0))
+# (label, minimum megapixels), largest first
+RESOLUTIONS = (('xlarge', 20.0), ('large', 8.0), ('medium', 2.0), ('small', 0.0))
+
+
+def orientation_class(width, height):
+    ratio = width / height if height else 0.0
+    return next(label for label, minimum in ORIENTATIONS if ratio >= minimum)
+
+
+def resolution_class(width, height):
+    megapixels = width * height / 1e6
+    return next(label for label, minimum in RESOLUTIONS if megapixels >= minimum)
+
+
+def _gps_degrees(value, ref):
+    try:
+        degrees = float(value[0]) + float(value[1]) / 60 + float(value[2]) / 3600
+    except (TypeError, ValueError, IndexError, ZeroDivisionError):
+        return None
+    return round(-degrees if ref in ('S', 'W') else degrees, 6)
+
+
+def extract_metadata(path):
+    """Header fields for one image file (resolution is filled in by the caller)"""
+    with Image.open(path) as im:
+        width, height = im.size
+        exif = im.getexif()
+        exif_ifd = exif.get_ifd(EXIF_IFD)
+        gps_ifd = exif.get_ifd(GPS_IFD)
+
+    # Orientations 5-8 are rotated by 90 degrees
+    if exif.get(ORIENTATION) in (5, 6, 7, 8):
+        width, height = height, width
+
+    date = str(exif_ifd.get(DATETIME_ORIGINAL) or exif.get(DATETIME) or '')
+    year = date[:4] if date[:4].isdigit() else ''
+
+    make = str(exif.get(MAKE) or '').strip(' \x00')
+    model = str(exif.get(MODEL) or '').strip(' \x00')
+    # "NIKON CORPORATION" + "NIKON D750" -> "NIKON D750"
+    brand = make.split(' ')[0].lower()
+    camera = model if brand and model.lower().startswith(brand) else f"{make} {model}".strip()
+
+    gps = None
+    if 2 in gps_ifd and 4 in gps_ifd:
+        lat = _gps_degrees(gps_ifd[2], gps_ifd.get(1))
+        lon = _gps_degrees(gps_ifd[4], gps_ifd.get(3))
+        if lat is not None and lon is not None:
+            gps = [lat, lon]
+
+    return {
+        'width': width,
+        'height': height,
+        'orientation': orientation_class(width, height),
+        'year': year,
+        'camera': camera,
+        'lens': str(exif_ifd.get(LENS_MODEL) or '').strip(' \x00'),
+        'gps': gps,
+    }
+
+
+def load_cache(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_cache(path, cache):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def compute_metadata(source_dir=SOURCE_DIR, cache_path=CACHE_PATH, originals=False, workers=None):
+    """{photo_name: fields} for every image in source_dir; returns (metadata, files read)"""
+    sources = find_sources(source_dir)
+    names = sorted(sources)
+    paths = [os.path.join(source_dir, sources[n]) for n in names]
+    cache = load_cache(cache_path)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(file_hash, paths, chunksize=32))
+        stale = [i for i, d in enumerate(digests) if cache.get(d, {}).get('version') != METADATA_VERSION]
+        for i, fields in zip(stale, pool.map(extract_metadata, [paths[i] for i in stale], chunksize=32)):
+            cache[digests[i]] = dict(fields, version=METADATA_VERSION)
+
+    if cache_path and stale:
+        save_cache(cache_path, cache)
+
+    metadata = {}
+    for name, digest in zip(names, digests):
+        fields = {k: v for k, v in cache[digest].items() if k != 'version'}
+        # A thumbnail's pixel count says nothing about the original
+        fields['resolution'] = resolution_class(fields['width'], fields['height']) if originals else ''
+        metadata[name] = fields
+    return metadata, len(stale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract image header metadata")
+    parser.add_argument('--source', default=SOURCE_DIR, help="Directory of images")
+    parser.add_argument('--cache', default=CACHE_PATH, help="Cache of extracted fields by file hash")
+    parser.add_argument('--originals', action='store_true', help="Images are full-size originals (enables resolution)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    metadata, read = compute_metadata(args.source, args.cache, args.originals, args.workers)
+    print(f"Metadata for {len(metadata)} images ({read} read, {len(metadata) - read} from cache)")
+    for field in ('orientation', 'resolution', 'year', 'camera'):
+        counts = {}
+        for fields in metadata.values():
+            if fields[field]:
+                counts[fields[field]] = counts.get(fields[field], 0) + 1
+        if counts:
+            print(f"  {field}: " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items(), key=lambda kv: -kv[1])))
+    print(f"  with GPS: {sum(1 for fields in metadata.values() if fields['gps'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# lichen_query.py
+# Small query language for the search box, compiled to SearchIndex bitmap operations
+#
+#   bark                        substring of description, tags or territory (the default)
+#   "coastal forest"            quoted phrase
+#   bark*                       word prefix
+#   lichen AND NOT fir          boolean operators (AND is implicit; -term is NOT term)
+#   (fjord OR glacier)          grouping
+#   territory:Tahltan tag:fjord photographer:"Camille Havas" name:DSC0216
+#   color:#3a6ea5 color:orange  images whose dominant colors include one near it
+#   orientation:banner year:2019 resolution:large camera:nikon* lens:"24-70"
+#
+# A query without any of this syntax is treated as one literal substring, exactly
+# like the original search box.
+
+import re
+from functools import lru_cache
+
+# Field name -> SearchIndex method taking (value, prefix)
+FIELDS = {
+    "territory": "territory_field",
+    "nation": "territory_field",
+    "tag": "tag_field",
+    "photographer": "photographer_field",
+    "name": "name_field",
+    "color": "color_field",
+    "colour": "color_field",
+    "orientation": "orientation_field",
+    "resolution": "resolution_field",
+    "year": "year_field",
+    "camera": "camera_field",
+    "lens": "lens_field",
+}
+
+KEYWORDS = {"AND", "OR", "NOT"}
+
+TOKEN_PATTERN = re.compile(
+    r'\s*(?:'
+    r'(?P<lparen>\()|(?P<rparen>\))'
+    r'|(?P<field>[A-Za-z_]+):(?=\S)'
+    r'|(?P<phrase>"[^"]*"?)'
+    r'|(?P<word>[^\s()"]+)'
+    r')'
+)
+
+SYNTAX_PATTERN = re.compile(r'["()*]|(?:^|\s)-\S|\b(?:AND|OR|NOT)\b|\b[A-Za-z_]+:\S')
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+# --- AST ---------------------------------------------------------------------
+
+class Text:
+    """Substring (or word prefix) match over description, tags and territory"""
+
+    def __init__(self, text, prefix=False):
+        self.text = text
+        self.prefix = prefix
+
+    def evaluate(self, index):
+        if self.prefix:
+            return index.word_prefix(self.text)
+        return index.substring(self.text)
+
+    def terms(self):
+        return [self.text]
+
+    def __repr__(self):
+        return f"Text({self.text!r}{', prefix' if self.prefix else ''})"
+
+
+class Field:
+    def __init__(self, name, value, prefix=False):
+        self.name = name
+        self.value = value
+        self.prefix = prefix
+
+    def evaluate(self, index):
+        return getattr(index, FIELDS[self.name])(self.value, self.prefix)
+
+    def terms(self):
+        return []
+
+    def __repr__(self):
+        return f"Field({self.name}:{self.value!r}{', prefix' if self.prefix else ''})"
+
+
+class And:
+    def __init__(self, *children):
+        self.children = children
+
+    def evaluate(self, index):
+        # Positive clauses first so NOT clauses only mask an existing result
+        positives = [c for c in self.children if not isinstance(c, Not)]
+        negatives = [c for c in self.children if isinstance(c, Not)]
+        bitmap = index.all
+        for child in positives:
+            bitmap &= child.evaluate(index)
+            if not bitmap:
+                return 0
+        for child in negatives:
+            bitmap &= ~child.child.evaluate(index)
+        return bitmap
+
+    def terms(self):
+        return [t for c in self.children for t in c.terms()]
+
+    def __repr__(self):
+        return f"And{self.children!r}"
+
+
+class Or:
+    def __init__(self, *children):
+        self.children = children
+
+    def evaluate(self, index):
+        bitmap = 0
+        for child in self.children:
+            bitmap |= child.evaluate(index)
+        return bitmap
+
+    def terms(self):
+        return [t for c in self.children for t in c.terms()]
+
+    def __repr__(self):
+        return f"Or{self.children!r}"
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def evaluate(self, index):
+        return index.all & ~self.child.evaluate(index)
+
+    def terms(self):
+        return []
+
+    def __repr__(self):
+        return f"Not({self.child!r})"
+
+
+# --- Parser ------------------------------------------------------------------
+
+def tokenize(query):
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = TOKEN_PATTERN.match(query, pos)
+        if not match or match.end() == pos:
+            raise QuerySyntaxError(f"Unexpected character at position {pos}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+def _value(raw):
+    """Return (text, is_phrase, is_prefix) for a word or phrase token"""
+    if raw.startswith('"'):
+        return raw.strip('"'), True, False
+    if raw.endswith("*") and len(raw) > 1:
+        return raw[:-1], False, True
+    return raw, False, False
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise QuerySyntaxError("Unbalanced parentheses")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == ("word", "OR"):
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(*children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while True:
+            kind, value = self.peek()
+            if kind is None or kind == "rparen" or (kind, value) == ("word", "OR"):
+                break
+            if (kind, value) == ("word", "AND"):
+                self.take()
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else And(*children)
+
+    def parse_not(self):
+        kind, value = self.peek()
+        if (kind, value) == ("word", "NOT"):
+            self.take()
+            return Not(self.parse_not())
+        if kind == "word" and value.startswith("-") and len(value) > 1:
+            self.tokens[self.pos] = ("word", value[1:])
+            return Not(self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, value = self.take()
+        if kind is None:
+            raise QuerySyntaxError("Unexpected end of query")
+        if kind == "lparen":
+            node = self.parse_or()
+            if self.take()[0] != "rparen":
+                raise QuerySyntaxError("Missing closing parenthesis")
+            return node
+        if kind == "rparen":
+            raise QuerySyntaxError("Unexpected closing parenthesis")
+        if kind == "field":
+            name = value.lower()
+            next_kind, raw = self.take()
+            if next_kind not in ("word", "phrase"):
+                raise QuerySyntaxError(f"Missing value for {value}:")
+            text, _, prefix = _value(raw)
+            if name in FIELDS:
+                return Field(name, text, prefix)
+            # Not a known field: search for the literal "name:value" text
+            return Text(f"{value}:{raw.strip(chr(34))}")
+        if kind == "word" and value in KEYWORDS:
+            raise QuerySyntaxError(f"Unexpected {value}")
+        text, _, prefix = _value(value)
+        return Text(text, prefix)
+
+
+def has_syntax(query: str) -> bool:
+    """True when the query uses any operator, field, quote or wildcard"""
+    return bool(SYNTAX_PATTERN.search(query or ""))
+
+
+@lru_cache(maxsize=1024)
+def parse_query(query: str):
+    """
+    Parse a search box query into an AST with an evaluate(index) method.
+    Plain queries become a single literal substring; malformed ones fall back to it too.
+    """
+    query = (query or "").strip()
+    if not has_syntax(query):
+        return Text(query)
+    try:
+        return _Parser(tokenize(query)).parse()
+    except QuerySyntaxError:
+        return Text(query)
+
+
+def highlight_terms(query: str) -> list:
+    """Literal text terms of a query, for highlighting matches in results"""
+    return [t for t in parse_query(query).terms() if t]
@@ -0,0 +1,736 @@
+# lichen_search.py
+# Search helpers shared by the Streamlit apps and offline tools
+# - Record accessors and tag/territory/photographer extraction
+# - search_records: the reference linear scan
+# - SearchIndex: facets as bitmaps (Python ints) plus a lowercase text blob for
+#   substring search, built once per catalog load; queries are compiled by lichen_query
+# - diff_catalog / SearchIndex.apply_delta: a new catalog version as inserts, updates and
+#   deletes against the previous index; changed text goes to small delta segments and deleted
+#   ids become tombstones, until needs_compaction() asks for a full rebuild
+# - SearchStream: matches in catalog order as a scan finds them (stream_search_records,
+#   SearchIndex.stream_search), so a first page is available before the scan ends; an
+#   optional time budget stops pathological scans and marks the result incomplete
+
+import re
+import time
+from bisect import bisect_right
+
+from lichen_query import has_syntax, parse_query
+from palette import PaletteIndex, parse_color
+
+# "Credit: Lichen, <photographer> and territorial ..." / "Credit: Lichen and <photographer>. ..."
+CREDIT_PATTERN = re.compile(
+    r'Credit:\s*Lichen\s*(?:,|\band\b)\s*(.+?)(?=\s*(?:,|\band territorial\b|\.|\(|Learn more|$))',
+    re.IGNORECASE,
+)
+
+# Separates fields and records in the search blob; never part of a search term
+FIELD_SEP = b'\x00'
+
+# Catalog columns from image_metadata.py indexed as facets
+METADATA_FACETS = ("orientation", "resolution", "year", "camera", "lens")
+
+# Delta updates: rebuild once this many delta segments have accumulated, or once stale
+# records (tombstones and superseded text) would exceed this share of the live ones
+MAX_DELTA_SEGMENTS = 8
+COMPACT_FRACTION = 0.1
+
+# Streaming scans search the blob this many bytes at a time, checking the time budget in between
+SCAN_WINDOW = 1 << 20
+# ... and the linear scan checks it every this many records
+SCAN_CHECK_EVERY = 256
+# Cached scan and filter bitmaps per index; cleared once it holds this many entries
+SUBSTRING_CACHE_SIZE = 1024
+
+
+def norm(s):
+    return (s or "").strip()
+
+def highlight_pattern(term):
+    # term may be a single string or a list of terms from a parsed query; None if nothing to mark
+    terms = [term] if isinstance(term, str) else [t for t in (term or []) if t]
+    if not terms or not terms[0]:
+        return None
+    alternatives = sorted(terms, key=len, reverse=True)
+    return re.compile("|".join(re.escape(t) for t in alternatives), re.IGNORECASE)
+
+def highlight(text: str, term) -> str:
+    pattern = highlight_pattern(term)
+    if pattern is None or not text:
+        return norm(text)
+    return pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", text)
+
+def record_name(rec: dict) -> str:
+    return rec.get("photo_name") or rec.get("Photo Name") or "Untitled"
+
+def record_desc(rec: dict) -> str:
+    return rec.get("description") or ""
+
+def record_tags(rec: dict) -> str:
+    return rec.get("clip_tags") or ""
+
+def parse_photographer(description: str) -> str:
+    """Extract the photographer from a 'Credit: Lichen, <photographer> ...' description"""
+    match = CREDIT_PATTERN.search(description or "")
+    return match.group(1).strip() if match else ""
+
+def record_photographer(rec: dict) -> str:
+    # Catalogs built by build_catalog.py carry the field; older ones are parsed
+    return rec.get("photographer") or parse_photographer(record_desc(rec))
+
+def split_tags(tags_str: str) -> list:
+    """Split a clip_tags string on common separators"""
+    return [tag.strip() for tag in re.split(r'[,;|\n]', tags_str or "") if tag.strip()]
+
+def get_territorial_info(rec, territorial_data):
+    """Get territorial information for a record"""
+    photo_name = record_name(rec)
+    return territorial_data.get(photo_name, {})
+
+def get_all_territories(territorial_data):
+    """Get list of all unique territories"""
+    territories = set()
+    for mapping in territorial_data.values():
+        if mapping.get('first_nation'):
+            territories.add(mapping['first_nation'])
+    return sorted(list(territories))
+
+def get_all_tags(data):
+    """Extract all unique tags from the dataset"""
+    all_tags = set()
+    for rec in data:
+        all_tags.update(split_tags(record_tags(rec)))
+    return sorted(list(all_tags))
+
+def get_all_photographers(data):
+    """Get list of all unique photographers"""
+    return sorted({p for p in (record_photographer(rec) for rec in data) if p})
+
+def search_records(data, term: str, territorial_data: dict, selected_territory: str = None, selected_tags: list = None, selected_photographer: str = None):
+    return [data[i] for i in _matching_positions(data, term, territorial_data, selected_territory, selected_tags, selected_photographer)]
+
+def stream_search_records(data, term: str, territorial_data: dict, selected_territory: str = None, selected_tags: list = None,
+                          selected_photographer: str = None, time_budget: float = None) -> "SearchStream":
+    """search_records as a SearchStream: records are yielded as the scan reaches them"""
+    deadline = time.perf_counter() + time_budget if time_budget else None
+    return SearchStream(_matching_positions(data, term, territorial_data, selected_territory, selected_tags, selected_photographer, deadline), data)
+
+def _matching_positions(data, term, territorial_data, selected_territory=None, selected_tags=None, selected_photographer=None, deadline=None):
+    # Positions of search_records' matches; returns False if the deadline stopped the scan
+    t = term.lower() if term else ""
+    for i, r in enumerate(data):
+        if deadline is not None and i % SCAN_CHECK_EVERY == 0 and time.perf_counter() > deadline:
+            return False
+
+        # Check text search in description and tags (only if there's a search term)
+        text_match = False
+        if t:
+            text_match = t in record_desc(r).lower() or t in record_tags(r).lower()
+
+        # Check territorial search in text (only if there's a search term)
+        territory_match = False
+        if t and territorial_data:
+            photo_name = record_name(r)
+            territory_info = territorial_data.get(photo_name, {})
+            first_nation = territory_info.get('first_nation', '').lower()
+            territory_match = t in first_nation
+
+        # Check territory filter
+        territory_filter_match = True
+        if selected_territory and selected_territory != "All Territories":
+            photo_name = record_name(r)
+            territory_info = territorial_data.get(photo_name, {})
+            actual_territory = territory_info.get('first_nation', '')
+            territory_filter_match = actual_territory == selected_territory
+
+        # Check photographer filter
+        photographer_filter_match = True
+        if selected_photographer and selected_photographer != "All Photographers":
+            photographer_filter_match = record_photographer(r) == selected_photographer
+
+        # Check tag filter
+        tag_filter_match = True
+        if selected_tags:
+            record_tags_str = record_tags(r).lower()
+            # Check if any selected tag appears in the record's tags
+            tag_filter_match = any(tag.lower() in record_tags_str for tag in selected_tags)
+
+        # Include record based on search criteria:
+        # - If there's a search term: match text/territory search AND all filters
+        # - If no search term but filters selected: match all filters
+        filters_match = territory_filter_match and photographer_filter_match and tag_filter_match
+        if t:
+            if (text_match or territory_match) and filters_match:
+                yield i
+        else:
+            if filters_match:
+                yield i
+    return True
+
+
+# --- Bitmaps -----------------------------------------------------------------
+# A bitmap is a Python int with bit i set when record i is a member.
+
+def ids_to_bitmap(ids) -> int:
+    ids = list(ids)
+    if not ids:
+        return 0
+    buf = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+def bitmap_to_ids(bitmap: int) -> list:
+    """Record ids in ascending order"""
+    bits = bin(bitmap)[:1:-1]  # Least significant bit first
+    ids = []
+    i = bits.find("1")
+    while i != -1:
+        ids.append(i)
+        i = bits.find("1", i + 1)
+    return ids
+
+def bitmap_count(bitmap: int) -> int:
+    return bin(bitmap).count("1")
+
+
+def iter_positions(blob, starts, needle: bytes, deadline: float = None, window: int = SCAN_WINDOW):
+    """
+    find_positions as a generator, searching window bytes of blob at a time; returns True
+    once blob is exhausted, or False when it stopped at the deadline
+    """
+    pos = 0
+    while True:
+        if deadline is not None and time.perf_counter() > deadline:
+            return False
+        stop = pos + window
+        # Matches starting before stop, even if they run past it
+        hit = blob.find(needle, pos, stop + len(needle) - 1)
+        if hit == -1:
+            if stop >= len(blob):
+                return True
+            pos = stop
+            continue
+        rid = bisect_right(starts, hit) - 1
+        yield rid
+        pos = starts[rid + 1]
+
+
+class SearchStream:
+    """
+    Matches of one search, in catalog order, produced as the scan finds them. Iterate for
+    records, or take(n) for the first n; finish() runs the scan to its end. Afterwards
+    .complete is False if the time budget stopped it, and .ids / .bitmap hold what was found.
+    """
+
+    def __init__(self, ids, records):
+        # ids: generator of ascending record ids whose return value is False if it stopped early
+        self._ids = ids
+        self.records = records
+        self.ids = []
+        self.done = False
+        self.complete = True
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def __iter__(self):
+        records = self.records
+        i = 0
+        while True:
+            if i < len(self.ids):
+                yield records[self.ids[i]]
+                i += 1
+                continue
+            if not self._advance():
+                return
+
+    def _advance(self) -> bool:
+        if self.done:
+            return False
+        try:
+            self.ids.append(next(self._ids))
+            return True
+        except StopIteration as stop:
+            self.done = True
+            self.complete = stop.value is not False
+            self.finished = time.perf_counter()
+            return False
+
+    def take(self, n: int) -> list:
+        """The first n matches (fewer if the scan ends first)"""
+        while len(self.ids) < n and self._advance():
+            pass
+        return [self.records[i] for i in self.ids[:n]]
+
+    def finish(self) -> "SearchStream":
+        while self._advance():
+            pass
+        return self
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def bitmap(self) -> int:
+        return ids_to_bitmap(self.ids)
+
+
+def record_nation(rec: dict, territorial_data: dict) -> str:
+    return territorial_data.get(record_name(rec), {}).get('first_nation', '')
+
+def record_chunk(rec: dict, nation: str) -> bytes:
+    # Description, tags and nation are separate fields so a term never spans them
+    return FIELD_SEP.join((
+        record_desc(rec).lower().encode("utf-8"),
+        record_tags(rec).lower().encode("utf-8"),
+        nation.lower().encode("utf-8"),
+    )) + FIELD_SEP
+
+def record_postings(rec: dict, nation: str):
+    """(kind, facet, value) for each posting list of an index that a record belongs to"""
+    if nation:
+        yield "territories", None, nation
+    photographer = record_photographer(rec)
+    if photographer:
+        yield "photographers", None, photographer
+    for tag in split_tags(record_tags(rec)):
+        yield "tags", None, tag
+    for facet in METADATA_FACETS:
+        value = rec.get(facet)
+        if value:
+            yield "facets", facet, str(value)
+
+
+def find_positions(blob, starts, needle: bytes, word_start: bool = False) -> list:
+    """Positions (in starts) of the chunks of blob containing needle, optionally at a word start"""
+    positions = []
+    pos = blob.find(needle)
+    while pos != -1:
+        # Only count matches at the start of a word
+        if word_start and pos and blob[pos - 1:pos].isalnum():
+            pos = blob.find(needle, pos + 1)
+            continue
+        rid = bisect_right(starts, pos) - 1
+        positions.append(rid)
+        pos = blob.find(needle, starts[rid + 1])
+    return positions
+
+
+class CatalogDelta:
+    """A new catalog version against an index: which record ids changed, and how"""
+
+    def __init__(self, territorial_data):
+        self.territorial_data = territorial_data
+        # [(id, new record)] replaced in place, [new record] appended, [id] removed
+        self.updates = []
+        self.inserts = []
+        self.deletes = []
+
+    def __len__(self):
+        return len(self.updates) + len(self.inserts) + len(self.deletes)
+
+
+def diff_catalog(index, data, territorial_data) -> CatalogDelta:
+    """
+    The changes from index's catalog to data, matching records by photo name. A record
+    equal to a live one with the same name (and nation) is unchanged; otherwise it updates
+    a leftover id with its name, or is inserted. Ids left unmatched are deletes.
+    """
+    territorial_data = territorial_data or {}
+    delta = CatalogDelta(territorial_data)
+    records, old_territorial = index.records, index.territorial_data
+    # With the same mapping, equal records have equal nations
+    same_mapping = territorial_data == old_territorial
+    unclaimed = {}
+    pending = []
+    for rec in data:
+        name = record_name(rec)
+        ids = unclaimed.get(name)
+        if ids is None:
+            ids = unclaimed[name] = list(index.names.get(name, ()))
+        for k, i in enumerate(ids):
+            if records[i] != rec:
+                continue
+            if same_mapping or record_nation(rec, old_territorial) == record_nation(rec, territorial_data):
+                del ids[k]
+                break
+        else:
+            pending.append((name, rec))
+    for name, rec in pending:
+        ids = unclaimed[name]
+        if ids:
+            delta.updates.append((ids.pop(0), rec))
+        else:
+            delta.inserts.append(rec)
+    # Names missing from the new catalog were never looked up: all their ids are deletes
+    delta.deletes = sorted(
+        i for name, ids in index.names.items() for i in unclaimed.get(name, ids)
+    )
+    return delta
+
+
+class SearchIndex:
+    """Posting-list index over a catalog and its territorial mapping"""
+
+    def __init__(self, data, territorial_data):
+        self.records = data
+        self.territorial_data = territorial_data or {}
+        self.all = (1 << len(data)) - 1
+
+        territories, photographers, tags, names = {}, {}, {}, {}
+        facets = {facet: {} for facet in METADATA_FACETS}
+        parts, starts = [], []
+        offset = 0
+        postings = {"territories": territories, "photographers": photographers, "tags": tags}
+        for i, rec in enumerate(data):
+            names.setdefault(record_name(rec), []).append(i)
+            nation = record_nation(rec, self.territorial_data)
+            for kind, facet, value in record_postings(rec, nation):
+                target = facets[facet] if facet else postings[kind]
+                target.setdefault(value, []).append(i)
+
+            chunk = record_chunk(rec, nation)
+            starts.append(offset)
+            parts.append(chunk)
+            offset += len(chunk)
+        starts.append(offset)
+
+        self.blob = b"".join(parts)
+        self.starts = starts
+        self.territories = {k: ids_to_bitmap(v) for k, v in territories.items()}
+        self.photographers = {k: ids_to_bitmap(v) for k, v in photographers.items()}
+        self.tags = {k: ids_to_bitmap(v) for k, v in tags.items()}
+        self.facets = {facet: {k: ids_to_bitmap(v) for k, v in values.items()} for facet, values in facets.items()}
+        self.names = names
+        self._init_segments()
+
+    def _init_segments(self):
+        # Delta segments as (blob, starts, global ids, live bitmap); the base segment
+        # (blob, starts) holds record i at position i, live for base_live
+        self.deltas = []
+        self.base_live = self.all
+        self.live_count = len(self.records)
+        self.stale = 0
+        self._palettes = None
+        self._substring_cache = {}
+
+    @classmethod
+    def from_parts(cls, data, territorial_data, blob, starts, territories, photographers, tags, facets, names):
+        """An index over prebuilt parts (see shared_catalog), without rescanning the catalog"""
+        index = cls.__new__(cls)
+        index.records = data
+        index.territorial_data = territorial_data
+        index.all = (1 << len(data)) - 1
+        index.blob = blob
+        index.starts = starts
+        index.territories = territories
+        index.photographers = photographers
+        index.tags = tags
+        index.facets = facets
+        index.names = names
+        index._init_segments()
+        return index
+
+    def __len__(self):
+        """Live records (tombstoned ids are not counted)"""
+        return self.live_count
+
+    def needs_compaction(self, delta: CatalogDelta) -> bool:
+        """Whether applying delta would leave too many segments or stale records; rebuild instead"""
+        if len(self.deltas) >= MAX_DELTA_SEGMENTS:
+            return True
+        return self.stale + len(delta) > COMPACT_FRACTION * max(self.live_count, 1)
+
+    def apply_delta(self, delta: CatalogDelta) -> "SearchIndex":
+        """
+        A new index with delta applied, sharing everything unchanged with this one (which is
+        left as it was). Work is proportional to the delta, plus copying the record list and
+        the postings dicts; record ids stay stable, inserts get new ids at the end.
+        """
+        index = SearchIndex.__new__(SearchIndex)
+        records = list(self.records)
+        index.territorial_data = delta.territorial_data
+        postings = {
+            "territories": dict(self.territories),
+            "photographers": dict(self.photographers),
+            "tags": dict(self.tags),
+        }
+        facets = {facet: dict(values) for facet, values in self.facets.items()}
+        names = dict(self.names)
+
+        def set_bit(target, value, i, on):
+            bits = target.get(value, 0)
+            bits = bits | (1 << i) if on else bits & ~(1 << i)
+            if bits:
+                target[value] = bits
+            else:
+                del target[value]
+
+        def unlink(i):
+            rec = records[i]
+            name = record_name(rec)
+            names[name] = [j for j in names[name] if j != i]
+            if not names[name]:
+                del names[name]
+            for kind, facet, value in record_postings(rec, record_nation(rec, self.territorial_data)):
+                set_bit(facets[facet] if facet else postings[kind], value, i, False)
+
+        changed = [i for i, _ in delta.updates] + list(delta.deletes)
+        for i in changed:
+            unlink(i)
+        removed = ids_to_bitmap(changed)
+
+        ids, parts, starts = [], [], []
+        offset = 0
+        for i, rec in delta.updates + [(len(records) + k, rec) for k, rec in enumerate(delta.inserts)]:
+            if i < len(records):
+                records[i] = rec
+            else:
+                records.append(rec)
+            names.setdefault(record_name(rec), []).append(i)
+            nation = record_nation(rec, delta.territorial_data)
+            for kind, facet, value in record_postings(rec, nation):
+                set_bit(facets[facet] if facet else postings[kind], value, i, True)
+            chunk = record_chunk(rec, nation)
+            ids.append(i)
+            starts.append(offset)
+            parts.append(chunk)
+            offset += len(chunk)
+        starts.append(offset)
+        added = ids_to_bitmap(ids)
+
+        index.records = records
+        index.all = (self.all & ~removed) | added
+        index.blob = self.blob
+        index.starts = self.starts
+        index.base_live = self.base_live & ~removed
+        index.deltas = [(blob, seg_starts, seg_ids, live & ~removed) for blob, seg_starts, seg_ids, live in self.deltas]
+        if ids:
+            index.deltas.append((b"".join(parts), starts, ids, added))
+        index.territories = postings["territories"]
+        index.photographers = postings["photographers"]
+        index.tags = postings["tags"]
+        index.facets = facets
+        index.names = names
+        index.live_count = self.live_count - len(delta.deletes) + len(delta.inserts)
+        index.stale = self.stale + len(changed)
+        index._palettes = None
+        index._substring_cache = {}
+        return index
+
+    def substring(self, term: str) -> int:
+        """Bitmap of records whose description, tags or nation contain term (case-insensitive)"""
+        needle = term.lower().encode("utf-8").replace(FIELD_SEP, b"")
+        if not needle:
+            return self.all
+        cached = self._substring_cache.get(needle)
+        if cached is not None:
+            return cached
+
+        return self._cache(needle, self._scan(needle, word_start=False))
+
+    def word_prefix(self, prefix: str) -> int:
+        """Bitmap of records with a word starting with prefix"""
+        needle = prefix.lower().encode("utf-8").replace(FIELD_SEP, b"")
+        if not needle:
+            return self.all
+        cached = self._substring_cache.get(("prefix", needle))
+        if cached is not None:
+            return cached
+
+        return self._cache(("prefix", needle), self._scan(needle, word_start=True))
+
+    def _cache(self, key, bitmap: int) -> int:
+        # Every _substring_cache insert goes through here, so no kind of key can grow it unbounded
+        if len(self._substring_cache) >= SUBSTRING_CACHE_SIZE:
+            self._substring_cache.clear()
+        self._substring_cache[key] = bitmap
+        return bitmap
+
+    def _scan(self, needle: bytes, word_start: bool) -> int:
+        # Bitmap of records whose current text contains needle, over the base and delta segments
+        bitmap = ids_to_bitmap(find_positions(self.blob, self.starts, needle, word_start))
+        if not self.deltas:
+            return bitmap
+        bitmap &= self.base_live
+        for blob, starts, ids, live in self.deltas:
+            bitmap |= ids_to_bitmap(ids[k] for k in find_positions(blob, starts, needle, word_start)) & live
+        return bitmap
+
+    def _field(self, postings: dict, value: str, prefix: bool, split_names: bool = False) -> int:
+        # Case-insensitive exact (or prefix) match against facet values
+        v = value.lower()
+        bitmap = 0
+        for name, ids in postings.items():
+            names = [n.strip().lower() for n in name.split(",")] if split_names else [name.lower()]
+            if any(n.startswith(v) if prefix else n == v for n in names):
+                bitmap |= ids
+        return bitmap
+
+    def territory_field(self, value: str, prefix: bool = False) -> int:
+        # "Musqueam, Tsleil-Waututh, Squamish" matches territory:Squamish
+        return self._field(self.territories, value, prefix, split_names=True)
+
+    def tag_field(self, value: str, prefix: bool = False) -> int:
+        return self._field(self.tags, value, prefix)
+
+    def photographer_field(self, value: str, prefix: bool = False) -> int:
+        return self._field(self.photographers, value, prefix)
+
+    def name_field(self, value: str, prefix: bool = False) -> int:
+        v = value.lower()
+        ids = [i for name, name_ids in self.names.items()
+               if (name.lower().startswith(v) if prefix else name.lower() == v) for i in name_ids]
+        return ids_to_bitmap(ids)
+
+    def orientation_field(self, value: str, prefix: bool = False) -> int:
+        return self._field(self.facets["orientation"], value, prefix)
+
+    def resolution_field(self, value: str, prefix: bool = False) -> int:
+        return self._field(self.facets["resolution"], value, prefix)
+
+    def year_field(self, value: str, prefix: bool = False) -> int:
+        return self._field(self.facets["year"], value, prefix)
+
+    def camera_field(self, value: str, prefix: bool = False) -> int:
+        return self._field(self.facets["camera"], value, prefix)
+
+    def lens_field(self, value: str, prefix: bool = False) -> int:
+        return self._field(self.facets["lens"], value, prefix)
+
+    def color_field(self, value: str, prefix: bool = False) -> int:
+        # color:#3a6ea5 or color:blue, answered from the catalog's palette columns
+        rgb = parse_color(value)
+        if rgb is None:
+            return 0
+        cached = self._substring_cache.get(("color", rgb))
+        if cached is None:
+            if self._palettes is None:
+                self._palettes = PaletteIndex(self.records)
+            cached = self._cache(("color", rgb), ids_to_bitmap(self._palettes.matching(rgb)))
+        return cached
+
+    def territory(self, name: str) -> int:
+        if not name or name == "All Territories":
+            return self.all
+        return self.territories.get(name, 0)
+
+    def photographer(self, name: str) -> int:
+        if not name or name == "All Photographers":
+            return self.all
+        return self.photographers.get(name, 0)
+
+    def facet(self, name: str, value: str) -> int:
+        if not value:
+            return self.all
+        return self.facets.get(name, {}).get(value, 0)
+
+    def color(self, value: str) -> int:
+        if not value:
+            return self.all
+        return self.color_field(value)
+
+    def any_tag(self, selected_tags) -> int:
+        """Records whose clip_tags contain any of the selected tags (substring, as in search_records)"""
+        if not selected_tags:
+            return self.all
+        bitmap = 0
+        for tag in selected_tags:
+            bitmap |= self.tag_substring(tag)
+        return bitmap
+
+    def tag_substring(self, tag: str) -> int:
+        # Tags are matched as substrings of the clip_tags string, so "fir" also
+        # selects "douglas fir"; union the postings of every vocabulary tag containing it
+        t = tag.lower()
+        cached = self._substring_cache.get(("tag", t))
+        if cached is None:
+            cached = 0
+            for name, bitmap in self.tags.items():
+                if t in name.lower():
+                    cached |= bitmap
+            self._cache(("tag", t), cached)
+        return cached
+
+    def search(self, term: str = "", selected_territory: str = None, selected_tags: list = None, selected_photographer: str = None,
+               selected_color: str = None, selected_facets: dict = None) -> int:
+        """
+        Bitmap of matching records. Plain terms have the same semantics as
+        search_records; terms using the query language are compiled by lichen_query.
+        """
+        bitmap = self.territory(selected_territory) & self.photographer(selected_photographer) & self.any_tag(selected_tags)
+        for name, value in (selected_facets or {}).items():
+            bitmap &= self.facet(name, value)
+        if selected_color and bitmap:
+            bitmap &= self.color(selected_color)
+        if term and bitmap:
+            bitmap &= parse_query(term).evaluate(self)
+        return bitmap
+
+    def records_for(self, bitmap: int) -> list:
+        records = self.records
+        return [records[i] for i in bitmap_to_ids(bitmap)]
+
+    def records_named(self, names, bitmap: int = None) -> list:
+        """Records for photo names in the given (ranked) order, optionally restricted to a bitmap"""
+        bitmap = self.all if bitmap is None else bitmap
+        records = self.records
+        return [records[i] for name in names for i in self.names.get(name, ()) if bitmap >> i & 1]
+
+    def search_records(self, term: str = "", selected_territory: str = None, selected_tags: list = None, selected_photographer: str = None,
+                       selected_color: str = None, selected_facets: dict = None) -> list:
+        return self.records_for(self.search(term, selected_territory, selected_tags, selected_photographer, selected_color, selected_facets))
+
+    def stream_search(self, term: str = "", selected_territory: str = None, selected_tags: list = None, selected_photographer: str = None,
+                      selected_color: str = None, selected_facets: dict = None, time_budget: float = None) -> SearchStream:
+        """
+        search() as a SearchStream. A plain term not yet in the term cache is found by scanning
+        the blob incrementally, so the first matches arrive before the scan ends; anything else
+        (query syntax, filters only, cached terms) is evaluated at once and streamed from the bitmap.
+        """
+        deadline = time.perf_counter() + time_budget if time_budget else None
+        query = (term or "").strip()
+        needle = query.lower().encode("utf-8").replace(FIELD_SEP, b"")
+        if not needle or has_syntax(query) or needle in self._substring_cache:
+            bitmap = self.search(term, selected_territory, selected_tags, selected_photographer, selected_color, selected_facets)
+            return SearchStream(iter(bitmap_to_ids(bitmap)), self.records)
+        filters = self.search("", selected_territory, selected_tags, selected_photographer, selected_color, selected_facets)
+        return SearchStream(self._stream_substring(needle, filters, deadline), self.records)
+
+    def _stream_substring(self, needle: bytes, filters: int, deadline: float):
+        # Delta segments are small: scan them up front, then merge their hits into the base scan
+        delta_bits = 0
+        for blob, starts, ids, live in self.deltas:
+            delta_bits |= ids_to_bitmap(ids[k] for k in find_positions(blob, starts, needle)) & live
+        pending = bitmap_to_ids(delta_bits & filters)
+        base_live = self.base_live if self.deltas else None
+        # Membership tests per hit read a byte instead of shifting a catalog-sized int
+        allowed = filters & base_live if base_live is not None else filters
+        allowed_bytes = None if allowed == self.all else allowed.to_bytes((len(self.records) + 7) // 8, "little")
+        base_ids = []
+        positions = iter_positions(self.blob, self.starts, needle, deadline)
+        while True:
+            try:
+                rid = next(positions)
+            except StopIteration as stop:
+                complete = stop.value
+                break
+            base_ids.append(rid)
+            if allowed_bytes is not None and not allowed_bytes[rid >> 3] >> (rid & 7) & 1:
+                continue
+            while pending and pending[0] < rid:
+                yield pending.pop(0)
+            yield rid
+        if not complete:
+            return False
+        yield from pending
+        # A finished scan answers later searches for the same term from the cache
+        bitmap = ids_to_bitmap(base_ids)
+        if base_live is not None:
+            bitmap &= base_live
+        self._cache(needle, bitmap | delta_bits)
+        return True
@@ -0,0 +1,275 @@
+# metrics.py
+# Stage timings and counters for the apps and the JSON API, in the Prometheus text format
+# - span("stage") times a block into lichen_stage_seconds{stage=...} and the current run's trace
+# - Histograms keep fixed bucket counts, so memory stays flat however long the process runs
+# - One module-level REGISTRY per process, shared by every session and the API server thread
+# - Cached loaders are wrapped with cache_stage and call cache_miss() in their body, so a
+#   lookup the st.cache_* decorator answers without running the body counts as a hit
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers a cached lookup (~µs) up to a cold catalog download
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RESULT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.type = "counter"
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, value) for key, value in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text)
+        self.type = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def replace(self, value, **labels):
+        """Set one labelled value and drop all others (for info-style gauges such as a version)"""
+        with self.lock:
+            self.values = {tuple(sorted(labels.items())): value}
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.type = "histogram"
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            i = 0
+            while i < len(self.buckets) and value > self.buckets[i]:
+                i += 1
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels):
+        entry = self.values.get(tuple(sorted(labels.items())))
+        return entry[2] if entry else 0
+
+    def quantile(self, q, **labels):
+        """Estimate of the q-quantile, interpolated within buckets as histogram_quantile does"""
+        entry = self.values.get(tuple(sorted(labels.items())))
+        if not entry or not entry[2]:
+            return None
+        rank = q * entry[2]
+        seen = 0
+        lower = 0.0
+        for upper, n in zip(self.buckets, entry[0]):
+            if n and seen + n >= rank:
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = upper
+        # In the +Inf bucket: the largest finite bound is the best estimate
+        return lower
+
+    def labelsets(self):
+        return [dict(key) for key in sorted(self.values)]
+
+    def samples(self):
+        out = []
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                cumulative = 0
+                for upper, n in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += n
+                    le = upper if upper == "+Inf" else _format_value(float(upper))
+                    out.append((f"{self.name}_bucket", key + (("le", le),), cumulative))
+                out.append((f"{self.name}_sum", key, total))
+                out.append((f"{self.name}_count", key, count))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, *args):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args)
+            return metric
+
+    def counter(self, name, help_text):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text):
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for name in sorted(self.metrics):
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for sample, labels, value in metric.samples():
+                lines.append(f"{sample}{_label_text(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("lichen_stage_seconds", "Time spent in each stage of a script run")
+RERUN_SECONDS = REGISTRY.histogram("lichen_rerun_seconds", "Wall time of a complete script run")
+QUERY_SECONDS = REGISTRY.histogram("lichen_query_seconds", "Time to evaluate a search and its filters")
+RESULT_COUNT = REGISTRY.histogram("lichen_result_count", "Number of results per search", RESULT_BUCKETS)
+CACHE_REQUESTS = REGISTRY.counter("lichen_cache_requests_total", "Calls to cached loaders")
+CACHE_MISSES = REGISTRY.counter("lichen_cache_misses_total", "Calls to cached loaders that ran the loader")
+CACHE_HIT_RATIO = REGISTRY.gauge("lichen_cache_hit_ratio", "Share of cached loader calls answered from the cache")
+CATALOG_INFO = REGISTRY.gauge("lichen_catalog_info", "Version (content hash) of the loaded catalog")
+CATALOG_RECORDS = REGISTRY.gauge("lichen_catalog_records", "Records in the loaded catalog")
+API_SECONDS = REGISTRY.histogram("lichen_api_request_seconds", "JSON API request latency by endpoint")
+
+_local = threading.local()
+
+
+class Trace:
+    """Spans of one script run as [stage, seconds, depth], in the order they started"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+def start_run() -> Trace:
+    trace = Trace()
+    _local.trace = trace
+    return trace
+
+
+def finish_run(trace: Trace):
+    RERUN_SECONDS.observe(trace.elapsed())
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def span(stage: str, histogram: Histogram = None):
+    """Time a block as one stage of the current run (and into histogram, if given)"""
+    trace = current_trace()
+    entry = None
+    if trace is not None:
+        entry = [stage, None, trace.depth]
+        trace.spans.append(entry)
+        trace.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if histogram is not None:
+            histogram.observe(elapsed)
+        if entry is not None:
+            entry[1] = elapsed
+            trace.depth -= 1
+
+
+def cache_miss():
+    """Called from inside a cached loader's body: this lookup was not answered by the cache"""
+    lookups = getattr(_local, "lookups", None)
+    if lookups:
+        lookups[-1] = True
+
+
+def cache_stage(fn):
+    """Wrap a st.cache_* loader so each call is a span and counted as a cache hit or miss"""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        lookups = getattr(_local, "lookups", None)
+        if lookups is None:
+            lookups = _local.lookups = []
+        lookups.append(False)
+        try:
+            with span(name):
+                return fn(*args, **kwargs)
+        finally:
+            missed = lookups.pop()
+            CACHE_REQUESTS.inc(cache=name)
+            if missed:
+                CACHE_MISSES.inc(cache=name)
+            requests = CACHE_REQUESTS.get(cache=name)
+            CACHE_HIT_RATIO.set(1 - CACHE_MISSES.get(cache=name) / requests, cache=name)
+    return wrapper
+
+
+def set_catalog(version: str, records: int):
+    CATALOG_INFO.replace(1, version=version)
+    CATALOG_RECORDS.set(records)
+
+
+def stage_summary() -> list:
+    """[{stage, runs, p50 ms, p95 ms}] across all runs in this process"""
+    rows = []
+    for labels in STAGE_SECONDS.labelsets():
+        rows.append({
+            "stage": labels["stage"],
+            "runs": STAGE_SECONDS.count(**labels),
+            "p50 ms": round(STAGE_SECONDS.quantile(0.5, **labels) * 1000, 1),
+            "p95 ms": round(STAGE_SECONDS.quantile(0.95, **labels) * 1000, 1),
+        })
+    return rows
+
+
+def cache_hit_ratios() -> dict:
+    return {dict(key)["cache"]: ratio for key, ratio in sorted(CACHE_HIT_RATIO.values.items())}
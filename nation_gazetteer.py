@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Aho-Corasick gazetteer for finding First Nation names in image descriptions.
+
+All names and aliases are compiled into a single automaton so every mention in a
+description is found in one pass, instead of one regex or `in` check per term.
+"""
+
+import csv
+import multiprocessing
+from collections import deque
+
+# Normalization table: lowercase name or alias -> canonical territory name
+NATION_ALIASES = {
+    'coast salish': 'Coast Salish',
+    'musqueam': 'Musqueam',
+    'tsleil-waututh': 'Tsleil-Waututh',
+    'squamish': 'Squamish',
+    'squamish nation': 'Squamish',
+    'secwepemc': 'Secwepemc',
+    'tahltan': 'Tahltan',
+    'mowachaht/muchalaht': 'Mowachaht/Muchalaht',
+    'mowachaht-muchalaht': 'Mowachaht/Muchalaht',
+    'klahoose': 'Klahoose',
+    'nuchatlaht': 'Nuchatlaht',
+    'gitxsan': 'Gitxsan',
+    'nisga\'a': 'Nisga\'a',
+    'taku river tlingit': 'Taku River Tlingit',
+    'lheidli t\'enneh': 'Lheidli T\'enneh',
+    'theklahoose': 'Klahoose',  # Handle concatenated names
+    'thelheidli t\'enneh': 'Lheidli T\'enneh',
+    'muchalaht or nuchatlaht': 'Nuchatlaht',
+    'mowachaht/muchalaht or nuchatlaht': 'Nuchatlaht',
+}
+
+# Umbrella names that are dropped when a specific nation is also mentioned
+NATION_GROUPS = {'Coast Salish'}
+
+
+class Gazetteer:
+    """Aho-Corasick automaton mapping lowercase terms to canonical names"""
+
+    def __init__(self, terms=None, whole_words=True):
+        if terms is None:
+            terms = NATION_ALIASES
+        self.whole_words = whole_words
+        # Node 0 is the root; each node has transitions, a failure link and outputs
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for term, canonical in terms.items():
+            self._add(term.lower(), canonical)
+        self._link()
+
+    def _add(self, term, canonical):
+        node = 0
+        for ch in term:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][ch] = nxt
+            node = nxt
+        self.output[node].append((len(term), canonical))
+
+    def _link(self):
+        """Breadth-first construction of failure links"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                # Inherit matches that end at the failure state
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+        for outputs in self.output:
+            outputs.sort(reverse=True)  # Longest match first
+
+    def _is_boundary(self, text, start, end):
+        if not self.whole_words:
+            return True
+        before = text[start - 1] if start > 0 else ' '
+        after = text[end] if end < len(text) else ' '
+        return not before.isalnum() and not after.isalnum()
+
+    def find_all(self, text, overlapping=False):
+        """
+        Return (start, end, canonical) for every term found in text.
+        Without overlapping, keeps the leftmost-longest non-overlapping matches.
+        """
+        if not text:
+            return []
+        text = text.lower()
+        goto, fail, output = self.goto, self.fail, self.output
+        matches = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, canonical in output[node]:
+                start = i + 1 - length
+                if self._is_boundary(text, start, i + 1):
+                    matches.append((start, i + 1, canonical))
+
+        if overlapping:
+            return sorted(matches)
+
+        selected = []
+        last_end = 0
+        for start, end, canonical in sorted(matches, key=lambda m: (m[0], -m[1])):
+            if start >= last_end:
+                selected.append((start, end, canonical))
+                last_end = end
+        return selected
+
+    def find_terms(self, text):
+        """Return every distinct canonical term found in text, overlaps included"""
+        return list(dict.fromkeys(m[2] for m in self.find_all(text, overlapping=True)))
+
+    def find_nations(self, text, include_groups=False):
+        """Return canonical nation names in order of first mention"""
+        names = list(dict.fromkeys(m[2] for m in self.find_all(text)))
+        if not include_groups and any(n not in NATION_GROUPS for n in names):
+            names = [n for n in names if n not in NATION_GROUPS]
+        return names
+
+
+_default_gazetteer = None
+
+
+def get_gazetteer():
+    """Return the shared gazetteer built from NATION_ALIASES"""
+    global _default_gazetteer
+    if _default_gazetteer is None:
+        _default_gazetteer = Gazetteer()
+    return _default_gazetteer
+
+
+def find_nations(description):
+    """Find all nation mentions in a description using the shared gazetteer"""
+    return get_gazetteer().find_nations(description)
+
+
+def _scan_row(row):
+    return row['Photo Name'], find_nations(row['Description'])
+
+
+def scan_rows(rows, processes=1, chunksize=256):
+    """
+    Yield (photo_name, nations) for each CSV row.
+    With processes > 1 the rows are scanned by a process pool, preserving order.
+    """
+    if processes <= 1:
+        for row in rows:
+            yield _scan_row(row)
+        return
+
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap(_scan_row, rows, chunksize)
+
+
+def scan_csv(path, processes=1, chunksize=256):
+    """Yield (photo_name, nations) for each row of a scraped CSV file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from scan_rows(csv.DictReader(f), processes, chunksize)
+
+
+if __name__ == "__main__":
+    import sys
+
+    paths = sys.argv[1:] or ['TempShopify/output_dsc0001-9999.csv']
+    counts = {}
+    for path in paths:
+        for photo_name, nations in scan_csv(path, processes=multiprocessing.cpu_count()):
+            for nation in nations:
+                counts[nation] = counts.get(nation, 0) + 1
+
+    print("Nation mentions found:")
+    for nation, count in sorted(counts.items()):
+        print(f"  {nation}: {count} images")
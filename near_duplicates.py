@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Perceptual hashes and near-duplicate clusters for the catalog thumbnails.
+
+Each thumbnail gets a 64-bit DCT perceptual hash (pHash), stored in the catalog's phash
+column by build_catalog.py. Frames from the same burst differ by only a few bits, so
+photos whose hashes are within DUPLICATE_RADIUS of each other (Hamming distance, found
+with a BK-tree) are grouped, and the results grid can show one card per group.
+
+Usage:
+    python near_duplicates.py [--thumbs DIR] [--radius N] [--workers N]
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from build_thumbnails import find_sources
+from lichen_search import record_name
+
+THUMB_DIR = 'LichenThumbnail'
+HASH_SIZE = 8
+SAMPLE_SIZE = HASH_SIZE * 4
+# The median leaves out the DC term, so the number of set bits is not fixed (usually 32, fewer
+# or more with ties or a dark frame) and odd distances can occur. On the catalog thumbnails,
+# bursts measure up to 12; from 14 on, unrelated photos appear alongside retakes of a scene
+DUPLICATE_RADIUS = 12
+
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    m = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    m[0] /= np.sqrt(2)
+    return m * np.sqrt(2 / n)
+
+
+_DCT = _dct_matrix(SAMPLE_SIZE)
+
+
+def phash(im):
+    """64-bit perceptual hash of a PIL image, as a 16-digit hex string"""
+    gray = np.asarray(im.convert('L').resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT @ gray @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term only encodes overall brightness; leave it out of the median
+    bits = low > np.median(low[1:])
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):016x}"
+
+
+def image_phash(path):
+    with Image.open(path) as im:
+        return phash(im)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Metric tree over integer hashes for Hamming-radius queries"""
+
+    def __init__(self, items=()):
+        self.root = None
+        for key, value in items:
+            self.add(key, value)
+
+    def add(self, key, value):
+        node = [key, [value], {}]
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            d = hamming(key, current[0])
+            if d == 0:
+                current[1].append(value)
+                return
+            child = current[2].get(d)
+            if child is None:
+                current[2][d] = node
+                return
+            current = child
+
+    def query(self, key, radius):
+        """Values whose key is within radius of key"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_key, values, children = stack.pop()
+            d = hamming(key, node_key)
+            if d <= radius:
+                found.extend(values)
+            # Triangle inequality: only subtrees at distance d +/- radius can match
+            for dist, child in children.items():
+                if d - radius <= dist <= d + radius:
+                    stack.append(child)
+        return found
+
+
+def cluster_hashes(hashes, radius=DUPLICATE_RADIUS):
+    """Map each name in {name: hex hash} to its group's representative name (the smallest name)"""
+    parent = {name: name for name in hashes}
+
+    def find(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    tree = BKTree((int(h, 16), name) for name, h in hashes.items())
+    for name, h in hashes.items():
+        for other in tree.query(int(h, 16), radius):
+            a, b = find(name), find(other)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+    return {name: find(name) for name in hashes}
+
+
+def duplicate_groups(records, radius=DUPLICATE_RADIUS):
+    """Map photo name -> group representative for catalog records with a phash column"""
+    return cluster_hashes({record_name(rec): rec['phash'] for rec in records if rec.get('phash')}, radius)
+
+
+def collapse_duplicates(records, groups):
+    """[(record, group size)] keeping the first record of each near-duplicate group, in order"""
+    keys = [groups.get(record_name(rec), record_name(rec)) for rec in records]
+    sizes = {}
+    for key in keys:
+        sizes[key] = sizes.get(key, 0) + 1
+    shown = set()
+    collapsed = []
+    for rec, key in zip(records, keys):
+        if key not in shown:
+            shown.add(key)
+            collapsed.append((rec, sizes[key]))
+    return collapsed
+
+
+def compute_hashes(thumb_dir=THUMB_DIR, workers=None):
+    """{photo_name: hex phash} for every thumbnail in thumb_dir"""
+    sources = find_sources(thumb_dir)
+    names = sorted(sources)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        hashes = pool.map(image_phash, [os.path.join(thumb_dir, sources[n]) for n in names], chunksize=16)
+        return dict(zip(names, hashes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report near-duplicate thumbnail groups")
+    parser.add_argument('--thumbs', default=THUMB_DIR, help="Directory of thumbnails")
+    parser.add_argument('--radius', type=int, default=DUPLICATE_RADIUS, help="Maximum Hamming distance")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    groups = {}
+    for name, rep in cluster_hashes(compute_hashes(args.thumbs, args.workers), args.radius).items():
+        groups.setdefault(rep, []).append(name)
+    clustered = [members for members in groups.values() if len(members) > 1]
+
+    print(f"{sum(len(g) for g in groups.values())} thumbnails in {len(groups)} groups "
+          f"({len(clustered)} groups with near duplicates)")
+    for members in sorted(clustered, key=len, reverse=True):
+        print(f"  {len(members):3d}  {', '.join(sorted(members))}")
+
+
+if __name__ == "__main__":
+    main()
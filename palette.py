@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Dominant colors for the catalog thumbnails, and nearest-color lookup over them.
+
+Each thumbnail's pixels are clustered with a vectorized k-means in CIELAB space. The
+cluster centers, largest first, are stored in the catalog's palette column (hex colors)
+with their share of the image in palette_share (percent), by build_catalog.py.
+At query time a color is matched against those columns only: an image matches when one
+of its palette colors covering at least MIN_SHARE percent lies within MATCH_DISTANCE
+(CIE76 delta E) of the requested color.
+
+Usage:
+    python palette.py IMAGE [IMAGE ...]
+"""
+
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from build_thumbnails import find_sources
+
+THUMB_DIR = 'LichenThumbnail'
+PALETTE_SIZE = 5
+SAMPLE_SIZE = 64
+KMEANS_ITERATIONS = 20
+MATCH_DISTANCE = 20.0
+MIN_SHARE = 10
+
+# Names accepted by color:<name>, for palette-style searches ("color:orange")
+COLOR_NAMES = {
+    'red': '#c0392b',
+    'orange': '#d9822b',
+    'yellow': '#e5c640',
+    'green': '#4f7942',
+    'teal': '#2f7f7a',
+    'blue': '#3a6ea5',
+    'navy': '#1f3550',
+    'purple': '#6c4f8a',
+    'pink': '#d98ea6',
+    'brown': '#7a5a3a',
+    'beige': '#cdbf9f',
+    'white': '#f2f2f0',
+    'grey': '#8a8d8f',
+    'gray': '#8a8d8f',
+    'black': '#1a1a1a',
+}
+
+HEX_PATTERN = re.compile(r'^#?([0-9a-fA-F]{3}|[0-9a-fA-F]{6})$')
+
+
+def rgb_to_lab(rgb):
+    """CIELAB (D65) for an (..., 3) array of 0-255 sRGB values"""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array([[0.4124, 0.2126, 0.0193],
+                        [0.3576, 0.7152, 0.1192],
+                        [0.1805, 0.0722, 0.9505]])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def parse_color(value):
+    """(r, g, b) for '#3a6ea5', '3a6ea5', '#36a' or a name in COLOR_NAMES; None otherwise"""
+    value = (value or '').strip().lower()
+    value = COLOR_NAMES.get(value, value)
+    match = HEX_PATTERN.match(value)
+    if not match:
+        return None
+    digits = match.group(1)
+    if len(digits) == 3:
+        digits = ''.join(d * 2 for d in digits)
+    return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def assign(points, centers):
+    """Index of the nearest center for each point (|x|^2 - 2 x.c + |c|^2, one matrix product)"""
+    return ((centers ** 2).sum(axis=1) - 2 * points @ centers.T).argmin(axis=1)
+
+
+def kmeans(points, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """Cluster an (n, d) array; returns (centers, counts), with k-means++ seeding"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(points))
+    centers = [points[rng.integers(len(points))]]
+    nearest = ((points - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = nearest.sum()
+        if total == 0:
+            break
+        centers.append(points[rng.choice(len(points), p=nearest / total)])
+        nearest = np.minimum(nearest, ((points - centers[-1]) ** 2).sum(axis=1))
+    centers = np.array(centers)
+
+    for _ in range(iterations):
+        labels = assign(points, centers)
+        counts = np.bincount(labels, minlength=len(centers))
+        sums = np.stack([np.bincount(labels, weights=points[:, j], minlength=len(centers))
+                         for j in range(points.shape[1])], axis=1)
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        if np.abs(updated - centers).max() < 0.01:
+            break
+        centers = updated
+    return centers, np.bincount(assign(points, centers), minlength=len(centers))
+
+
+def dominant_colors(path, k=PALETTE_SIZE):
+    """([hex colors], [percent shares]) for an image, largest cluster first"""
+    with Image.open(path) as im:
+        im = im.convert('RGB')
+        im.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE))
+        rgb = np.asarray(im, dtype=np.float64).reshape(-1, 3)
+
+    # Cluster in Lab so distances follow perceived color; report the mean sRGB of each cluster
+    lab = rgb_to_lab(rgb)
+    centers, counts = kmeans(lab, k)
+    labels = assign(lab, centers)
+    palette, shares = [], []
+    for i in np.argsort(-counts):
+        if counts[i] == 0:
+            continue
+        r, g, b = rgb[labels == i].mean(axis=0).round().astype(int)
+        palette.append(f"#{r:02x}{g:02x}{b:02x}")
+        shares.append(int(round(100 * counts[i] / len(rgb))))
+    return palette, shares
+
+
+def compute_palettes(thumb_dir=THUMB_DIR, workers=None):
+    """{photo_name: (palette, shares)} for every thumbnail in thumb_dir"""
+    sources = find_sources(thumb_dir)
+    names = sorted(sources)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        palettes = pool.map(dominant_colors, [os.path.join(thumb_dir, sources[n]) for n in names], chunksize=16)
+        return dict(zip(names, palettes))
+
+
+class PaletteIndex:
+    """Catalog palette columns as arrays, for vectorized nearest-color lookup"""
+
+    def __init__(self, records):
+        rgb = np.zeros((len(records), PALETTE_SIZE, 3))
+        share = np.zeros((len(records), PALETTE_SIZE))
+        for i, rec in enumerate(records):
+            colors = [parse_color(c) for c in (rec.get('palette') or [])[:PALETTE_SIZE]]
+            for j, (color, pct) in enumerate(zip(colors, rec.get('palette_share') or [])):
+                if color is not None:
+                    rgb[i, j] = color
+                    share[i, j] = pct
+        # Empty slots keep share 0, so they never match
+        self.lab = rgb_to_lab(rgb)
+        self.share = share
+
+    def distances(self, rgb, min_share=MIN_SHARE):
+        """Per record, the delta E from rgb to its nearest palette color covering min_share percent"""
+        d = np.sqrt(((self.lab - rgb_to_lab(rgb)) ** 2).sum(axis=2))
+        d[self.share < min_share] = np.inf
+        return d.min(axis=1)
+
+    def matching(self, rgb, max_distance=MATCH_DISTANCE, min_share=MIN_SHARE):
+        """Ids of records with a palette color within max_distance of rgb"""
+        return np.flatnonzero(self.distances(rgb, min_share) <= max_distance).tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the dominant colors of images")
+    parser.add_argument('images', nargs='+', help="Image files")
+    parser.add_argument('-k', type=int, default=PALETTE_SIZE, help="Number of colors")
+    args = parser.parse_args()
+
+    for path in args.images:
+        palette, shares = dominant_colors(path, args.k)
+        print(f"{path}: " + ", ".join(f"{c} {s}%" for c, s in zip(palette, shares)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# profiling.py
+# Operator-only profiling of one script run (?profile=1&profile_key=<secret> in the apps)
+# - cProfile (deterministic) for the hot-function table: own and cumulative time per function
+# - A sampling thread reading the script thread's stack every SAMPLE_INTERVAL seconds,
+#   folded into a flame graph rendered as a self-contained SVG
+# - tracemalloc snapshots at start and stop; their diff shows where the run allocated
+#   memory that is still alive
+# Disabled unless a secret is configured; the key is compared in constant time.
+
+import cProfile
+import hmac
+import html
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+
+SECRET_ENV = "LICHEN_PROFILE_SECRET"
+# The sampler needs the GIL to read stacks, so sampling faster than the 5 ms switch interval gains little
+SAMPLE_INTERVAL = 0.005
+# A run that is never stopped (st.rerun, st.stop) stops sampling and tracing by itself
+MAX_SECONDS = 60
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+TRACEMALLOC_FRAMES = 1
+
+FLAME_WIDTH = 1200
+FLAME_ROW = 17
+# Frames narrower than this many pixels are not drawn
+FLAME_MIN_WIDTH = 0.5
+
+LIBRARY_PREFIX = re.compile(r".*[\\/](?:site-packages|lib[\\/]python\d+\.\d+)[\\/]")
+
+# Thread id -> the RunProfiler started on it
+_active = {}
+
+
+def authorized(requested: str, key: str, secret: str) -> bool:
+    """Whether ?profile=<requested>&profile_key=<key> may profile, given the configured secret"""
+    if not secret or requested not in ("1", "true"):
+        return False
+    return hmac.compare_digest((key or "").encode("utf-8"), secret.encode("utf-8"))
+
+
+def short_path(path: str) -> str:
+    # Library paths from site-packages / the stdlib, app paths relative to the working directory
+    short = LIBRARY_PREFIX.sub("", path)
+    cwd = os.getcwd() + os.sep
+    return short[len(cwd):] if short.startswith(cwd) else short
+
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RunProfiler:
+    """Profiles the calling thread from start() to stop()"""
+
+    def __init__(self, root_file: str = None, interval: float = SAMPLE_INTERVAL):
+        # Stacks are trimmed to start at the first frame in root_file (the app script),
+        # dropping the Streamlit runner frames above it
+        self.root_file = os.path.abspath(root_file) if root_file else None
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.stacks = {}
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self.owns_tracemalloc = False
+        self.before = None
+        self.after = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        ident = threading.get_ident()
+        # A previous run on this thread that ended in st.rerun() never reached stop()
+        previous = _active.get(ident)
+        if previous is not None:
+            previous.stop()
+        _active[ident] = self
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.owns_tracemalloc = True
+        self.before = tracemalloc.take_snapshot()
+        self._thread = threading.Thread(target=self._sample, args=(ident,), name="lichen-profiler", daemon=True)
+        self.started = time.perf_counter()
+        self._thread.start()
+        self.profile.enable()
+        return self
+
+    def _sample(self, ident):
+        deadline = time.perf_counter() + MAX_SECONDS
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(ident)
+            if frame is None or time.perf_counter() > deadline:
+                self._release_tracemalloc()
+                return
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            if self.root_file:
+                for i, code in enumerate(stack):
+                    if code.co_filename == self.root_file:
+                        stack = stack[i:]
+                        break
+            # Code objects are hashable; labels are only built when drawing
+            key = tuple(stack)
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def _release_tracemalloc(self):
+        if self.owns_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.owns_tracemalloc = False
+
+    def stop(self):
+        if self._stopped.is_set():
+            return self
+        self.profile.disable()
+        self.elapsed = time.perf_counter() - self.started
+        self._stopped.set()
+        self._thread.join()
+        if tracemalloc.is_tracing():
+            self.after = tracemalloc.take_snapshot()
+        self._release_tracemalloc()
+        if _active.get(threading.get_ident()) is self:
+            del _active[threading.get_ident()]
+        return self
+
+    def top_functions(self, n: int = TOP_FUNCTIONS) -> list:
+        """[{function, calls, own ms, cumulative ms}] by own time"""
+        stats = pstats.Stats(self.profile).stats
+        rows = sorted(stats.items(), key=lambda kv: -kv[1][2])[:n]
+        return [
+            {
+                "function": f"{func} ({short_path(file)}:{line})" if line else func,
+                "calls": calls,
+                "own ms": round(own * 1000, 2),
+                "cumulative ms": round(cumulative * 1000, 2),
+            }
+            for (file, line, func), (_, calls, own, cumulative, _) in rows
+        ]
+
+    def allocations(self, n: int = TOP_ALLOCATIONS) -> list:
+        """[{location, size KB, change KB, blocks}] for lines whose live allocations grew most"""
+        if self.before is None or self.after is None:
+            return []
+        ignore = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*"),
+        ]
+        diff = self.after.filter_traces(ignore).compare_to(self.before.filter_traces(ignore), "lineno")
+        return [
+            {
+                "location": f"{short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                "size KB": round(stat.size / 1024, 1),
+                "change KB": round(stat.size_diff / 1024, 1),
+                "blocks": stat.count_diff,
+            }
+            for stat in diff[:n]
+            if stat.size_diff > 0
+        ]
+
+    def flame_svg(self, width: int = FLAME_WIDTH) -> str:
+        labels = {}
+        stacks = {}
+        for stack, count in self.stacks.items():
+            key = tuple(labels.get(code) or labels.setdefault(code, frame_label(code)) for code in stack)
+            stacks[key] = stacks.get(key, 0) + count
+        return flame_graph(stacks, width)
+
+
+def flame_graph(stacks: dict, width: int = FLAME_WIDTH) -> str:
+    """SVG flame graph from {(root, ..., leaf): samples}; hover a frame for its share"""
+    total = sum(stacks.values())
+    if not total:
+        return ""
+    # Merge stacks into a tree of [samples, children]
+    root = [0, {}]
+    for stack, count in stacks.items():
+        node = root
+        node[0] += count
+        for label in stack:
+            node = node[1].setdefault(label, [0, {}])
+            node[0] += count
+
+    rects = []
+    depth_max = 0
+    scale = width / total
+
+    def layout(children, x, depth):
+        nonlocal depth_max
+        for label, (count, grandchildren) in sorted(children.items()):
+            w = count * scale
+            if w >= FLAME_MIN_WIDTH:
+                depth_max = max(depth_max, depth)
+                rects.append((label, count, x, depth, w))
+                layout(grandchildren, x, depth + 1)
+            x += w
+
+    layout(root[1], 0.0, 0)
+    height = (depth_max + 1) * FLAME_ROW
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">'
+    ]
+    for label, count, x, depth, w in rects:
+        # Warm colors, stable per function
+        hue = zlib.crc32(label.encode("utf-8")) % 55
+        y = height - (depth + 1) * FLAME_ROW
+        name = html.escape(label)
+        parts.append(
+            f'<g><title>{name}: {count} samples ({count / total:.1%})</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{FLAME_ROW - 1}" fill="hsl({hue},85%,60%)"/>'
+        )
+        chars = int(w / 7)
+        if chars >= 3:
+            text = label if len(label) <= chars else label[:chars - 1] + "…"
+            parts.append(f'<text x="{x + 2:.1f}" y="{y + FLAME_ROW - 5}">{html.escape(text)}</text>')
+        parts.append("</g>")
+    parts.append("</svg>")
+    return "".join(parts)
@@ -0,0 +1,228 @@
+# refresher.py
+# Keeps the app's catalog snapshot fresh off the request path
+# - A Snapshot bundles one catalog version's index and everything derived from it (suggester,
+#   fuzzy index, tag graph, duplicate groups), so a rerun that takes it sees one consistent version
+# - A daemon thread polls for a new version every interval, builds the next snapshot in the
+#   background and swaps it in by replacing one reference; runs already holding the old one finish on it
+# - Polls use conditional GETs (If-None-Match), so an unchanged catalog costs two 304s;
+#   with a shared build directory (shared_catalog.py) they attach to its live build instead
+# - A changed catalog is applied as a delta (lichen_search.diff_catalog) when it is small: the
+#   index and fuzzy vocabulary are updated, while the suggester and tag graph (ranking aids)
+#   are carried over until the next full build, forced after COMPACT_INTERVAL at the latest
+# - A failed poll or build keeps serving the current snapshot and is retried at the next poll;
+#   the territorial mapping is only optional for the first snapshot, which is built without one
+#   (and says so) rather than not at all
+
+import copy
+import hashlib
+import json
+import threading
+import time
+
+import requests
+
+import metrics
+import shared_catalog
+from fuzzy import FuzzyIndex
+from lichen_search import SearchIndex, diff_catalog
+from near_duplicates import duplicate_groups
+from related_tags import TagGraph
+from suggest import Suggester
+
+REFRESH_INTERVAL = 300
+# A failed poll is retried sooner than a successful one
+RETRY_INTERVAL = 30
+FETCH_TIMEOUT = 15
+# Delta snapshots are replaced by a full build at least this often
+COMPACT_INTERVAL = 6 * 3600
+
+REFRESHES = metrics.REGISTRY.counter("lichen_refresh_total", "Background catalog polls by outcome")
+SNAPSHOT_AGE = metrics.REGISTRY.gauge("lichen_snapshot_age_seconds", "Age of the served catalog snapshot at the last poll")
+
+
+class Snapshot:
+    """One catalog version and the structures built from it; never modified after the swap"""
+
+    def __init__(self, version: str, index, warning: str = None):
+        self.version = version
+        self.index = index
+        self.records = index.records
+        self.territorial_data = index.territorial_data
+        self.suggester = Suggester(index)
+        self.fuzzy = FuzzyIndex(index)
+        self.tag_graph = TagGraph(index.tags)
+        self.duplicate_groups = duplicate_groups(index.records)
+        # Shown by the app, e.g. when the territorial mapping could not be fetched
+        self.warning = warning
+        self.built = time.time()
+        # Time of the last full build; deltas carry it over
+        self.compacted = self.built
+
+    def updated(self, version: str, data, territorial_data, warning: str = None) -> "Snapshot":
+        """The snapshot for a new catalog version, as a delta on this one when that is cheaper"""
+        delta = diff_catalog(self.index, data, territorial_data)
+        if self.index.needs_compaction(delta) or time.time() - self.compacted > COMPACT_INTERVAL:
+            return Snapshot(version, SearchIndex(data, territorial_data), warning)
+        old = self.index
+        index = old.apply_delta(delta)
+        snapshot = copy.copy(self)
+        snapshot.version = version
+        snapshot.index = index
+        snapshot.records = index.records
+        snapshot.territorial_data = index.territorial_data
+        removed = [old.records[i] for i, _ in delta.updates] + [old.records[i] for i in delta.deletes]
+        added = [rec for _, rec in delta.updates] + delta.inserts
+        snapshot.fuzzy = self.fuzzy.updated(removed, added, [n for n in index.territories if n not in old.territories],
+                                            [n for n in old.territories if n not in index.territories])
+        snapshot.duplicate_groups = duplicate_groups(index.records_for(index.all))
+        snapshot.warning = warning
+        snapshot.built = time.time()
+        return snapshot
+
+
+class UrlWatcher:
+    """GETs a URL, with If-None-Match after the first time: fetch() is None while it is unchanged"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.etag = None
+
+    def fetch(self, conditional: bool = True):
+        headers = {"If-None-Match": self.etag} if conditional and self.etag else {}
+        try:
+            r = requests.get(self.url, headers=headers, timeout=FETCH_TIMEOUT)
+            if r.status_code == 304:
+                return None
+            r.raise_for_status()
+        except requests.RequestException:
+            # Fetch in full next time rather than trusting a 304 for content we never got
+            self.etag = None
+            raise
+        self.etag = r.headers.get("ETag")
+        return r.content
+
+
+class CatalogFetcher:
+    """Downloads the catalog and territorial mapping when either has changed; keeps no copy"""
+
+    def __init__(self, catalog_url: str, territorial_url: str):
+        self.catalog = UrlWatcher(catalog_url)
+        self.territorial = UrlWatcher(territorial_url)
+
+    def _territorial(self, conditional, optional):
+        try:
+            return self.territorial.fetch(conditional), None
+        except requests.RequestException as e:
+            if not optional:
+                raise
+            # Search without a mapping until it can be fetched again
+            return b"", f"Could not load territorial data: {e}. Continuing without territorial information."
+
+    def fetch(self, conditional: bool = True, territorial_optional: bool = False):
+        """
+        (version, data, territorial_data, warning), or None when neither file changed since the
+        last fetch. A failed mapping download raises, unless territorial_optional, when the
+        catalog is returned with an empty mapping and a warning.
+        """
+        catalog = self.catalog.fetch(conditional)
+        territorial, warning = self._territorial(conditional, territorial_optional)
+        if catalog is None and territorial is None:
+            return None
+        # One file changed: the other is needed in full to build the new version
+        if catalog is None:
+            catalog = self.catalog.fetch(False)
+        if territorial is None:
+            territorial, warning = self._territorial(False, territorial_optional)
+
+        digest = hashlib.sha256(catalog)
+        digest.update(territorial)
+        data = json.loads(catalog)
+        if not isinstance(data, list):
+            raise ValueError("JSON root is not a list")
+        territorial_data = json.loads(territorial) if territorial else {}
+        return digest.hexdigest()[:12], data, territorial_data, warning
+
+
+def url_source(catalog_url: str, territorial_url: str):
+    """Source for Refresher reading the catalog files over HTTP"""
+    fetcher = CatalogFetcher(catalog_url, territorial_url)
+
+    def source(current):
+        # Once there is a snapshot, a missing mapping fails the poll instead of replacing it
+        fetched = fetcher.fetch(territorial_optional=current is None)
+        if fetched is None or current and fetched[0] == current.version:
+            return None
+        new_version, data, territorial_data, warning = fetched
+        if current is None:
+            return Snapshot(new_version, SearchIndex(data, territorial_data), warning)
+        return current.updated(new_version, data, territorial_data, warning)
+
+    return source
+
+
+def shared_source(directory: str, catalog_url: str, territorial_url: str, max_age: float = REFRESH_INTERVAL):
+    """Source for Refresher backed by a shared build directory; one worker publishes for all"""
+
+    def fetch():
+        # Unconditional: publish() hashes the content and keeps the build if it is unchanged.
+        # A missing mapping fails the publish once there is a live build, which workers keep
+        optional = shared_catalog.current_build(directory) is None
+        _, data, territorial_data, warning = CatalogFetcher(catalog_url, territorial_url).fetch(False, optional)
+        return data, territorial_data, warning
+
+    def source(current):
+        catalog = shared_catalog.ensure(fetch, directory, max_age)
+        if current and catalog.version == current.version:
+            return None
+        return Snapshot(catalog.version, catalog.index, catalog.warning)
+
+    return source
+
+
+class Refresher:
+    """Serves .current and replaces it in the background when source reports a new version"""
+
+    def __init__(self, source, interval: float = REFRESH_INTERVAL):
+        # source(current snapshot or None) -> the next Snapshot, or None when current is up to date
+        self.source = source
+        self.interval = interval
+        self.current = None
+        self.last_error = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def refresh(self) -> bool:
+        """Poll once and swap in a new snapshot if there is one; True when it swapped"""
+        with metrics.span("refresh"):
+            snapshot = self.source(self.current)
+            if snapshot is None:
+                REFRESHES.inc(outcome="unchanged")
+                return False
+        # Readers take self.current once per run; rebinding it is atomic
+        self.current = snapshot
+        metrics.set_catalog(snapshot.version, len(snapshot.records))
+        REFRESHES.inc(outcome="swapped")
+        return True
+
+    def start(self):
+        # The first snapshot is built on the caller's thread: there is nothing to serve without it
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name="lichen-refresher", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        wait = self.interval
+        while not self._stopped.wait(wait):
+            try:
+                self.refresh()
+                self.last_error = None
+                wait = self.interval
+            except Exception as e:
+                REFRESHES.inc(outcome="failed")
+                self.last_error = e
+                wait = min(RETRY_INTERVAL, self.interval)
+            SNAPSHOT_AGE.set(time.time() - self.current.built)
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,71 @@
+# related_tags.py
+# "Related tags" suggestions and query expansion from tag co-occurrence
+# - Built once per SearchIndex (i.e. per catalog version) from the tag bitmaps:
+#   co-occurrence of two tags is the popcount of their bitmaps ANDed together
+# - Kept sparse: only pairs seen together MIN_COOCCURRENCE+ times, strongest RELATED_PER_TAG per tag
+# - Queries only read that table; nothing rescans the catalog per rerun
+
+from lichen_query import has_syntax
+from lichen_search import bitmap_count
+
+MIN_COOCCURRENCE = 2
+RELATED_PER_TAG = 12
+# Result-set tags used as seeds when the query names no tag
+RESULT_SEEDS = 3
+
+
+class TagGraph:
+    """Sparse tag co-occurrence table with Jaccard association scores"""
+
+    def __init__(self, tag_bitmaps: dict, min_count: int = MIN_COOCCURRENCE, per_tag: int = RELATED_PER_TAG):
+        self.bitmaps = tag_bitmaps
+        self.counts = {tag: bitmap_count(bits) for tag, bits in tag_bitmaps.items()}
+        tags = sorted(tag_bitmaps)
+        pairs = {tag: [] for tag in tags}
+        for i, a in enumerate(tags):
+            bits_a = tag_bitmaps[a]
+            for b in tags[i + 1:]:
+                together = bitmap_count(bits_a & tag_bitmaps[b])
+                if together >= min_count:
+                    score = together / (self.counts[a] + self.counts[b] - together)
+                    pairs[a].append((b, together, score))
+                    pairs[b].append((a, together, score))
+        self.related_map = {
+            tag: sorted(others, key=lambda o: (-o[2], o[0]))[:per_tag] for tag, others in pairs.items()
+        }
+
+    def related(self, tags, k: int = 8) -> list:
+        """[(tag, score)] most associated with any of tags, strongest first, excluding tags themselves"""
+        seeds = set(tags)
+        scores = {}
+        for tag in seeds:
+            for other, _, score in self.related_map.get(tag, ()):
+                if other not in seeds:
+                    scores[other] = scores.get(other, 0.0) + score
+        return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+
+    def suggest(self, terms: list, selected_tags: list, bitmap: int = 0, k: int = 8) -> list:
+        """
+        Related tags for the current search. Seeds are the tags named by the query or the
+        tag filter; when those have no associations, the most frequent tags in the results.
+        """
+        terms = [t.lower() for t in terms]
+        named = [tag for tag in self.bitmaps if tag in (selected_tags or []) or tag.lower() in terms]
+        related = self.related(named, k)
+        if related or not bitmap:
+            return related
+        in_results = sorted(((bitmap_count(bits & bitmap), tag) for tag, bits in self.bitmaps.items()), reverse=True)
+        seeds = [tag for count, tag in in_results[:RESULT_SEEDS] if count]
+        return self.related(seeds + named, k)
+
+
+def expand_query(term: str, tags: list) -> str:
+    """The query OR'd with tag: clauses for tags, in the lichen_query syntax"""
+    if not tags:
+        return term
+    clauses = [f'tag:"{tag}"' for tag in tags]
+    if term:
+        # A plain term is one literal substring; quote it so the expansion keeps that meaning
+        base = f"({term})" if has_syntax(term) else f'"{term}"'
+        clauses.insert(0, base)
+    return " OR ".join(clauses)
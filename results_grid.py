@@ -0,0 +1,138 @@
+# results_grid.py
+# HTML results grid for the Streamlit apps
+# - One HTML block per page of results instead of st.image/st.markdown per card
+# - Thumbnails are lazy-loaded, with srcset/sizes from the renditions manifest
+#   (build_thumbnails.py) and width/height hints so each card reserves its box
+
+import html
+from urllib.parse import urlencode
+
+from lichen_search import METADATA_FACETS, highlight_pattern, record_desc, record_name, record_photographer, record_tags
+
+PAGE_SIZE = 24
+# The first row is above the fold; load it eagerly so it is not delayed
+EAGER_IMAGES = 3
+# Thumbnails are 300 px wide, mostly 3:2; used when no rendition entry is known
+DEFAULT_SIZE = (300, 200)
+SIZES = "(max-width: 640px) 100vw, (max-width: 1100px) 50vw, 33vw"
+# Preferred order of <source> elements; jpeg is the <img> fallback
+SOURCE_TYPES = (("avif", "image/avif"), ("webp", "image/webp"))
+# URL params a "Find similar" link carries over: the filters, nothing else (no q, debug or profiling)
+LINK_PARAMS = ("territory", "photographer", "color") + METADATA_FACETS
+
+GRID_CSS = """
+<style>
+.lichen-grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(260px, 1fr)); gap: 1.5rem; }
+.lichen-card { min-width: 0; }
+.lichen-card img { display: block; width: 100%; height: auto; object-fit: cover; background: #f0f2f6; border-radius: 0.25rem; }
+.lichen-card h4 { margin: 0.5rem 0 0.1rem; font-size: 1rem; }
+.lichen-card .meta { font-size: 0.85rem; opacity: 0.75; margin: 0.1rem 0; }
+.lichen-card .desc { font-size: 0.9rem; margin: 0.4rem 0; }
+.lichen-card .tags { font-size: 0.8rem; opacity: 0.7; }
+.lichen-card .similar { font-size: 0.85rem; margin: 0.2rem 0; }
+</style>
+"""
+
+
+def srcset(entry: dict, fmt: str, base_url: str) -> str:
+    return ", ".join(
+        f"{base_url}{html.escape(r['file'])} {r['width']}w" for r in entry.get("renditions", {}).get(fmt, [])
+    )
+
+
+def highlight_html(text: str, marks: list) -> str:
+    """text HTML-escaped, with matches of marks wrapped in <mark>; matches are found in the raw text"""
+    pattern = highlight_pattern(marks)
+    if pattern is None:
+        return html.escape(text)
+    parts, end = [], 0
+    for m in pattern.finditer(text):
+        parts.append(html.escape(text[end:m.start()]))
+        parts.append(f"<mark>{html.escape(m.group(0))}</mark>")
+        end = m.end()
+    parts.append(html.escape(text[end:]))
+    return "".join(parts)
+
+
+def image_html(rec: dict, rendition: dict, base_url: str, eager: bool) -> str:
+    alt = html.escape(record_name(rec))
+    loading = 'loading="eager" fetchpriority="high"' if eager else 'loading="lazy"'
+
+    if not rendition:
+        thumb = rec.get("thumb_url")
+        if not thumb:
+            return ""
+        width, height = DEFAULT_SIZE
+        return (
+            f'<img src="{html.escape(thumb)}" alt="{alt}" width="{width}" height="{height}" '
+            f'style="aspect-ratio: {width} / {height};" {loading} decoding="async">'
+        )
+
+    width, height = rendition.get("width", DEFAULT_SIZE[0]), rendition.get("height", DEFAULT_SIZE[1])
+    sources = "".join(
+        f'<source type="{mime}" srcset="{srcset(rendition, fmt, base_url)}" sizes="{SIZES}">'
+        for fmt, mime in SOURCE_TYPES if rendition.get("renditions", {}).get(fmt)
+    )
+    return (
+        f'<picture>{sources}'
+        f'<img src="{base_url}{html.escape(rendition["default"])}" srcset="{srcset(rendition, "jpeg", base_url)}" '
+        f'sizes="{SIZES}" alt="{alt}" width="{width}" height="{height}" '
+        f'style="aspect-ratio: {width} / {height};" {loading} decoding="async"></picture>'
+    )
+
+
+def similar_href(name: str, url_params: dict = None) -> str:
+    # The current URL's non-empty filter params with similar= set, so the filters still apply
+    params = {k: (url_params or {}).get(k) for k in LINK_PARAMS}
+    params = {k: v for k, v in params.items() if v}
+    return "?" + urlencode(dict(params, similar=name))
+
+
+def card_html(rec: dict, territory: str, marks: list, rendition: dict, base_url: str, eager: bool, similar: bool = False,
+              group_size: int = 1, url_params: dict = None) -> str:
+    name = html.escape(record_name(rec))
+    photographer = record_photographer(rec)
+    link = rec.get("image_url")
+    # Collapse whitespace so a blank line never ends the markdown HTML block
+    desc = " ".join(record_desc(rec).split())
+    tags = " ".join(record_tags(rec).split())
+
+    parts = [image_html(rec, rendition, base_url, eager), f"<h4>{name}</h4>"]
+    if photographer:
+        parts.append(f'<p class="meta">📷 {html.escape(photographer)}</p>')
+    if territory:
+        parts.append(f'<p class="meta">🗺️ <strong>{html.escape(territory)} Territory</strong></p>')
+    if group_size > 1:
+        others = group_size - 1
+        parts.append(f'<p class="meta">🗂️ +{others} near-duplicate frame{"s" if others != 1 else ""} hidden</p>')
+    if link:
+        parts.append(f'<p class="meta"><a href="{html.escape(link)}" target="_blank" rel="noopener">Open original</a></p>')
+    if similar:
+        # Plain link so it works inside the embedding iframe; the app reads ?similar=
+        href = html.escape(similar_href(record_name(rec), url_params))
+        parts.append(f'<p class="similar"><a href="{href}" target="_self">🔍 Find similar</a></p>')
+    # Highlight matches in description and tags
+    if desc:
+        parts.append(f'<p class="desc">{highlight_html(desc, marks)}</p>')
+    if tags:
+        parts.append(f'<p class="tags">{highlight_html(f"Tags: {tags}", marks)}</p>')
+    return f'<div class="lichen-card">{"".join(parts)}</div>'
+
+
+def grid_html(records: list, territorial_data: dict, marks: list, renditions: dict = None, base_url: str = "", similar=(),
+              group_sizes: list = None, url_params: dict = None) -> str:
+    """
+    HTML for one page of result cards. similar holds the names that get a "Find similar" link,
+    which keeps the filters in url_params (the page's query params); group_sizes (aligned with records) marks
+    cards standing in for a near-duplicate group.
+    """
+    renditions = renditions or {}
+    group_sizes = group_sizes or [1] * len(records)
+    cards = []
+    for i, rec in enumerate(records):
+        name = record_name(rec)
+        territory = (territorial_data or {}).get(name, {}).get("first_nation", "")
+        cards.append(card_html(rec, territory, marks, renditions.get(name), base_url,
+                               eager=i < EAGER_IMAGES, similar=name in similar, group_size=group_sizes[i],
+                               url_params=url_params))
+    return GRID_CSS + f'<div class="lichen-grid">{"".join(cards)}</div>'
@@ -0,0 +1,101 @@
+# sharded_search.py
+# Parallel search over a catalog split into shards, one worker process per shard
+# - Shards are contiguous slices of the catalog; each worker builds a SearchIndex over its
+#   slice (and the slice's territorial entries) once, when the pool starts
+# - A query goes to every shard at once; each answers with the SearchIndex semantics and
+#   returns its hits as (catalog position, record), already in order, and heapq.merge
+#   combines them (k-way merge) into catalog order, the order search_records returns
+# - limit= makes every shard, and the merge, stop after the first limit hits, so a page of
+#   results costs a page of pickling rather than the whole result set
+# - search_highlighted() also highlights the descriptions in the workers
+# Worker processes hold the shard indexes, so throughput scales with cores, not the GIL.
+
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from lichen_query import highlight_terms
+from lichen_search import SearchIndex, bitmap_to_ids, highlight, record_desc, record_name
+
+# Worker state: (catalog position of the shard's first record, SearchIndex over the shard)
+_shard = None
+
+
+def _init_shard(offset, data, territorial_data):
+    global _shard
+    _shard = (offset, SearchIndex(data, territorial_data))
+
+
+def _shard_size():
+    return len(_shard[1])
+
+
+def _search_shard(query, limit, marks):
+    # (hits in the shard, [(catalog position, record[, highlighted description])])
+    offset, index = _shard
+    ids = bitmap_to_ids(index.search(*query))
+    total = len(ids)
+    records = index.records
+    page = ids if limit is None else ids[:limit]
+    if marks is None:
+        return total, [(offset + i, records[i]) for i in page]
+    return total, [(offset + i, records[i], highlight(record_desc(records[i]), marks)) for i in page]
+
+
+class ShardedSearch:
+    """SearchIndex.search_records over a catalog partitioned across worker processes"""
+
+    def __init__(self, data, territorial_data, shards: int = None):
+        territorial_data = territorial_data or {}
+        shards = max(1, min(shards or os.cpu_count() or 1, len(data) or 1))
+        size = -(-len(data) // shards) or 1
+        self.pools = []
+        for offset in range(0, max(len(data), 1), size):
+            part = data[offset:offset + size]
+            names = {record_name(rec) for rec in part}
+            mapping = {name: territorial_data[name] for name in names if name in territorial_data}
+            pool = ProcessPoolExecutor(max_workers=1, initializer=_init_shard, initargs=(offset, part, mapping))
+            self.pools.append(pool)
+        # Workers start on their first task; wait here so the first query isn't an index build
+        self.size = sum(f.result() for f in [pool.submit(_shard_size) for pool in self.pools])
+
+    def __len__(self):
+        return self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for pool in self.pools:
+            pool.shutdown(cancel_futures=True)
+
+    def _query(self, query, limit, marks):
+        futures = [pool.submit(_search_shard, query, limit, marks) for pool in self.pools]
+        return [f.result() for f in futures]
+
+    def count(self, term: str = "", selected_territory: str = None, selected_tags: list = None, selected_photographer: str = None,
+              selected_color: str = None, selected_facets: dict = None) -> int:
+        """Number of matching records"""
+        query = (term, selected_territory, selected_tags, selected_photographer, selected_color, selected_facets)
+        return sum(total for total, _ in self._query(query, 0, None))
+
+    def search_records(self, term: str = "", selected_territory: str = None, selected_tags: list = None, selected_photographer: str = None,
+                       selected_color: str = None, selected_facets: dict = None, limit: int = None) -> list:
+        """Matching records in catalog order, as SearchIndex.search_records; the first limit only if given"""
+        query = (term, selected_territory, selected_tags, selected_photographer, selected_color, selected_facets)
+        shards = self._query(query, limit, None)
+        merged = heapq.merge(*(hits for _, hits in shards))
+        return [rec for _, rec in islice(merged, limit)]
+
+    def search_highlighted(self, term: str = "", selected_territory: str = None, selected_tags: list = None,
+                           selected_photographer: str = None, selected_color: str = None, selected_facets: dict = None,
+                           limit: int = None) -> tuple:
+        """(total hits, [(record, highlighted description)]) for the first limit hits"""
+        query = (term, selected_territory, selected_tags, selected_photographer, selected_color, selected_facets)
+        shards = self._query(query, limit, highlight_terms(term))
+        merged = heapq.merge(*(hits for _, hits in shards))
+        return sum(total for total, _ in shards), [(rec, desc) for _, rec, desc in islice(merged, limit)]
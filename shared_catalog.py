@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Publish the catalog and its search index once into a read-only file that every app
+process memory-maps, instead of each worker holding its own copy.
+
+Layout of a build, catalog-<version>.lcat (version = content hash of the catalog and
+territorial mapping):
+  magic, header length, JSON header (version, record count, section offsets, bitmap directory,
+                  and the warning to show with the build, if any)
+  records         one JSON document per record, with a uint64 offset table
+  territorial     territorial mapping as a sorted key table and JSON values
+  names           photo name -> record ids, the same way
+  bitmaps         facet bitmaps (territory, photographer, tag, metadata) as little-endian bytes
+  blob            SearchIndex's lowercase search text, aligned so it maps on its own
+
+Records, mapping entries and the search text stay in the mapping, which the OS shares
+between processes through the page cache; records are decoded on access (a page of results
+at a time). Only the facet bitmaps (one bit per record per facet value) are materialized as
+Python ints in each worker.
+
+A CURRENT file in the directory names the live build. Publishing writes the build under
+a temporary name, renames it into place and then replaces CURRENT with os.replace, so a
+worker reading CURRENT always sees a complete build, and workers attached to the previous
+one keep using it until they next attach. The last KEEP_BUILDS builds are kept on disk.
+
+Usage:
+    python shared_catalog.py [--catalog PATH] [--territories PATH] [--dir DIR]
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
+
+from lichen_search import SearchIndex
+
+DEFAULT_DIR = 'shared_catalog'
+CATALOG_PATH = 'LichenThumbnail/images_for_squarespace_githubthumbs.json'
+TERRITORIAL_PATH = 'LichenThumbnail/territorial_mapping.json'
+POINTER_FILE = 'CURRENT'
+LOCK_FILE = 'publish.lock'
+MAGIC = b'LICHENCAT1\n'
+FORMAT_VERSION = 1
+KEEP_BUILDS = 2
+# The blob is mapped separately, so it starts on an offset mmap accepts on every platform
+BLOB_ALIGNMENT = 65536
+# A publish lock older than this was left by a crashed publisher
+LOCK_TIMEOUT = 300
+# How long a worker without any build waits for another worker's publish
+WAIT_FOR_PUBLISH = 60
+
+
+# --- Reading -------------------------------------------------------------------
+
+class StringTable(Sequence):
+    """Byte strings stored back to back with a uint64 offset table"""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]])
+
+
+class MappedRecords(Sequence):
+    """Catalog records, decoded from the mapping on every access"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return json.loads(self.table[i])
+
+
+class MappedMapping(Mapping):
+    """Read-only dict of str keys (sorted by UTF-8 bytes) to JSON values"""
+
+    def __init__(self, keys, values):
+        self.keys_table = keys
+        self.values_table = values
+
+    def _find(self, key):
+        if not isinstance(key, str):
+            return -1
+        target = key.encode('utf-8')
+        lo, hi = 0, len(self.keys_table)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.keys_table[mid] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self.keys_table) and self.keys_table[lo] == target else -1
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return json.loads(self.values_table[i])
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __iter__(self):
+        return (k.decode('utf-8') for k in self.keys_table)
+
+    def __len__(self):
+        return len(self.keys_table)
+
+
+class SharedCatalog:
+    """One attached build: .version, .records, .territorial_data and .index"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            header = read_header(self._map)
+            blob_offset, blob_length = header['sections']['blob']
+            self._blob = mmap.mmap(f.fileno(), blob_length, access=mmap.ACCESS_READ, offset=blob_offset) if blob_length else b''
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was built on a {header['byteorder']}-endian machine")
+        self.version = header['version']
+        self.created = header['created']
+        # e.g. the territorial mapping could not be fetched when this build was published
+        self.warning = header.get('warning')
+        view = memoryview(self._map)
+        sections = header['sections']
+
+        def section(name):
+            offset, length = sections[name]
+            return view[offset:offset + length]
+
+        def table(name):
+            return StringTable(section(name + '.offsets').cast('Q'), section(name + '.data'))
+
+        self.records = MappedRecords(table('records'))
+        self.territorial_data = MappedMapping(table('territorial.keys'), table('territorial.values'))
+        names = MappedMapping(table('names.keys'), table('names.values'))
+        bitmaps = section('bitmaps')
+
+        def ints(directory):
+            return {value: int.from_bytes(bitmaps[o:o + n], 'little') for value, (o, n) in directory.items()}
+
+        directory = header['bitmaps']
+        self.index = SearchIndex.from_parts(
+            self.records, self.territorial_data,
+            blob=self._blob,
+            starts=section('starts').cast('Q'),
+            territories=ints(directory['territories']),
+            photographers=ints(directory['photographers']),
+            tags=ints(directory['tags']),
+            facets={facet: ints(values) for facet, values in directory['facets'].items()},
+            names=names,
+        )
+
+
+def read_header(buf):
+    if buf[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a shared catalog build")
+    (length,) = struct.unpack_from('<Q', buf, len(MAGIC))
+    start = len(MAGIC) + 8
+    header = json.loads(bytes(buf[start:start + length]))
+    if header.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported shared catalog format {header.get('format')}")
+    return header
+
+
+def current_build(directory=DEFAULT_DIR):
+    """File name of the live build, or None before the first publish"""
+    try:
+        with open(os.path.join(directory, POINTER_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def build_age(directory=DEFAULT_DIR):
+    """Seconds since the live build was last published (or confirmed unchanged)"""
+    try:
+        return time.time() - os.stat(os.path.join(directory, POINTER_FILE)).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+_attached = {}
+_attach_lock = threading.Lock()
+
+
+def attach(directory=DEFAULT_DIR):
+    """The live build, mapped once per process; None before the first publish"""
+    name = current_build(directory)
+    if name is None:
+        return None
+    path = os.path.join(directory, name)
+    with _attach_lock:
+        catalog = _attached.get(path)
+        if catalog is None:
+            catalog = SharedCatalog(path)
+            # Drop this process's reference to older builds; sessions still using one keep it alive
+            _attached.clear()
+            _attached[path] = catalog
+        return catalog
+
+
+# --- Publishing ----------------------------------------------------------------
+
+def _table(items):
+    offsets = array('Q', [0])
+    parts = []
+    total = 0
+    for item in items:
+        parts.append(item)
+        total += len(item)
+        offsets.append(total)
+    return offsets.tobytes(), b''.join(parts)
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _sorted_map(mapping):
+    items = sorted((k.encode('utf-8'), v) for k, v in mapping.items())
+    return _table(k for k, _ in items), _table(_dumps(v) for _, v in items)
+
+
+def _bitmap_section(index):
+    chunks = []
+    offset = 0
+
+    def add(bitmaps):
+        nonlocal offset
+        directory = {}
+        for value, bitmap in bitmaps.items():
+            raw = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+            directory[value] = [offset, len(raw)]
+            chunks.append(raw)
+            offset += len(raw)
+        return directory
+
+    directory = {
+        'territories': add(index.territories),
+        'photographers': add(index.photographers),
+        'tags': add(index.tags),
+        'facets': {facet: add(values) for facet, values in index.facets.items()},
+    }
+    return directory, b''.join(chunks)
+
+
+def build_bytes(data, territorial_data, warning=None):
+    """(version, header dict, [(section name, bytes)]) for a catalog"""
+    index = SearchIndex(data, territorial_data)
+    records_offsets, records_data = _table(_dumps(rec) for rec in data)
+    (tk_offsets, tk_data), (tv_offsets, tv_data) = _sorted_map(territorial_data or {})
+    (nk_offsets, nk_data), (nv_offsets, nv_data) = _sorted_map(index.names)
+    directory, bitmaps = _bitmap_section(index)
+
+    digest = hashlib.sha256()
+    for part in (records_data, tk_data, tv_data):
+        digest.update(hashlib.sha256(part).digest())
+    version = digest.hexdigest()[:16]
+
+    sections = [
+        ('records.offsets', records_offsets), ('records.data', records_data),
+        ('territorial.keys.offsets', tk_offsets), ('territorial.keys.data', tk_data),
+        ('territorial.values.offsets', tv_offsets), ('territorial.values.data', tv_data),
+        ('names.keys.offsets', nk_offsets), ('names.keys.data', nk_data),
+        ('names.values.offsets', nv_offsets), ('names.values.data', nv_data),
+        ('starts', array('Q', index.starts).tobytes()),
+        ('bitmaps', bitmaps),
+        ('blob', index.blob),
+    ]
+    header = {
+        'format': FORMAT_VERSION,
+        'version': version,
+        'created': time.time(),
+        'warning': warning,
+        'records': len(data),
+        'byteorder': sys.byteorder,
+        'bitmaps': directory,
+    }
+    return version, header, sections
+
+
+def write_build(path, header, sections):
+    # Section offsets depend on the header's length, so lay out with a header size bound first
+    header['sections'] = {name: [0, len(raw)] for name, raw in sections}
+    reserve = len(_dumps(header)) + 32 * len(sections) + 64
+    offset = len(MAGIC) + 8 + reserve
+    for name, raw in sections:
+        align = BLOB_ALIGNMENT if name == 'blob' else 8
+        offset += -offset % align
+        header['sections'][name] = [offset, len(raw)]
+        offset += len(raw)
+    encoded = _dumps(header)
+    if len(encoded) > reserve:
+        raise ValueError("Shared catalog header outgrew its reserved space")
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(encoded)))
+        f.write(encoded)
+        for name, raw in sections:
+            f.seek(header['sections'][name][0])
+            f.write(raw)
+        f.truncate(offset)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _replace_pointer(directory, name):
+    tmp_path = os.path.join(directory, POINTER_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(directory, POINTER_FILE))
+
+
+def _remove_old_builds(directory, keep):
+    builds = sorted(
+        (e for e in os.scandir(directory) if e.name.startswith('catalog-') and e.name.endswith('.lcat')),
+        key=lambda e: e.stat().st_mtime, reverse=True,
+    )
+    for entry in builds[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            # Still mapped by a worker on a platform that forbids removing it; next publish retries
+            pass
+
+
+def publish(data, territorial_data, directory=DEFAULT_DIR, keep=KEEP_BUILDS, warning=None):
+    """Write a build for the catalog and make it the live one; returns its version"""
+    os.makedirs(directory, exist_ok=True)
+    version, header, sections = build_bytes(data, territorial_data, warning)
+    name = f"catalog-{version}.lcat"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        write_build(tmp_path, header, sections)
+        os.replace(tmp_path, path)
+    else:
+        # Unchanged catalog: keep the build, but mark it as freshly confirmed
+        os.utime(path)
+    _replace_pointer(directory, name)
+    _remove_old_builds(directory, keep)
+    return version
+
+
+@contextmanager
+def publish_lock(directory=DEFAULT_DIR):
+    """Yields True in the one process that should publish; others get False"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, LOCK_FILE)
+    try:
+        if time.time() - os.stat(path).st_mtime > LOCK_TIMEOUT:
+            os.remove(path)
+    except OSError:
+        pass
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        yield False
+        return
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield True
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def ensure(fetch, directory=DEFAULT_DIR, max_age=300):
+    """
+    The live build, publishing one first when there is none or it is older than max_age.
+    fetch() returns (data, territorial_data, warning); only the worker holding the publish lock
+    calls it, the others attach to the current build (or wait for the first one). An error
+    from fetch() propagates and leaves the live build in place.
+    """
+    age = build_age(directory)
+    if age is None or age > max_age:
+        with publish_lock(directory) as acquired:
+            if acquired:
+                data, territorial_data, warning = fetch()
+                publish(data, territorial_data, directory, warning=warning)
+    deadline = time.time() + WAIT_FOR_PUBLISH
+    catalog = attach(directory)
+    while catalog is None and time.time() < deadline:
+        time.sleep(0.2)
+        catalog = attach(directory)
+    if catalog is None:
+        raise TimeoutError(f"No shared catalog was published in {directory}")
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish the catalog as a shared, memory-mapped build")
+    parser.add_argument('--catalog', default=CATALOG_PATH, help="Catalog JSON")
+    parser.add_argument('--territories', default=TERRITORIAL_PATH, help="Territorial mapping JSON")
+    parser.add_argument('--dir', default=DEFAULT_DIR, help="Shared build directory")
+    args = parser.parse_args()
+
+    with open(args.catalog, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    with open(args.territories, 'r', encoding='utf-8') as f:
+        territorial_data = json.load(f)
+    start = time.perf_counter()
+    version = publish(data, territorial_data, args.dir)
+    catalog = attach(args.dir)
+    size = os.path.getsize(catalog.path)
+    print(f"Published {len(data)} records as {version} ({size / 2**20:.1f} MB) in {time.perf_counter() - start:.2f} s")
+    print(f"Live build: {os.path.join(args.dir, current_build(args.dir))}")
+
+
+if __name__ == "__main__":
+    main()
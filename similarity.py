@@ -0,0 +1,84 @@
+# similarity.py
+# "Find similar" over the feature matrix from build_image_features.py
+# - Exact cosine kNN as one matrix-vector product for catalogs up to APPROX_THRESHOLD rows
+# - Random-hyperplane LSH candidates with exact re-ranking above that
+
+import numpy as np
+
+APPROX_THRESHOLD = 50_000
+LSH_TABLES = 16
+LSH_BITS = 8
+MIN_CANDIDATES = 200
+
+
+class SimilarityIndex:
+    """Cosine kNN over L2-normalized image feature vectors"""
+
+    def __init__(self, names, matrix, approximate=None, seed=0):
+        self.names = list(names)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.rows = {name: i for i, name in enumerate(self.names)}
+        if approximate is None:
+            approximate = len(self.names) > APPROX_THRESHOLD
+        self.tables = self._build_lsh(seed) if approximate else None
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def __len__(self):
+        return len(self.names)
+
+    def _build_lsh(self, seed):
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((LSH_TABLES, self.matrix.shape[1], LSH_BITS)).astype(np.float32)
+        weights = 1 << np.arange(LSH_BITS)
+        tables = []
+        for planes in self.planes:
+            codes = ((self.matrix @ planes) > 0) @ weights
+            order = np.argsort(codes, kind='stable')
+            keys, starts = np.unique(codes[order], return_index=True)
+            ends = np.append(starts[1:], len(order))
+            tables.append({int(k): order[s:e] for k, s, e in zip(keys, starts, ends)})
+        self._weights = weights
+        return tables
+
+    def _candidates(self, vector):
+        found = [table.get(int(((vector @ planes) > 0) @ self._weights), ()) for table, planes in zip(self.tables, self.planes)]
+        ids = np.unique(np.concatenate([np.asarray(f, dtype=np.int64) for f in found]))
+        if len(ids) < MIN_CANDIDATES:
+            # Sparse buckets: fall back to the exact scan rather than return too few neighbours
+            return None
+        return ids
+
+    def similar_to_vector(self, vector, k=12, exclude=None):
+        """[(name, score)] for the k most similar rows, best first"""
+        vector = np.asarray(vector, dtype=np.float32)
+        ids = self._candidates(vector) if self.tables is not None else None
+        if ids is None:
+            scores = self.matrix @ vector
+            ids = np.arange(len(scores))
+        else:
+            scores = self.matrix[ids] @ vector
+
+        if exclude is not None:
+            keep = ids != exclude
+            ids, scores = ids[keep], scores[keep]
+        k = min(k, len(ids))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.names[ids[i]], float(scores[i])) for i in top]
+
+    def similar(self, name, k=12):
+        """[(name, score)] for the k images most similar to name, excluding itself"""
+        row = self.rows.get(name)
+        if row is None:
+            return []
+        return self.similar_to_vector(self.matrix[row], k, exclude=row)
+
+
+def load_similarity_index(features_file, names_file):
+    """Build an index from an image_features.npy file object and its parsed names JSON"""
+    matrix = np.load(features_file)
+    return SimilarityIndex(names_file['names'], matrix)
@@ -0,0 +1,82 @@
+# suggest.py
+# Typeahead completions over tags, nations, photographers and photo names
+# - One sorted array of lowercase keys; a prefix is two bisects into it
+# - Multi-word entries are also keyed at each later word ("cedar" finds "western red cedar")
+# - Completions are ranked by how many records they select; the top lists for prefixes of
+#   up to three characters are precomputed since those ranges cover most of the array
+
+import heapq
+from bisect import bisect_left
+
+from lichen_search import bitmap_count
+
+KIND_FIELDS = {
+    "tag": "tag",
+    "nation": "territory",
+    "photographer": "photographer",
+    "photo": "name",
+}
+DEFAULT_LIMIT = 8
+PRECOMPUTED_PREFIX = 3
+# Kind order when counts tie: vocabulary terms before individual photos
+KIND_RANK = {"tag": 0, "nation": 1, "photographer": 2, "photo": 3}
+
+
+class Suggester:
+    """Prefix completions built once from a SearchIndex"""
+
+    def __init__(self, index):
+        nations = {}
+        for name in index.territories:
+            for nation in (n.strip() for n in name.split(",")):
+                if nation and nation not in nations:
+                    nations[nation] = bitmap_count(index.territory_field(nation))
+
+        entries = []
+        entries += [("tag", tag, bitmap_count(bits)) for tag, bits in index.tags.items()]
+        entries += [("nation", nation, count) for nation, count in nations.items()]
+        entries += [("photographer", name, bitmap_count(bits)) for name, bits in index.photographers.items()]
+        entries += [("photo", name, len(ids)) for name, ids in index.names.items() if name]
+        self.entries = entries
+
+        keyed = []
+        for i, (_, text, _) in enumerate(entries):
+            words = text.lower().split()
+            for w in range(len(words)):
+                keyed.append((" ".join(words[w:]), i))
+        keyed.sort()
+        self.keys = [k for k, _ in keyed]
+        self.ids = [i for _, i in keyed]
+
+        self._top = {}
+        for key in {k[:n] for k in self.keys for n in range(1, PRECOMPUTED_PREFIX + 1)}:
+            self._top[key] = self._rank(self._range(key), DEFAULT_LIMIT)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _range(self, prefix):
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "￿", lo)
+        return set(self.ids[lo:hi])
+
+    def _rank(self, ids, limit, kinds=None):
+        entries = self.entries
+        if kinds:
+            ids = [i for i in ids if entries[i][0] in kinds]
+        return heapq.nsmallest(limit, ids, key=lambda i: (-entries[i][2], KIND_RANK[entries[i][0]], entries[i][1]))
+
+    def complete(self, prefix: str, limit: int = DEFAULT_LIMIT, kinds=None) -> list:
+        """[{text, kind, count, query}] for entries with a word starting with prefix, most records first"""
+        prefix = " ".join((prefix or "").lower().split())
+        if not prefix:
+            return []
+        if kinds is None and limit <= DEFAULT_LIMIT and prefix in self._top:
+            ids = self._top[prefix][:limit]
+        else:
+            ids = self._rank(self._range(prefix), limit, kinds)
+        return [self._suggestion(i) for i in ids]
+
+    def _suggestion(self, i):
+        kind, text, count = self.entries[i]
+        return {"text": text, "kind": kind, "count": count, "query": f'{KIND_FIELDS[kind]}:"{text}"'}
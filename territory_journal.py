@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Append-only change journal for the territorial mapping.
+
+Every edit to corrected_territorial_mapping.json is recorded as a versioned batch in
+territorial_mapping_journal.jsonl, together with a content hash of the CSV row it was
+derived from. Re-running an update only reprocesses new or changed rows, and any
+batch can be rolled back by version.
+
+Usage:
+    python territory_journal.py log
+    python territory_journal.py update [--force] [CSV ...]
+    python territory_journal.py rollback VERSION
+    python territory_journal.py rebuild
+"""
+
+import csv
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from nation_gazetteer import scan_rows
+
+JOURNAL_PATH = 'territorial_mapping_journal.jsonl'
+MAPPING_PATH = 'corrected_territorial_mapping.json'
+DEFAULT_CSV_PATHS = ['TempShopify/output_dsc0001-9999.csv']
+
+
+def row_hash(row):
+    """Content hash of a CSV row, independent of column order"""
+    payload = json.dumps(row, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def territory_entry(nations):
+    """Build a mapping entry in the same shape as the existing territorial mapping"""
+    first_nation = ', '.join(nations)
+    return {
+        'first_nation': first_nation,
+        'full_acknowledgement': f"territorial acknowledgement to the {first_nation}"
+    }
+
+
+class TerritoryJournal:
+    """Replays the journal into the current mapping and appends new batches"""
+
+    def __init__(self, journal_path=JOURNAL_PATH, mapping_path=MAPPING_PATH):
+        self.journal_path = journal_path
+        self.mapping_path = mapping_path
+        self.entries = []
+        self.mapping = {}
+        self.row_hashes = {}
+        self.version = 0
+
+        if os.path.exists(journal_path):
+            with open(journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        self._apply(json.loads(line))
+        elif os.path.exists(mapping_path):
+            # First run: record the existing mapping as the baseline version
+            with open(mapping_path, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            self.commit(baseline, note=f"baseline import of {mapping_path}", save=False)
+
+    def _apply(self, entry):
+        photo_name = entry['photo_name']
+        if entry['op'] == 'set':
+            self.mapping[photo_name] = entry['value']
+        elif entry['op'] == 'delete':
+            self.mapping.pop(photo_name, None)
+        if entry.get('row_hash'):
+            self.row_hashes[photo_name] = entry['row_hash']
+        self.entries.append(entry)
+        self.version = max(self.version, entry['version'])
+
+    def commit(self, changes, note='', row_hashes=None, save=True):
+        """
+        Append one batch of changes and return its version, or None if nothing changed.
+        `changes` maps photo name -> new mapping entry, or None to delete it.
+        `row_hashes` maps photo name -> hash of the source row the change came from.
+        """
+        row_hashes = row_hashes or {}
+        version = self.version + 1
+        timestamp = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+        batch = []
+        for photo_name in sorted(set(changes) | set(row_hashes)):
+            value = changes.get(photo_name, self.mapping.get(photo_name))
+            current = self.mapping.get(photo_name)
+            hash_changed = row_hashes.get(photo_name) not in (None, self.row_hashes.get(photo_name))
+            if photo_name in changes and value != current:
+                op = 'set' if value is not None else 'delete'
+            elif hash_changed:
+                op = 'hash'
+            else:
+                continue
+            batch.append({
+                'version': version,
+                'timestamp': timestamp,
+                'note': note,
+                'photo_name': photo_name,
+                'op': op,
+                'value': value if op == 'set' else None,
+                'previous': current,
+                'row_hash': row_hashes.get(photo_name),
+            })
+
+        if not batch:
+            return None
+
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            for entry in batch:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        for entry in batch:
+            self._apply(entry)
+
+        if save:
+            self.save_mapping()
+        return version
+
+    def rollback(self, version):
+        """
+        Undo the mapping changes made by one batch by appending a compensating batch.
+        A photo is only restored while its entry is still the one the batch left; photos a
+        later batch changed again are skipped. Returns (version of the compensating batch, or
+        None when there is nothing to undo, e.g. it was rolled back before; skipped photo names).
+        """
+        batch = [e for e in self.entries if e['version'] == version and e['op'] != 'hash']
+        if not batch:
+            raise ValueError(f"No mapping changes recorded for version {version}")
+
+        before, after = {}, {}
+        for entry in batch:
+            # For names touched more than once: the value before the batch's first change and after its last
+            before.setdefault(entry['photo_name'], entry['previous'])
+            after[entry['photo_name']] = entry['value']
+
+        changes, skipped = {}, []
+        for photo_name, value in before.items():
+            current = self.mapping.get(photo_name)
+            if current == after[photo_name]:
+                changes[photo_name] = value
+            elif current != value:
+                skipped.append(photo_name)
+        return self.commit(changes, note=f"rollback of version {version}"), skipped
+
+    def batches(self):
+        """Return (version, timestamp, note, number of changes) for every batch"""
+        summary = {}
+        for entry in self.entries:
+            version, timestamp, note, count = summary.get(
+                entry['version'], (entry['version'], entry['timestamp'], entry['note'], 0))
+            summary[entry['version']] = (version, timestamp, note, count + 1)
+        return [summary[v] for v in sorted(summary)]
+
+    def update_from_csv(self, paths, processes=1, force=False):
+        """
+        Reprocess only CSV rows that are new or whose content changed since they were
+        last journaled. Rows seen for the first time keep any existing mapping entry;
+        a journaled row that changed and no longer names a nation loses its entry.
+        """
+        pending = []
+        hashes = {}
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    photo_name = row['Photo Name']
+                    digest = row_hash(row)
+                    if not force and self.row_hashes.get(photo_name) == digest:
+                        continue
+                    hashes[photo_name] = digest
+                    # Rows never hashed before but already mapped are curated; keep them
+                    if force or photo_name in self.row_hashes or photo_name not in self.mapping:
+                        pending.append(row)
+
+        changes = {}
+        for photo_name, nations in scan_rows(pending, processes=processes):
+            if nations:
+                changes[photo_name] = territory_entry(nations)
+            elif photo_name in self.row_hashes:
+                # The entry came from an earlier version of this row, which no longer names a nation
+                changes[photo_name] = None
+
+        note = f"update from {', '.join(paths)}"
+        return self.commit(changes, note=note, row_hashes=hashes), len(hashes)
+
+    def save_mapping(self):
+        """Write the materialized mapping atomically"""
+        tmp_path = self.mapping_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.mapping, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.mapping_path)
+
+
+def main(argv):
+    command = argv[0] if argv else 'log'
+    journal = TerritoryJournal()
+
+    if command == 'log':
+        for version, timestamp, note, count in journal.batches():
+            print(f"v{version}  {timestamp}  {count:4d} changes  {note}")
+        print(f"\nCurrent version: {journal.version}, {len(journal.mapping)} mappings")
+
+    elif command == 'update':
+        force = '--force' in argv
+        paths = [a for a in argv[1:] if a != '--force'] or DEFAULT_CSV_PATHS
+        processes = os.cpu_count() or 1
+        version, processed = journal.update_from_csv(paths, processes=processes, force=force)
+        print(f"Reprocessed {processed} new or changed rows")
+        if version:
+            print(f"Recorded version {version}; total mappings now: {len(journal.mapping)}")
+        else:
+            print("Mapping is up to date")
+
+    elif command == 'rollback':
+        if len(argv) < 2 or not argv[1].isdigit():
+            print("Usage: python territory_journal.py rollback VERSION")
+            return 1
+        try:
+            version, skipped = journal.rollback(int(argv[1]))
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            return 1
+        if skipped:
+            print(f"Skipped {len(skipped)} photos changed again after version {argv[1]}: {', '.join(skipped)}")
+        if version is None:
+            print("Nothing rolled back" if skipped else f"Nothing to roll back: version {argv[1]} is already undone")
+        else:
+            print(f"Rolled back version {argv[1]} as version {version}")
+            print(f"Total mappings now: {len(journal.mapping)}")
+
+    elif command == 'rebuild':
+        journal.save_mapping()
+        print(f"Rebuilt {journal.mapping_path} from {len(journal.entries)} journal entries")
+
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -4,7 +4,8 @@ Thorough search for any Coast Salish related terms in image descriptions
 """
 
 import csv
-import re
+
+from nation_gazetteer import Gazetteer
 
 def thorough_coast_salish_search():
     """Search for any Coast Salish related terms with variations"""
@@ -26,6 +27,9 @@ def thorough_coast_salish_search():
         'territorial acknowledgement', 'acknowledgement'
     ]
     
+    # Compile all terms into one automaton so each description is scanned once
+    term_gazetteer = Gazetteer({term: term for term in search_terms}, whole_words=False)
+    
     print("\nSearching for Coast Salish related terms...\n")
     
     found_matches = []
@@ -33,12 +37,7 @@ def thorough_coast_salish_search():
     for row in csv_data:
         photo_name = row['Photo Name']
         description = row['Description']
-        description_lower = description.lower()
-        
-        matches_in_desc = []
-        for term in search_terms:
-            if term in description_lower:
-                matches_in_desc.append(term)
+        matches_in_desc = term_gazetteer.find_terms(description)
         
         if matches_in_desc:
             found_matches.append({
@@ -58,14 +57,16 @@ def thorough_coast_salish_search():
     # Also search for any description that might contain multiple territories
     print("\nSearching for descriptions with multiple territory mentions...\n")
     
+    # Count territory-related words
+    territory_words = ['territory', 'territorial', 'acknowledgement', 'acknowledgment', 'nation', 'nations']
+    word_gazetteer = Gazetteer({word: word for word in territory_words}, whole_words=False)
+    
     multi_territory_matches = []
     for row in csv_data:
         photo_name = row['Photo Name']
         description = row['Description']
         
-        # Count territory-related words
-        territory_words = ['territory', 'territorial', 'acknowledgement', 'acknowledgment', 'nation', 'nations']
-        count = sum(1 for word in territory_words if word in description.lower())
+        count = len(word_gazetteer.find_terms(description))
         
         if count > 1:  # Multiple territory-related words
             multi_territory_matches.append({
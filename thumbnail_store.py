@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Content-addressed thumbnail store.
+
+Images are copied into the store under names derived from their SHA-256, so byte-identical
+duplicates collapse to one file and every stored name is immutable. A top-level .jpg
+thumbnail that also exists as .jpeg (a re-encode of the same image) is mapped to the .jpeg
+blob instead of being stored twice. The index, store-index.json next to the store directory,
+maps each source file (and each photo name) to its hashed name; publishing only needs to
+transfer names the previous index did not have. It is kept out of the store so the store's
+immutable cache rule does not apply to it.
+
+Usage:
+    python thumbnail_store.py ingest [--root DIR] [--store DIR]
+    python thumbnail_store.py diff PREVIOUS_INDEX [--store DIR]
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+from build_thumbnails import SOURCE_EXTENSIONS, file_hash, find_sources, photo_name_for
+
+ROOT_DIR = 'LichenThumbnail'
+STORE_DIR = 'LichenThumbnail/store'
+INDEX_NAME = 'store-index.json'
+# Where indexes were written before they moved out of the store
+LEGACY_INDEX_NAME = 'index.json'
+HASH_LENGTH = 20
+IMAGE_EXTENSIONS = SOURCE_EXTENSIONS + ('.webp', '.avif')
+
+# Hashed names never change content, so they can be cached forever. Netlify and Cloudflare
+# Pages apply every matching rule, so the index must not live under /store/
+HEADERS = """/store/*
+  Cache-Control: public, max-age=31536000, immutable
+/store-index.json
+  Cache-Control: public, max-age=300
+"""
+
+
+def hashed_name(digest, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return digest[:HASH_LENGTH] + ('.jpeg' if ext == '.jpg' else ext)
+
+
+def iter_images(root, store_dir):
+    """Yield paths relative to root for every image below it, skipping the store itself"""
+    store_dir = os.path.abspath(store_dir)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) != store_dir)
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                yield os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, '/')
+
+
+def index_path(store_dir=STORE_DIR):
+    """The index for store_dir, beside it rather than inside it"""
+    return os.path.join(os.path.dirname(os.path.normpath(store_dir)), INDEX_NAME)
+
+
+def load_index(path):
+    if not os.path.exists(path):
+        return {'files': {}, 'photos': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def ingest(root=ROOT_DIR, store_dir=STORE_DIR):
+    """Copy every image under root into the store and rewrite the index; returns a summary"""
+    os.makedirs(store_dir, exist_ok=True)
+    index_file = index_path(store_dir)
+    legacy_path = os.path.join(store_dir, LEGACY_INDEX_NAME)
+    previous = load_index(index_file if os.path.exists(index_file) else legacy_path)
+
+    # Thumbnails by photo name, one per photo (.jpeg preferred over .jpg)
+    preferred = find_sources(root)
+
+    files = {}
+    twins = {}
+    summary = {'files': 0, 'stored': 0, 'duplicates': 0, 'twins': 0, 'bytes_in': 0, 'bytes_stored': 0}
+    seen = set()
+    for rel_path in iter_images(root, store_dir):
+        path = os.path.join(root, rel_path)
+        chosen = preferred.get(photo_name_for(rel_path))
+        if '/' not in rel_path and chosen and chosen != rel_path:
+            twins[rel_path] = chosen
+            summary['twins'] += 1
+            continue
+        digest = file_hash(path)
+        name = hashed_name(digest, rel_path)
+        files[rel_path] = name
+        size = os.path.getsize(path)
+        summary['files'] += 1
+        summary['bytes_in'] += size
+
+        if name in seen:
+            summary['duplicates'] += 1
+            continue
+        seen.add(name)
+        summary['bytes_stored'] += size
+        target = os.path.join(store_dir, name)
+        if not os.path.exists(target):
+            shutil.copyfile(path, target)
+            summary['stored'] += 1
+
+    for rel_path, chosen in twins.items():
+        files[rel_path] = files[chosen]
+    photos = {name: files[filename] for name, filename in preferred.items() if filename in files}
+
+    index = {'files': files, 'photos': photos}
+    tmp_path = index_file + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, index_file)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+    with open(os.path.join(root, '_headers'), 'w', encoding='utf-8') as f:
+        f.write(HEADERS)
+
+    summary['new_since_last_ingest'] = len(set(files.values()) - set(previous['files'].values()))
+    return summary
+
+
+def new_names(index, previous_index):
+    """Hashed names present in index but not in previous_index, i.e. what a republish must upload"""
+    return sorted(set(index['files'].values()) - set(previous_index['files'].values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed thumbnail store")
+    parser.add_argument('command', choices=['ingest', 'diff'])
+    parser.add_argument('previous', nargs='?', help="Previously published store-index.json (for diff)")
+    parser.add_argument('--root', default=ROOT_DIR, help="Directory of images to ingest")
+    parser.add_argument('--store', default=STORE_DIR, help="Store directory")
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        s = ingest(args.root, args.store)
+        print(f"Ingested {s['files']} files ({s['bytes_in']:,} bytes)")
+        print(f"  Unique blobs: {s['files'] - s['duplicates']} ({s['bytes_stored']:,} bytes), "
+              f"{s['duplicates']} byte-identical duplicates collapsed")
+        print(f"  .jpg twins mapped to their .jpeg thumbnail: {s['twins']}")
+        print(f"  Newly copied into the store: {s['stored']}")
+        print(f"  New since last ingest: {s['new_since_last_ingest']}")
+    else:
+        if not args.previous:
+            parser.error("diff needs the previously published store-index.json")
+        index = load_index(index_path(args.store))
+        for name in new_names(index, load_index(args.previous)):
+            print(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,48 @@
 #!/usr/bin/env python3
 """
-Remove the incorrectly added Coast Salish territories from sample images
+Roll back a batch of territorial mapping edits (such as incorrectly added Coast Salish
+territories) by its version in the change journal
+
+Usage: python undo_coast_salish.py VERSION
 """
 
-import json
+import sys
+
+from territory_journal import TerritoryJournal
 
-def undo_coast_salish_additions():
-    """Remove the Coast Salish territories that were incorrectly added"""
+def undo_coast_salish_additions(version=None):
+    """Undo the mapping changes recorded under one journal version"""
     
-    # Load existing territorial mapping
-    try:
-        with open('corrected_territorial_mapping.json', 'r', encoding='utf-8') as f:
-            territorial_mapping = json.load(f)
-        print(f"Loaded existing mapping with {len(territorial_mapping)} entries")
-    except FileNotFoundError:
-        print("ERROR: corrected_territorial_mapping.json not found")
+    journal = TerritoryJournal()
+    print(f"Loaded existing mapping with {len(journal.mapping)} entries")
+    
+    if version is None:
+        print("\nSpecify the version to roll back. Recorded batches:")
+        for batch_version, timestamp, note, count in journal.batches():
+            print(f"  v{batch_version}  {timestamp}  {count} changes  {note}")
         return
     
-    # Images that were incorrectly given Coast Salish territories
-    incorrect_images = ['DSC1487', 'DSC1515', 'Photo Name']
+    batch = [e for e in journal.entries if e['version'] == version and e['op'] != 'hash']
+    for entry in batch:
+        print(f"Reverting {entry['photo_name']}: {entry['op']} {(entry['value'] or {}).get('first_nation', '')}")
+    
+    try:
+        rollback_version, skipped = journal.rollback(version)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return
     
-    removed_count = 0
-    for image_name in incorrect_images:
-        if image_name in territorial_mapping:
-            territory = territorial_mapping[image_name]['first_nation']
-            del territorial_mapping[image_name]
-            removed_count += 1
-            print(f"Removed {territory} territory from {image_name}")
+    if skipped:
+        print(f"\nSkipped {len(skipped)} photos changed again by a later version: {', '.join(skipped)}")
     
-    # Save corrected mapping
-    with open('corrected_territorial_mapping.json', 'w', encoding='utf-8') as f:
-        json.dump(territorial_mapping, f, indent=2, ensure_ascii=False)
+    if rollback_version is None:
+        if not skipped:
+            print(f"\nNothing to roll back: the changes from version {version} are already undone")
+        return
     
-    print(f"\nRemoved {removed_count} incorrect Coast Salish territory mappings")
-    print(f"Total mappings now: {len(territorial_mapping)}")
+    restored = sum(1 for e in journal.entries if e['version'] == rollback_version)
+    print(f"\nRolled back {restored} territory mappings from version {version} (recorded as version {rollback_version})")
+    print(f"Total mappings now: {len(journal.mapping)}")
 
 if __name__ == "__main__":
-    undo_coast_salish_additions()
-
-
+    undo_coast_salish_additions(int(sys.argv[1]) if len(sys.argv) > 1 else None)